@@ -0,0 +1,160 @@
+# Client/async_lobby_client.py
+"""Lobby 協定的 asyncio 版本，給機器人、壓力測試與工具程式使用 (不含互動選單)。
+
+一個 AsyncLobbyClient = 一條 Lobby 連線 = 一個登入身分；
+同一個 event loop 可以同時開上千個 client，不需要每條連線一個線程。
+
+    async with AsyncLobbyClient() as lobby:
+        await lobby.login('bot1', 'pw')
+        games, rooms = await asyncio.gather(lobby.list_games(), lobby.request('get_room_list'))
+
+回傳值與 LobbyClient 收到的回應相同：{'type', 'success', 'message', 'data'}。
+"""
+import os
+import sys
+import json
+import struct
+import asyncio
+from collections import deque
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import SERVER_HOST, LOBBY_PORT, HEADER_SIZE
+
+
+class AsyncLobbyClient:
+    """Lobby 對同一條連線的請求依序處理、依序回應，
+    因此可以連續送出多個請求 (pipelining)，再依送出順序把回應交給對應的 Future。"""
+
+    def __init__(self, host=SERVER_HOST, port=LOBBY_PORT):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.pending = deque() # 已送出、尚未收到回應的 Future (依送出順序)
+        self.reader_task = None
+        self.username = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.reader_task = asyncio.get_running_loop().create_task(self._read_loop())
+        return self
+
+    async def close(self):
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        if self.reader_task:
+            await asyncio.gather(self.reader_task, return_exceptions=True)
+        self.writer = None
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def is_connected(self):
+        return self.writer is not None and not self.writer.is_closing()
+
+    # --- 協定 ---
+
+    async def request(self, action, data=None):
+        """送出一個請求並等待它的回應；多個 request() 可以同時 await (共用同一條連線)"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to server.")
+
+        # 1. 寫入訊息與登記 Future 之間沒有 await，確保 pending 的順序與送出順序一致
+        payload = json.dumps({'action': action, 'user_type': 'player', 'data': data if data is not None else {}}).encode('utf-8')
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append(future)
+        self.writer.write(struct.pack('!I', len(payload)) + payload)
+
+        # 2. 大量請求時等待送出緩衝區消化 (背壓)
+        await self.writer.drain()
+        return await future
+
+    async def _read_loop(self):
+        """持續讀取回應，依序完成 pending 中的 Future"""
+        error = ConnectionError("Lost connection to server.")
+        try:
+            while True:
+                header = await self.reader.readexactly(HEADER_SIZE)
+                length = struct.unpack('!I', header)[0]
+                message = json.loads((await self.reader.readexactly(length)).decode('utf-8'))
+                if not self.pending:
+                    print(f"[AsyncLobbyClient] Unexpected message: {message.get('type')}")
+                    continue
+                future = self.pending.popleft()
+                if not future.done(): # 呼叫端可能已取消等待
+                    future.set_result(message)
+        except (asyncio.IncompleteReadError, OSError) as e:
+            if not isinstance(e, asyncio.IncompleteReadError):
+                error = ConnectionError(str(e))
+        except json.JSONDecodeError:
+            error = ConnectionError("Failed to decode JSON payload.")
+        finally:
+            # 連線結束：所有尚未收到回應的請求一律失敗
+            while self.pending:
+                future = self.pending.popleft()
+                if not future.done():
+                    future.set_exception(error)
+            if self.writer:
+                self.writer.close()
+
+    # --- 常用操作 ---
+
+    async def login(self, username, password):
+        res = await self.request('login', {'username': username, 'password': password})
+        if res.get('success'):
+            self.username = username
+        return res
+
+    async def register(self, username, password):
+        return await self.request('register', {'username': username, 'password': password})
+
+    async def logout(self):
+        res = await self.request('logout', {'username': self.username})
+        if res.get('success'):
+            self.username = None
+        return res
+
+    async def list_games(self, since=None):
+        """since = 上次回應的 {'revision', 'epoch'}：只回傳之後變更 (data) 與下架 (deleted) 的遊戲"""
+        return await self.request('get_game_list', {'since': since} if since else None)
+
+    async def download(self, game_name, installed=None, cached=None):
+        """下載遊戲；傳入 installed (本機檔案清單) / cached (已有的 hash) 時只會收到差異"""
+        data = {'game_name': game_name}
+        if installed is not None:
+            data['installed'] = installed
+            data['cached'] = sorted(cached or [])
+        return await self.request('download_game', data)
+
+    async def create_room(self, game_name, version):
+        return await self.request('create_room', {'game_name': game_name, 'version': version})
+
+    async def list_rooms(self):
+        return await self.request('get_room_list')
+
+    async def join_room(self, room_id, version):
+        return await self.request('join_room', {'room_id': room_id, 'version': version})
+
+    async def leave_room(self):
+        return await self.request('leave_room')
+
+    async def room_info(self):
+        return await self.request('get_room_info')
+
+    async def start_game(self):
+        return await self.request('start_game')
+
+    async def history(self):
+        return await self.request('get_history')
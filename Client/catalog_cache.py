@@ -0,0 +1,76 @@
+# Client/catalog_cache.py
+import os
+import sys
+import json
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import CLIENT_CACHE_DIR, SERVER_HOST, LOBBY_PORT
+
+
+class CatalogCache:
+    """商城列表 (含每個遊戲的評論) 的本機快取，重新啟動後仍然保留。
+
+    檔案記錄資料來自 Server 的哪個 revision / epoch，
+    開啟商城時先顯示快取內容，再以 since 向 Server 查詢之後的變更。
+    不同 Server 的列表分開存放 (catalog_{host}_{port}.json)。
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CLIENT_CACHE_DIR, f"catalog_{SERVER_HOST}_{LOBBY_PORT}.json")
+        self.games = {} # {game_name: info}，更新時整個替換，其他線程讀取不需要上鎖
+        self.revision = None
+        self.epoch = None
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            self.games = saved['games']
+            self.revision = saved['revision']
+            self.epoch = saved['epoch']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass # 沒有快取或檔案損壞：當作空的，第一次查詢會取得完整列表
+
+    @property
+    def is_loaded(self):
+        return self.revision is not None
+
+    def since(self):
+        """查詢 get_game_list 時附帶的條件 (沒有快取時為 None，Server 會回傳完整列表)"""
+        if not self.is_loaded:
+            return None
+        return {'revision': self.revision, 'epoch': self.epoch}
+
+    def apply(self, msg):
+        """套用 GAME_LIST_RESPONSE (完整列表或增量變更) 並寫回檔案"""
+        with self.lock:
+            if msg.get('delta'):
+                games = dict(self.games)
+                games.update(msg.get('data') or {})
+                for name in msg.get('deleted', []):
+                    games.pop(name, None)
+            else:
+                games = msg.get('data') or {}
+            self.games = games
+            self.revision = msg.get('revision')
+            self.epoch = msg.get('epoch')
+            self._save()
+
+    def _save(self):
+        if not self.is_loaded:
+            return # 舊版 Server 沒有 revision，不寫入快取
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'revision': self.revision, 'epoch': self.epoch, 'games': self.games}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Failed to save catalog cache: {e}")
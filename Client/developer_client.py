@@ -1,18 +1,20 @@
-import time
 import sys
 import os
 import json
-import shutil
-import base64
-import tempfile
+import zlib
 # 取得目前檔案 (t2.py) 的絕對路徑
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # 取得上一層目錄 (project_root)
 parent_dir = os.path.dirname(current_dir)
-# 將上一層目錄加入系統搜尋路徑
-sys.path.append(parent_dir)
+# 將上一層目錄加入系統搜尋路徑 (已存在就不重複加入，例如 start_menu 以 in-process 模式啟動時)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 from client_core import DeveloperClientCore
 from config import SERVER_HOST, DEVELOPER_PORT
+from utils import build_manifest, send_message
+
+# 串流上傳時每次讀取的檔案區塊大小
+STREAM_CHUNK_SIZE = 64 * 1024
 
 # 輔助函式：確保輸入有效
 def get_input(prompt, required=True):
@@ -60,7 +62,6 @@ class DeveloperClient:
             elif res == 'DISCONNECTED' or res == 'GAME_LIST_FAIL':
                 self.message = f"無法取得列表: {self.message}"
                 return None
-            time.sleep(0.1)
         
         # 顯示列表 (作為主儀表板或操作選擇清單)
         game_names = list(my_games.keys())
@@ -110,6 +111,60 @@ class DeveloperClient:
             print("無效的選擇。")
             return None
 
+    def _send_build(self, action, game_config, path):
+        """送出上傳請求：先比對檔案清單，再把 Server 缺少的檔案逐一壓縮並串流送出。
+
+        不建立暫存 zip，也不把整個遊戲讀進記憶體；每次只處理一個 STREAM_CHUNK_SIZE 的區塊。
+        """
+        # 1. 計算每個檔案的 SHA-256
+        files = build_manifest(path)
+        self.core.send_request("missing_blobs", {"hashes": [f['hash'] for f in files]})
+
+        # 2. 等待 Server 回報缺少哪些檔案
+        res = self.core.wait_for('MISSING_BLOBS_RESPONSE', timeout=30)
+        if not res or res.get('type') != 'MISSING_BLOBS_RESPONSE':
+            return False
+        missing = set(res.get('data', {}).get('missing', []))
+
+        upload_files = list({f['hash']: f for f in files if f['hash'] in missing}.values())
+        upload_bytes = sum(f['size'] for f in upload_files)
+        total_bytes = sum(f['size'] for f in files)
+        print(f">> 共 {len(files)} 個檔案，需上傳 {len(upload_files)} 個 ({upload_bytes}/{total_bytes} bytes)")
+
+        # 3. 送出請求 (只含檔案清單)，檔案內容緊接著串流
+        success, _ = self.core.send_request(action, {"game_config": game_config, "manifest": files, "stream": True})
+        if not success:
+            return False
+        try:
+            sent = 0
+            for f in upload_files:
+                sent += self._stream_file(os.path.join(path, f['path']), f['hash'])
+            send_message(self.core.sock, {"end": True})
+        except OSError as e:
+            print(f">> 傳輸中斷: {e}")
+            self.core.disconnect()
+            return False
+        if upload_files:
+            print(f">> 已串流 {sent} bytes (壓縮後)")
+        return True
+
+    def _stream_file(self, file_path, digest):
+        """以 zlib 壓縮單一檔案並分段送出，回傳送出的 bytes"""
+        compressor = zlib.compressobj()
+        sent = 0
+        with open(file_path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(STREAM_CHUNK_SIZE), b''):
+                data = compressor.compress(chunk)
+                if data:
+                    sent += self._send_frame(digest, data, final=False)
+        return sent + self._send_frame(digest, compressor.flush(), final=True)
+
+    def _send_frame(self, digest, data, final):
+        if not send_message(self.core.sock, {"hash": digest, "length": len(data), "final": final}):
+            raise OSError("Connection lost.")
+        self.core.sock.sendall(data)
+        return len(data)
+
     # [修改] 上傳遊戲邏輯
     def _handle_upload(self):
         print("\n=== 上傳新遊戲 (Upload) ===")
@@ -131,25 +186,9 @@ class DeveloperClient:
             
             print(f"正在打包遊戲: {game_config.get('game_name')} (v{game_config.get('version')})...")
 
-            # 4. 壓縮與上傳 (保持不變)
-            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
-                tmp_zip_path = tmp_file.name
-            
-            shutil.make_archive(tmp_zip_path.replace('.zip', ''), 'zip', path)
-            
-            with open(tmp_zip_path, 'rb') as f:
-                zip_data = f.read()
-                zip_b64 = base64.b64encode(zip_data).decode('utf-8')
-            
-            os.remove(tmp_zip_path)
-
-            payload = {
-                "game_config": game_config,
-                "zip_data": zip_b64
-            }
-            
-            self.core.send_request("upload_game", payload)
-            print(">> 上傳請求已發送，正在傳輸資料... (請稍候)") 
+            # 4. 比對檔案清單並串流上傳 (只傳 Server 缺少的檔案)
+            if not self._send_build("upload_game", game_config, path): return
+            print(">> 上傳完成，等待伺服器確認... (請稍候)") 
             
             while self.core.is_connected:
                 status = self._handle_network_messages()
@@ -161,7 +200,6 @@ class DeveloperClient:
                     return
                 elif status == 'DISCONNECTED':
                     return
-                time.sleep(0.1)
 
         except Exception as e:
             print(f"上傳過程發生錯誤: {e}")
@@ -215,18 +253,9 @@ class DeveloperClient:
 
             print(f">> 準備上傳: {new_name} v{new_version}")
 
-            # 打包與傳送 (保持不變)
-            with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tmp_file:
-                tmp_zip_path = tmp_file.name
-            shutil.make_archive(tmp_zip_path.replace('.zip', ''), 'zip', path)
-            with open(tmp_zip_path, 'rb') as f:
-                zip_data = f.read()
-                zip_b64 = base64.b64encode(zip_data).decode('utf-8')
-            os.remove(tmp_zip_path)
-
-            payload = {"game_config": game_config, "zip_data": zip_b64}
-            self.core.send_request("update_game", payload)
-            print(">> 更新請求已發送...")
+            # 比對檔案清單並串流傳送 (未變更的檔案不需要重新上傳)
+            if not self._send_build("update_game", game_config, path): return
+            print(">> 更新資料已送出，等待伺服器確認...")
             
             while self.core.is_connected:
                 status = self._handle_network_messages()
@@ -237,7 +266,6 @@ class DeveloperClient:
                     print(f">> 失敗: {self.message}")
                     return
                 elif status == 'DISCONNECTED': return
-                time.sleep(0.1)
 
         except Exception as e:
             print(f"更新錯誤: {e}")
@@ -282,94 +310,93 @@ class DeveloperClient:
                 return
             elif status == 'DISCONNECTED':
                 return
-            time.sleep(0.1)
 
     def _handle_network_messages(self, timeout=0.1):
-        """檢查並處理來自 ClientCore 的佇列訊息"""
-        messages = self.core.get_received_message()
-        if not messages:
-            # 讓 CPU 稍微休息，避免在迴圈中全速執行
-            time.sleep(timeout)
+        """處理來自 ClientCore 的下一則訊息 (阻塞等待，訊息一到立即處理，最多等 timeout 秒)"""
+        # 一次只取一則，其餘訊息留在佇列中給下一次呼叫，不會被丟棄
+        msg = self.core.next_message(timeout)
+        if msg is None:
             return False
 
-        for msg in messages:
-            response_type = msg.get('type')
-            success = msg.get('success', False)
-            
-            # 處理連線中斷
-            if response_type == 'SERVER_DISCONNECTED':
-                self.message = f"\n[錯誤] 連線中斷: {msg.get('message', '與伺服器失去連線')}"
-                self.user_info = None # 清除登入狀態
-                return 'DISCONNECTED'
-            
-            # 處理登入/註冊回應 (用於登入/註冊流程)
-            elif response_type == 'LOGIN_RESPONSE':
-                if success:
-                    self.user_info = msg['data']
-                    self.message = " 登入成功！"
-                    return 'LOGIN_SUCCESS'
-                else:
-                    self.message = f" 登入失敗: {msg.get('message', '未知錯誤')}"
-                    return 'LOGIN_FAIL'
-                    
-            elif response_type == 'REGISTER_RESPONSE':
-                if success:
-                    self.message = f" 註冊成功: {msg.get('message', '請使用此帳號登入。')}"
-                    return 'REGISTER_SUCCESS'
-                else:
-                    self.message = f" 註冊失敗: {msg.get('message', '未知錯誤')}"
-                    return 'REGISTER_FAIL'
-            
-            # 處理登出回應 (用於主選單流程)
-            elif response_type == 'LOGOUT_RESPONSE':
-                if success:
-                    self.user_info = None
-                    self.message = " 登出成功！"
-                    return 'LOGOUT_SUCCESS'
-                else:
-                    self.message = f" 登出失敗: {msg.get('message', '未知錯誤')}"
-                    return 'LOGOUT_FAIL'
-            
-            # === 新增：上傳回應 ===
-            elif response_type == 'UPLOAD_RESPONSE':
-                if success:
-                    self.message = f" 上傳成功！ {msg.get('message', '')}"
-                    return 'UPLOAD_SUCCESS'
-                else:
-                    self.message = f" 上傳失敗: {msg.get('message', '未知錯誤')}"
-                    return 'UPLOAD_FAIL'
-            
-            elif response_type == 'GAME_LIST_RESPONSE':
-                if success:
-                    return {'status': 'GAME_LIST_SUCCESS', 'data': msg.get('data')}
-                else:
-                    self.message = "無法取得遊戲列表"
-                    return 'GAME_LIST_FAIL'
-            
-            elif response_type == 'UPDATE_RESPONSE':
-                if success:
-                    self.message = f" 更新成功！ {msg.get('message', '')}"
-                    return 'UPDATE_SUCCESS'
-                else:
-                    self.message = f" 更新失敗: {msg.get('message', '未知錯誤')}"
-                    return 'UPDATE_FAIL'
-            
-            elif response_type == 'DELETE_RESPONSE':
-                if success:
-                    self.message = f" 下架成功！ {msg.get('message', '')}"
-                    return 'DELETE_SUCCESS'
-                else:
-                    self.message = f" 下架失敗: {msg.get('message', '未知錯誤')}"
-                    return 'DELETE_FAIL'
-            
-            
-                    
-            # 處理其他未處理的訊息
+        response_type = msg.get('type')
+        success = msg.get('success', False)
+        
+        # 處理連線中斷
+        if response_type == 'SERVER_DISCONNECTED':
+            self.message = f"\n[錯誤] 連線中斷: {msg.get('message', '與伺服器失去連線')}"
+            self.user_info = None # 清除登入狀態
+            return 'DISCONNECTED'
+        
+        # 處理登入/註冊回應 (用於登入/註冊流程)
+        elif response_type == 'LOGIN_RESPONSE':
+            if success:
+                self.user_info = msg['data']
+                self.message = " 登入成功！"
+                return 'LOGIN_SUCCESS'
+            else:
+                self.message = f" 登入失敗: {msg.get('message', '未知錯誤')}"
+                return 'LOGIN_FAIL'
+                
+        elif response_type == 'REGISTER_RESPONSE':
+            if success:
+                self.message = f" 註冊成功: {msg.get('message', '請使用此帳號登入。')}"
+                return 'REGISTER_SUCCESS'
+            else:
+                self.message = f" 註冊失敗: {msg.get('message', '未知錯誤')}"
+                return 'REGISTER_FAIL'
+        
+        # 處理登出回應 (用於主選單流程)
+        elif response_type == 'LOGOUT_RESPONSE':
+            if success:
+                self.user_info = None
+                self.message = " 登出成功！"
+                return 'LOGOUT_SUCCESS'
+            else:
+                self.message = f" 登出失敗: {msg.get('message', '未知錯誤')}"
+                return 'LOGOUT_FAIL'
+        
+        # === 新增：上傳回應 ===
+        elif response_type == 'UPLOAD_RESPONSE':
+            if success:
+                self.message = f" 上傳成功！ {msg.get('message', '')}"
+                return 'UPLOAD_SUCCESS'
             else:
-                 self.message = f"[伺服器回應] {response_type}: {msg}"
-                 return 'UNHANDLED_MESSAGE'
-                 
-        return True # 處理完畢
+                self.message = f" 上傳失敗: {msg.get('message', '未知錯誤')}"
+                return 'UPLOAD_FAIL'
+        
+        elif response_type == 'GAME_LIST_RESPONSE':
+            if success:
+                return {'status': 'GAME_LIST_SUCCESS', 'data': msg.get('data')}
+            else:
+                self.message = "無法取得遊戲列表"
+                return 'GAME_LIST_FAIL'
+        
+        elif response_type == 'UPDATE_RESPONSE':
+            if success:
+                self.message = f" 更新成功！ {msg.get('message', '')}"
+                return 'UPDATE_SUCCESS'
+            else:
+                self.message = f" 更新失敗: {msg.get('message', '未知錯誤')}"
+                return 'UPDATE_FAIL'
+        
+        elif response_type == 'MISSING_BLOBS_RESPONSE':
+            return {'status': 'MISSING_BLOBS', 'data': msg.get('data', {})}
+        
+        elif response_type == 'DELETE_RESPONSE':
+            if success:
+                self.message = f" 下架成功！ {msg.get('message', '')}"
+                return 'DELETE_SUCCESS'
+            else:
+                self.message = f" 下架失敗: {msg.get('message', '未知錯誤')}"
+                return 'DELETE_FAIL'
+        
+        
+                
+        # 處理其他未處理的訊息
+        else:
+             self.message = f"[伺服器回應] {response_type}: {msg}"
+             return 'UNHANDLED_MESSAGE'
+             
 
     # --- CLI 互動方法 ---
 
@@ -404,7 +431,6 @@ class DeveloperClient:
                             return True # 登入成功，進入主選單
                         elif status in ('LOGIN_FAIL', 'DISCONNECTED'):
                             break
-                        time.sleep(0.1) # 避免 CPU 佔用過高
                         
                 elif choice == '2':
                     self.core.send_request("register", {"username": username, "password": password})
@@ -415,7 +441,6 @@ class DeveloperClient:
                         status = self._handle_network_messages()
                         if status in ('REGISTER_SUCCESS', 'REGISTER_FAIL', 'DISCONNECTED'):
                             break
-                        time.sleep(0.1)
                         
             else:
                 self.message = "無效的選擇，請重新輸入。"
@@ -451,7 +476,6 @@ class DeveloperClient:
                         return
                     elif status == 'DISCONNECTED':
                         return
-                    time.sleep(0.1)
             elif choice == '1':
                 self._handle_upload()
             elif choice == '2':
@@ -0,0 +1,195 @@
+# Client/game_cache.py
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import CLIENT_CACHE_DIR, CLIENT_CACHE_MAX_MB, CLIENT_DOWNLOADS_BASE_DIR
+from utils import safe_relpath
+
+
+class GameCache:
+    """同一台電腦上所有玩家共用的遊戲檔案快取 (以 SHA-256 定址)。
+
+    - blobs/ab/abcdef...                 檔案內容，每種內容只存一份
+    - manifests/{game}/{build_hash}.json 某個版本的檔案清單
+
+    玩家的安裝目錄 client_downloads/{username}/{game} 由 hardlink 指向 blob 組成，
+    多個帳號安裝同一版本不會重複下載或佔用空間。
+    哪些版本仍在使用由各安裝目錄的 metadata.json (build_hash) 決定，不需要另外記錄參照。
+    blob 的 mtime 作為最後使用時間，gc() 依此淘汰超過容量上限的檔案 (LRU)。
+    """
+
+    def __init__(self, root=CLIENT_CACHE_DIR, installs_dir=CLIENT_DOWNLOADS_BASE_DIR,
+                 max_bytes=CLIENT_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.installs_dir = installs_dir
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.manifest_dir = os.path.join(root, 'manifests')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    # --- Blob ---
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def put(self, data, digest):
+        """存入下載的檔案內容 (驗證 hash)"""
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Checksum mismatch: {digest}")
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_file(self, src, digest):
+        """把已安裝的本機檔案收進快取 (例如升級前的舊安裝)"""
+        if self.has(digest):
+            return
+        with open(src, 'rb') as f:
+            self.put(f.read(), digest)
+
+    def game_hashes(self, game_name):
+        """快取中該遊戲各版本擁有的檔案 hash (下載時告訴 Server 不必再傳)"""
+        hashes = set()
+        for manifest in self._manifests(game_name):
+            hashes.update(f['hash'] for f in manifest['files'] if self.has(f['hash']))
+        return hashes
+
+    # --- 安裝 ---
+
+    def install(self, game_name, build_hash, files, target_dir, metadata):
+        """依檔案清單把版本安裝到 target_dir (所有 blob 必須已在快取中)"""
+        # 1. 記錄版本清單
+        manifest_path = os.path.join(self.manifest_dir, game_name, f"{build_hash}.json")
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(f"{manifest_path}.tmp{os.getpid()}", 'w', encoding='utf-8') as f:
+            json.dump({'game_name': game_name, 'build_hash': build_hash, 'files': files}, f)
+        os.replace(f"{manifest_path}.tmp{os.getpid()}", manifest_path)
+
+        # 2. 在暫存目錄組出安裝內容
+        tmp_dir = f"{target_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            now = time.time()
+            for f in files:
+                dest = os.path.join(tmp_dir, safe_relpath(f['path']))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                self._link_or_copy(f['hash'], dest, f.get('mode', 0o644))
+                os.utime(self.blob_path(f['hash']), (now, now)) # 更新 LRU 時間
+            with open(os.path.join(tmp_dir, 'metadata.json'), 'w', encoding='utf-8') as fp:
+                json.dump(dict(metadata, build_hash=build_hash), fp)
+
+            # 3. 替換舊目錄
+            old_dir = f"{target_dir}.old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(target_dir):
+                os.rename(target_dir, old_dir)
+            os.rename(tmp_dir, target_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _link_or_copy(self, digest, dest, mode):
+        src = self.blob_path(digest)
+        # 有執行權限的檔案需要自己的 mode，不與 blob 共用 inode
+        if not mode & 0o111:
+            try:
+                os.link(src, dest)
+                return
+            except OSError:
+                pass # 不支援 hardlink (例如 FAT 檔案系統)，改用複製
+        shutil.copyfile(src, dest)
+        os.chmod(dest, mode)
+
+    # --- 清理 ---
+
+    def gc(self):
+        """容量超過上限時依 LRU 淘汰沒有玩家安裝的檔案，並刪除已不完整且沒人使用的版本清單。
+
+        回傳 (刪除的 blob 數量, 快取目前大小 bytes)
+        """
+        # 1. 掃描所有玩家的安裝目錄，找出仍在使用的版本
+        in_use = set()
+        if os.path.isdir(self.installs_dir):
+            for username in os.listdir(self.installs_dir):
+                user_dir = os.path.join(self.installs_dir, username)
+                if not os.path.isdir(user_dir):
+                    continue
+                for game_name in os.listdir(user_dir):
+                    try:
+                        with open(os.path.join(user_dir, game_name, 'metadata.json'), 'r', encoding='utf-8') as f:
+                            in_use.add((game_name, json.load(f).get('build_hash')))
+                    except (OSError, ValueError):
+                        pass
+
+        manifests = []
+        referenced = set()
+        for game_name in os.listdir(self.manifest_dir):
+            for manifest in self._manifests(game_name):
+                used = (game_name, manifest['build_hash']) in in_use
+                manifests.append((manifest, used))
+                if used:
+                    referenced.update(f['hash'] for f in manifest['files'])
+
+        # 2. 超過容量上限時，從最久沒用到的未參照 blob 開始刪除
+        blobs = []
+        total = 0
+        for prefix in os.listdir(self.blob_dir):
+            prefix_dir = os.path.join(self.blob_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                st = os.stat(os.path.join(prefix_dir, digest))
+                total += st.st_size
+                if digest not in referenced:
+                    blobs.append((st.st_mtime, st.st_size, digest))
+
+        removed = 0
+        for _, size, digest in sorted(blobs):
+            if total <= self.max_bytes:
+                break
+            os.remove(self.blob_path(digest))
+            total -= size
+            removed += 1
+
+        # 3. 沒人使用、且檔案已被淘汰的版本清單不再有用
+        for manifest, used in manifests:
+            if not used and not all(self.has(f['hash']) for f in manifest['files']):
+                os.remove(os.path.join(self.manifest_dir, manifest['game_name'], f"{manifest['build_hash']}.json"))
+
+        if removed:
+            print(f">> 快取清理: 移除 {removed} 個檔案，目前 {total // 1024} KB")
+        return removed, total
+
+    def _manifests(self, game_name):
+        folder = os.path.join(self.manifest_dir, game_name)
+        if not os.path.isdir(folder):
+            return []
+        manifests = []
+        for filename in os.listdir(folder):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(folder, filename), 'r', encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError):
+                pass
+        return manifests
@@ -0,0 +1,174 @@
+# Client/game_launcher.py
+"""常駐的遊戲客戶端啟動器 (每個登入的玩家一個，僅 POSIX)。
+
+LobbyClient 登入後在背景啟動這個程序，它先把遊戲客戶端常用的模組 (含 pygame) 載入好，
+之後每場遊戲開始時直接 fork 出子程序執行 client.py：
+不需要重新啟動 Python、也不需要重新載入 pygame，遊戲視窗幾乎立即出現。
+
+兩個程序之間以 socketpair 溝通 (長度前綴 JSON，同 utils.send_message)：
+    請求 {'cwd': 遊戲目錄, 'argv': ['client.py', '--connect', ...]}
+    回應 {'success': True, 'pid': 子程序 pid}
+LobbyClient 結束時連線關閉，啟動器隨之結束。
+"""
+import os
+import sys
+import json
+import struct
+import socket
+
+# 專案根目錄 (只加入子程序的 PYTHONPATH，讓遊戲可以 import game_sdk)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 啟動器本身不 import 專案的模組 (config / utils ...)，
+# 避免 fork 出的遊戲 import 同名模組時拿到 sys.modules 中的專案版本
+PRELOAD_MODULES = ['socket', 'argparse', 'threading', 'json', 'random', 'time', 'pygame']
+
+
+def _send(sock, data):
+    payload = json.dumps(data).encode('utf-8')
+    sock.sendall(struct.pack('!I', len(payload)) + payload)
+
+
+def _receive(sock):
+    header = b''
+    while len(header) < 4:
+        chunk = sock.recv(4 - len(header))
+        if not chunk:
+            return None
+        header += chunk
+    length = struct.unpack('!I', header)[0]
+    payload = b''
+    while len(payload) < length:
+        chunk = sock.recv(length - len(payload))
+        if not chunk:
+            return None
+        payload += chunk
+    return json.loads(payload.decode('utf-8'))
+
+
+class GameLauncher:
+    """LobbyClient 端：管理常駐啟動器程序，不支援時 launch() 回傳 False (改用一般的 subprocess 啟動)"""
+
+    def __init__(self):
+        self.proc = None
+        self.sock = None
+
+    @property
+    def available(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        if self.available or not hasattr(os, 'fork'):
+            return
+        import subprocess
+        parent_sock, child_sock = socket.socketpair()
+        try:
+            # stdin / stdout 沿用目前的終端機，CLI 遊戲可以直接與玩家互動
+            python_path = os.pathsep.join(p for p in (BASE_DIR, os.environ.get('PYTHONPATH')) if p)
+            self.proc = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--fd', str(child_sock.fileno())],
+                pass_fds=(child_sock.fileno(),),
+                env=dict(os.environ, PYTHONPATH=python_path)
+            )
+            self.sock = parent_sock
+        except OSError as e:
+            print(f">> 無法啟動常駐遊戲啟動器: {e}")
+            parent_sock.close()
+        finally:
+            child_sock.close()
+
+    def launch(self, cwd, argv):
+        """請啟動器 fork 出遊戲客戶端；argv 不含直譯器 (例如 ['client.py', '--connect', ...])"""
+        if not self.available:
+            return False
+        try:
+            _send(self.sock, {'cwd': cwd, 'argv': argv})
+            response = _receive(self.sock)
+        except OSError:
+            response = None
+        if not response or not response.get('success'):
+            if response:
+                print(f">> 啟動器錯誤: {response.get('message')}")
+            return False
+        return True
+
+    def stop(self):
+        if self.sock:
+            self.sock.close() # 啟動器讀到 EOF 後自行結束
+            self.sock = None
+        if self.proc:
+            try:
+                self.proc.wait(timeout=2)
+            except Exception:
+                self.proc.kill()
+            self.proc = None
+
+
+# --- 啟動器程序 ---
+
+def _preload():
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass # 沒有安裝 pygame 時只有 CLI 遊戲，不影響
+    # pygame.init() 留給遊戲自己呼叫：視窗 / 音效裝置不能在 fork 之前開啟
+
+
+def _run_game(cwd, argv):
+    """在 fork 出的子程序中執行遊戲客戶端 (等同於在 cwd 執行 python argv...)，不會返回"""
+    import runpy
+    import signal
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    exit_code = 0
+    try:
+        os.chdir(cwd)
+        sys.argv = list(argv)
+        sys.path[0] = cwd
+        script = argv[0]
+        if os.path.dirname(script) == '' and script.endswith('.py'):
+            # 以模組方式執行才會使用上架時預先編譯的 __pycache__/*.pyc
+            runpy.run_module(script[:-3], run_name='__main__', alter_sys=True)
+        else:
+            runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def serve(control_fd):
+    import signal
+    sock = socket.socket(fileno=control_fd)
+    # 結束的遊戲子程序自動回收 (不會變成 zombie)；終端機的 Ctrl+C 交給 LobbyClient 與遊戲處理
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _preload()
+
+    while True:
+        request = _receive(sock)
+        if request is None:
+            break
+        try:
+            pid = os.fork()
+        except OSError as e:
+            _send(sock, {'success': False, 'message': str(e)})
+            continue
+        if pid == 0:
+            sock.close()
+            _run_game(request['cwd'], request['argv'])
+        _send(sock, {'success': True, 'pid': pid})
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Resident game client launcher')
+    parser.add_argument('--fd', type=int, required=True)
+    args = parser.parse_args()
+    serve(args.fd)
@@ -2,19 +2,22 @@
 import sys
 import os
 import time
-import base64
-import shutil
-import zipfile
-import io
 import json
-import subprocess
+import shutil
+import threading
+# base64 / zipfile / subprocess 只在下載與啟動遊戲時用到，在使用的地方才 import (加快啟動)
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
-sys.path.append(parent_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 
-from config import CLIENT_DOWNLOADS_BASE_DIR 
+from config import CLIENT_DOWNLOADS_BASE_DIR, RESIDENT_GAME_LAUNCHER, ensure_dirs
 from client_core import PlayerClientCore
+from game_cache import GameCache
+from catalog_cache import CatalogCache
+from game_launcher import GameLauncher
+from utils import build_manifest, safe_relpath
 
 def get_input(prompt):
     return input(prompt).strip()
@@ -24,22 +27,25 @@ class LobbyClient:
         self.user_info = None
         self.message = ""
         self.core = PlayerClientCore() # 使用 Player 版核心
-        self.msg_buffer = []
+        self.cache = GameCache() # 同一台電腦所有玩家共用的遊戲檔案快取
+        self.prefetching = {} # {game_name: threading.Event} 背景下載中的遊戲，完成時 set
+        self.install_lock = threading.Lock() # 背景下載與手動下載不能同時寫入安裝目錄
+        # 背景預先下載的回應由網路線程直接處理，不經過目前的選單
+        self.core.on('DOWNLOAD_RESPONSE', self._on_prefetch_response)
+        # 商城列表快取：開啟商城時直接顯示，Server 的變更由網路線程在背景套用
+        self.catalog = CatalogCache()
+        self.catalog_refreshed = threading.Event()
+        self.core.on('GAME_LIST_RESPONSE', self._on_catalog_response)
+        # 常駐遊戲啟動器 (登入後啟動) 與已安裝遊戲的 metadata (安裝時更新，啟動遊戲不必再讀檔)
+        self.launcher = GameLauncher()
+        self.metadata_cache = {} # {(username, game_name): metadata}
 
     def _handle_network_messages(self, timeout=0.1):
-        # 1. 從 Core 撈取新訊息，加入緩衝區
-        new_messages = self.core.get_received_message()
-        if new_messages:
-            self.msg_buffer.extend(new_messages)
-        
-        # 2. 如果緩衝區是空的，稍微等待
-        if not self.msg_buffer:
-            time.sleep(timeout)
+        # 1. 阻塞等待 Core 的下一則訊息 (訊息一到立即返回，最多等 timeout 秒)
+        msg = self.core.next_message(timeout)
+        if msg is None:
             return False
-            
-        # 3. 從緩衝區取出「第一則」訊息處理 (使用 pop(0))
-        msg = self.msg_buffer.pop(0)
-        
+
         response_type = msg.get('type')
         success = msg.get('success')
         
@@ -71,19 +77,80 @@ class LobbyClient:
                 self.message = f"下載失敗: {msg.get('message')}"
                 return {'status': 'DOWNLOAD_FAIL'}
         
-        # 4. 回傳該訊息 (給其他特定邏輯處理，如 START_GAME, ROOM_INFO 等)
+        # 2. 回傳該訊息 (給其他特定邏輯處理，如 START_GAME, ROOM_INFO 等)
         return msg
 
-    def _get_local_game_version(self, game_name):
+    def _get_local_game_metadata(self, game_name):
         try:
             username = self.user_info['username']
+            key = (username, game_name)
+            if key in self.metadata_cache:
+                return self.metadata_cache[key]
             meta_path = os.path.join(CLIENT_DOWNLOADS_BASE_DIR, username, game_name, 'metadata.json')
             if os.path.exists(meta_path):
                 with open(meta_path, 'r', encoding='utf-8') as f:
-                    return json.load(f).get('version')
+                    self.metadata_cache[key] = json.load(f)
+                    return self.metadata_cache[key]
         except Exception:
             pass
-        return None
+        return {}
+
+    def _get_local_game_version(self, game_name):
+        return self._get_local_game_metadata(game_name).get('version')
+
+    # --- 背景預先下載 ---
+
+    def _prefetch_room_games(self, rooms):
+        """看到房間列表或邀請時，先在背景下載房間需要、但本機還沒有的版本"""
+        for r in rooms:
+            game_name = r['game_name']
+            build_hash = r.get('build_hash')
+            if not build_hash or game_name in self.prefetching:
+                continue
+            if self._get_local_game_metadata(game_name).get('build_hash') == build_hash:
+                continue
+            self.prefetching[game_name] = threading.Event()
+            self.core.send_request("download_game", {
+                "game_name": game_name,
+                "installed": self._get_installed_manifest(game_name),
+                "cached": sorted(self.cache.game_hashes(game_name)),
+                "prefetch": True
+            })
+
+    def _on_prefetch_response(self, msg):
+        """收到預先下載的回應：在背景執行緒安裝，不阻塞選單 (一般下載的回應回傳 False 交給選單)"""
+        game_name = msg.get('prefetch')
+        if not game_name:
+            return False
+        done = self.prefetching.get(game_name)
+
+        def install():
+            status = None
+            try:
+                if msg.get('success'):
+                    status = self._save_game_files(msg['data'])
+            finally:
+                if status == 'INSTALL_FAIL':
+                    print(f"\n>> 背景下載 '{game_name}' 失敗，請至商城重新下載。")
+                if status == 'INSTALL_NEED_FULL':
+                    # 差異更新缺少檔案：改為完整下載，完成前仍視為背景下載中
+                    self.core.send_request("download_game", {"game_name": game_name, "prefetch": True})
+                else:
+                    self.prefetching.pop(game_name, None)
+                    if done:
+                        done.set()
+        threading.Thread(target=install, daemon=True).start()
+        return True
+
+    def _wait_for_prefetch(self, game_name):
+        """加入房間前，若該遊戲正在背景下載就等它完成"""
+        done = self.prefetching.get(game_name)
+        if not done:
+            return
+        print(f">> 正在完成 '{game_name}' 的背景下載...")
+        # 回應由網路線程處理，這裡只需等待安裝完成
+        while self.core.is_connected and not done.wait(1):
+            pass
 
     def _my_games_menu(self):
         while self.core.is_connected:
@@ -180,6 +247,7 @@ class LobbyClient:
             
             if isinstance(res, dict) and res.get('type') == 'ROOM_LIST_RESPONSE':
                 room_list = res.get('data', [])
+                self._prefetch_room_games(room_list)
                 break
             # 處理其他突發訊息 (如登出)
             elif res == 'LOGOUT_SUCCESS': return
@@ -211,7 +279,8 @@ class LobbyClient:
             if target_room:
                 game_name = target_room['game_name']
                 
-                # 4. === 關鍵：本地版本檢查 ===
+                # 4. === 關鍵：本地版本檢查 (背景下載中則先等待完成) ===
+                self._wait_for_prefetch(game_name)
                 local_version = self._get_local_game_version(game_name)
                 if not local_version:
                     print(f"  [錯誤] 您尚未下載遊戲 '{game_name}'，無法加入。")
@@ -291,6 +360,7 @@ class LobbyClient:
             
             if isinstance(res, dict) and res.get('type') == 'INVITE_LIST_RESPONSE':
                 invite_list = res.get('data', [])
+                self._prefetch_room_games(invite_list)
                 break
             # 處理突發登出
             elif res == 'LOGOUT_SUCCESS': return
@@ -322,7 +392,8 @@ class LobbyClient:
             if target_invite:
                 game_name = target_invite['game_name']
                 
-                # 4. === 關鍵：本地版本檢查 ===
+                # 4. === 關鍵：本地版本檢查 (背景下載中則先等待完成) ===
+                self._wait_for_prefetch(game_name)
                 local_version = self._get_local_game_version(game_name)
                 
                 if not local_version:
@@ -390,6 +461,7 @@ class LobbyClient:
                     print(">> (遊戲進行中... 請等待遊戲結束)")
                     
                     # --- 進入鎖定迴圈 ---
+                    joined = []
                     while self.core.is_connected:
                         time.sleep(1) # 每秒檢查一次
                         self.core.send_request("get_room_info")
@@ -402,6 +474,10 @@ class LobbyClient:
                             if isinstance(res, dict) and res.get('type') == 'ROOM_INFO_RESPONSE':
                                 if res.get('data'):
                                     new_status = res['data']['status']
+                                    # 遊戲伺服器回報的已連線玩家有變化時顯示
+                                    if res['data'].get('joined_players', joined) != joined:
+                                        joined = res['data']['joined_players']
+                                        print(f">> 已進入遊戲: {', '.join(joined)}")
                                 break
                             elif res == 'LOGOUT_SUCCESS': return
                         
@@ -421,6 +497,14 @@ class LobbyClient:
             for p in room_info['players']:
                 role = "(Host)" if p == room_info['host'] else ""
                 print(f"  - {p} {role}")
+            if room_info['status'] == 'QUEUED':
+                print(f">> 伺服器忙碌中，排隊等待啟動 (第 {room_info.get('queue_position')} 位)，請按 Enter 刷新")
+            elif room_info['status'] == 'STARTING':
+                print(">> 遊戲伺服器啟動中，請按 Enter 刷新")
+            elif room_info.get('start_error'):
+                print(f">> 上次啟動失敗: {room_info['start_error']}")
+                for line in room_info.get('game_log_tail', []):
+                    print(f"   | {line}")
             print("-" * 30)
             
             is_host = (self.user_info['username'] == room_info['host'])
@@ -448,6 +532,8 @@ class LobbyClient:
                         if isinstance(res, dict) and res.get('type') == 'START_GAME_RESPONSE':
                             if not res['success']:
                                 print(f">> 啟動失敗: {res['message']}")
+                            elif res.get('data', {}).get('queue_position'):
+                                print(f">> 伺服器忙碌，已排入佇列 (第 {res['data']['queue_position']} 位)")
                             break
                 else:
                     self.core.send_request("leave_room")
@@ -472,7 +558,6 @@ class LobbyClient:
                             break
                             
                     elif res == 'DISCONNECTED': return
-                    time.sleep(0.1)
 
                 if not online_list:
                     print("  (目前沒有其他玩家在線)")
@@ -530,25 +615,36 @@ class LobbyClient:
                         break
         return True
 
+    def _refresh_catalog(self):
+        """向 Server 查詢快取之後的商城變更 (不等待回應)"""
+        self.catalog_refreshed.clear()
+        self.core.send_request("get_game_list", {"since": self.catalog.since()})
+
+    def _on_catalog_response(self, msg):
+        """收到商城列表 (完整或增量)：套用到快取並寫入檔案"""
+        if msg.get('success'):
+            self.catalog.apply(msg)
+        else:
+            self.message = "無法取得遊戲列表"
+        self.catalog_refreshed.set()
+        return True
+
     def _browse_store(self):
-        self.message = "正在載入商城..."
-        print(f"\n>> {self.message}")
-        
-        # 1. 發送請求
-        self.core.send_request("get_game_list")
-        
-        # 2. 等待資料
-        games_data = {}
-        while self.core.is_connected:
-            result = self._handle_network_messages()
-            # 注意：這裡 result 可能是 dict (成功時) 或字串 (其他狀態)
-            if isinstance(result, dict) and result['status'] == 'GAME_LIST_SUCCESS':
-                games_data = result['data']
-                break
-            elif isinstance(result, dict) and result['status'] == 'GAME_LIST_FAIL':
-                print("載入失敗。")
+        # 1. 背景查詢變更；有快取時直接顯示，不等待 Server
+        self._refresh_catalog()
+        if self.catalog.is_loaded:
+            print("\n>> 已載入商城 (背景更新中...)")
+        else:
+            self.message = "正在載入商城..."
+            print(f"\n>> {self.message}")
+
+            # 2. 第一次開啟 (沒有快取) 才需要等待完整列表
+            while self.core.is_connected and not self.catalog_refreshed.wait(0.5):
+                pass
+            if not self.core.is_connected:
                 return
-            elif result == 'DISCONNECTED':
+            if not self.catalog.is_loaded and not self.catalog.games:
+                print("載入失敗。")
                 return
         
         # 3. 顯示列表迴圈
@@ -557,8 +653,9 @@ class LobbyClient:
             print("  🛒 遊戲商城 (Game Store)")
             print("="*30)
             
-            # 將字典轉為列表以便用數字選擇
+            # 將字典轉為列表以便用數字選擇 (每次重新讀取快取，背景更新的結果下次顯示就會出現)
             # games_data = {'Snake': {...}, 'Tetris': {...}}
+            games_data = self.catalog.games
             game_list = list(games_data.items()) # [('Snake', {...}), ('Tetris', {...})]
             
             if not game_list:
@@ -590,15 +687,26 @@ class LobbyClient:
 
     def _handle_download(self, game_name):
         print(f"\n>> 正在下載 '{game_name}' ...")
-        self.core.send_request("download_game", {"game_name": game_name})
+        # 附上本機已安裝的檔案清單，Server 只會回傳有變更的檔案
+        # 以及共用快取中已有的檔案 (同一台電腦其他帳號下載過的版本)
+        installed = self._get_installed_manifest(game_name)
+        cached = sorted(self.cache.game_hashes(game_name))
+        self.core.send_request("download_game", {"game_name": game_name, "installed": installed, "cached": cached})
         
         while self.core.is_connected:
             result = self._handle_network_messages()
             
             if isinstance(result, dict) and result['status'] == 'DOWNLOAD_SUCCESS':
                 data = result['data']
-                self._save_game_files(data)
-                print(f">> 下載完成！版本: {data.get('version')}")
+                status = self._save_game_files(data)
+                if status == 'INSTALL_NEED_FULL':
+                    # 差異更新缺少檔案：不附已安裝清單重新請求，Server 會回傳完整的 zip
+                    self.core.send_request("download_game", {"game_name": game_name})
+                    continue
+                if status == 'INSTALL_OK':
+                    print(f">> 下載完成！版本: {data.get('version')}")
+                else:
+                    print(">> 下載失敗，安裝內容未變更。")
                 input("按 Enter 繼續...")
                 break
                 
@@ -610,47 +718,134 @@ class LobbyClient:
             elif result == 'DISCONNECTED':
                 break
 
+    def _get_installed_manifest(self, game_name):
+        """掃描本機安裝目錄，回傳檔案清單 (尚未安裝則為空清單)"""
+        target_dir = os.path.join(CLIENT_DOWNLOADS_BASE_DIR, self.user_info['username'], game_name)
+        if not os.path.isdir(target_dir):
+            return []
+        # 上架時預先編譯的 __pycache__/*.pyc 也在版本清單中，不能略過，否則每次更新都會重新下載
+        installed = build_manifest(target_dir, ignore_dirs=('.git',))
+        return [f for f in installed if f['path'] != 'metadata.json']
+
     def _save_game_files(self, data):
-        """將下載的資料解壓縮到玩家專屬目錄"""
+        """將下載的資料寫入玩家專屬目錄 (背景下載與手動下載共用，一次只寫一個)。
+        回傳 'INSTALL_OK'、'INSTALL_NEED_FULL' (差異更新缺少檔案內容，需要改為完整下載) 或 'INSTALL_FAIL'"""
+        with self.install_lock:
+            try:
+                return self._write_game_files(data)
+            finally:
+                # 安裝內容已變更，下次重新讀取 metadata.json
+                self.metadata_cache.pop((self.user_info['username'], data.get('game_name')), None)
+
+    def _write_game_files(self, data):
+        tmp_dir = None
         try:
             game_name = data['game_name']
             version = data['version']
-            zip_b64 = data['zip_data']
             username = self.user_info['username']
             
             # 1. 設定目標路徑: client_downloads/{username}/{game_name}
             # 這樣不同玩家登入同一台電腦，檔案也是分開的
             target_dir = os.path.join(CLIENT_DOWNLOADS_BASE_DIR, username, game_name)
-            
-            # 2. 如果是更新，先清空舊檔案
-            if os.path.exists(target_dir):
-                print(">> 偵測到舊版本，正在移除...")
-                shutil.rmtree(target_dir)
-            
-            os.makedirs(target_dir, exist_ok=True)
-            
-            # 3. 解碼並解壓縮
-            zip_data = base64.b64decode(zip_b64)
-            
-            # 使用 io.BytesIO 將二進位資料轉為類似檔案的物件，直接解壓
-            with zipfile.ZipFile(io.BytesIO(zip_data)) as zf:
-                zf.extractall(target_dir)
+            metadata = {
+                "version": version,
+                # === [修改] 儲存 client_cmd ===
+                # "exe_cmd": data.get('exe_cmd'), 
+                "client_cmd": data.get('client_cmd'),
+                # ============================
+                "is_gui": data.get('is_gui')
+            }
+
+            # 2. 差異更新：檔案放進共用快取，安裝目錄以 hardlink 組成
+            if data.get('delta'):
+                return 'INSTALL_OK' if self._install_delta(data, target_dir, metadata) else 'INSTALL_NEED_FULL'
+
+            # 3. 舊版 Server：在暫存目錄解壓整包 zip，完成後再替換
+            tmp_dir = f"{target_dir}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            import io, base64, zipfile
+            with zipfile.ZipFile(io.BytesIO(base64.b64decode(data['zip_data']))) as zf:
+                zf.extractall(tmp_dir)
                 
-            # 4. (選用) 寫入一個 metadata.json 紀錄目前安裝的版本，方便 P3 啟動時檢查
-            import json
-            meta_path = os.path.join(target_dir, 'metadata.json')
+            # 4. 寫入 metadata.json 紀錄目前安裝的版本，方便 P3 啟動時檢查
+            if data.get('build_hash'):
+                metadata['build_hash'] = data['build_hash']
+            meta_path = os.path.join(tmp_dir, 'metadata.json')
             with open(meta_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "version": version,
-                    # === [修改] 儲存 client_cmd ===
-                    # "exe_cmd": data.get('exe_cmd'), 
-                    "client_cmd": data.get('client_cmd'),
-                    # ============================
-                    "is_gui": data.get('is_gui')
-                }, f)
+                json.dump(metadata, f)
+
+            # 5. 替換舊目錄
+            old_dir = f"{target_dir}.old"
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(target_dir):
+                os.rename(target_dir, old_dir)
+            os.rename(tmp_dir, target_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            return 'INSTALL_OK'
                 
         except Exception as e:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
             print(f">> 檔案寫入錯誤: {e}")
+            return 'INSTALL_FAIL'
+
+    def _install_delta(self, data, target_dir, metadata):
+        """套用差異更新：組出新版本的完整檔案清單後從共用快取安裝。
+        下載失敗、或有檔案的內容在快取與本機都找不到時不安裝，回傳 False"""
+        import base64
+        # 1. 新版本 = 目前安裝的檔案 - 刪除清單 + 新增/變更的檔案
+        installed = self._get_installed_manifest(data['game_name'])
+        files = {f['path']: f for f in installed}
+        for path in data.get('delete', []):
+            files.pop(path, None)
+        for f in data.get('changed', []):
+            files[f['path']] = f
+
+        # 2. 下載的內容存入快取 (驗證 hash)
+        # 較大的檔案由下載服務分段平行傳輸 (不佔用大廳連線)
+        # 重試後仍失敗或 checksum 不符時不安裝，改為完整下載
+        blobs = data.get('blobs', {})
+        transfer = data.get('transfer')
+        try:
+            for digest, blob_b64 in blobs.items():
+                self.cache.put(base64.b64decode(blob_b64), digest)
+            downloaded = len(blobs)
+
+            if transfer:
+                total_kb = sum(c['length'] for c in transfer['chunks']) // 1024
+                print(f">> 正在分段下載 {len(transfer['chunks'])} 個區塊 ({total_kb} KB)...")
+                from range_download import fetch_blobs
+                fetched = fetch_blobs(transfer)
+                for digest, content in fetched.items():
+                    self.cache.put(content, digest)
+                downloaded += len(fetched)
+        except (OSError, ValueError) as e:
+            print(f">> 下載差異檔案失敗 ({e})，改為完整下載...")
+            return False
+
+        # 3. 快取沒有、但舊安裝裡有的內容 (例如快取已被清理) 先收進快取
+        # 請求之後快取被清理、或安裝目錄的檔案被修改時會找不到，改為完整下載
+        local_files = {f['hash']: f['path'] for f in installed}
+        for f in files.values():
+            if self.cache.has(f['hash']):
+                continue
+            local_path = local_files.get(f['hash'])
+            try:
+                if local_path is None:
+                    raise FileNotFoundError(f['path'])
+                self.cache.put_file(os.path.join(target_dir, safe_relpath(local_path)), f['hash'])
+            except (OSError, ValueError):
+                print(f">> 本機找不到 {f['path']} 的內容，改為完整下載...")
+                return False
+
+        self.cache.install(data['game_name'], data['build_hash'], list(files.values()), target_dir, metadata)
+        print(f">> 差異更新: {len(data.get('changed', []))} 個檔案變更 "
+              f"({downloaded} 個需下載)，{len(data.get('delete', []))} 個檔案刪除")
+
+        # 4. 清理沒人使用的舊版本
+        self.cache.gc()
+        return True
 
     def _show_game_details(self, name, info):
         """顯示單一遊戲詳情 (含評論)"""
@@ -734,33 +929,36 @@ class LobbyClient:
         
         username = self.user_info['username']
         game_dir = os.path.join(CLIENT_DOWNLOADS_BASE_DIR, username, game_name)
-        meta_path = os.path.join(game_dir, 'metadata.json')
         
         try:
-            # 1. 讀取啟動指令
-            client_cmd = []
-            if os.path.exists(meta_path):
-                with open(meta_path, 'r', encoding='utf-8') as f:
-                    meta = json.load(f)
-                    client_cmd = meta.get('client_cmd', []) # 例如 ["python", "client.py"]
+            # 1. 讀取啟動指令 (安裝時已快取的 metadata)
+            client_cmd = self._get_local_game_metadata(game_name).get('client_cmd', []) # 例如 ["python", "client.py"]
 
             if not client_cmd:
                 print(">> [錯誤] 找不到啟動指令 (metadata.json 損毀或舊版本)")
                 return
             
-            if client_cmd and client_cmd[0] == 'python':
-                client_cmd = list(client_cmd)
-                client_cmd[0] = sys.executable
-
             # 2. 組合完整指令
             # 格式: python client.py --connect IP:PORT --username NAME
-            full_cmd = client_cmd + ["--connect", f"{server_ip}:{server_port}", "--username", username]
+            game_args = ["--connect", f"{server_ip}:{server_port}", "--username", username]
+
+            # 3. Python 遊戲交給常駐啟動器 fork (已預先載入 pygame)，不支援時照舊啟動新程序
+            # cwd=game_dir 確保遊戲程式能找到它自己的圖片/音效
+            if client_cmd[0] == 'python' and self.launcher.launch(game_dir, list(client_cmd[1:]) + game_args):
+                print(">> 遊戲視窗已開啟。")
+                return
+
+            if client_cmd[0] == 'python':
+                client_cmd = list(client_cmd)
+                client_cmd[0] = sys.executable
+            full_cmd = client_cmd + game_args
             
             print(f">> 執行指令: {' '.join(full_cmd)}")
 
-            # 3. 啟動子程序
-            # cwd=game_dir 確保遊戲程式能找到它自己的圖片/音效
-            subprocess.Popen(full_cmd, cwd=game_dir)
+            # 專案根目錄加入 PYTHONPATH，讓遊戲可以 import game_sdk (與 Server 端啟動遊戲伺服器相同)
+            import subprocess
+            python_path = os.pathsep.join(p for p in (parent_dir, os.environ.get('PYTHONPATH')) if p)
+            subprocess.Popen(full_cmd, cwd=game_dir, env=dict(os.environ, PYTHONPATH=python_path))
             
             print(">> 遊戲視窗已開啟。")
             
@@ -799,8 +997,13 @@ class LobbyClient:
                 if not self.user_info:
                     if not self._login_menu(): break
                 else:
+                    # 登入後在背景準備好遊戲啟動器，遊戲開始時不必冷啟動 Python / pygame
+                    if RESIDENT_GAME_LAUNCHER:
+                        self.launcher.start()
                     self._main_menu()
             self.core.disconnect()
+        self.launcher.stop()
 
 if __name__ == '__main__':
+    ensure_dirs(CLIENT_DOWNLOADS_BASE_DIR)
     LobbyClient().start()
\ No newline at end of file
@@ -0,0 +1,101 @@
+# Client/range_download.py
+import os
+import sys
+import queue
+import socket
+import hashlib
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from config import DOWNLOAD_PARALLEL
+from utils import send_message, receive_message, receive_exact
+
+# 單一分段失敗時的重試次數 (每次重試會開新連線)
+MAX_RETRIES = 2
+
+
+def fetch_blobs(transfer, parallel=DOWNLOAD_PARALLEL, on_progress=None):
+    """依 Lobby 給的分段清單，開 parallel 條連線平行下載，回傳 {hash: bytes}。
+
+    transfer: {'host', 'port', 'token', 'chunks': [{'hash', 'offset', 'length', 'sha256'}]}
+    每個分段都會比對 SHA-256，任何分段重試後仍失敗就丟出 IOError。
+    on_progress(done_bytes, total_bytes) 於每完成一個分段時呼叫 (在下載執行緒中)。
+    """
+    chunks = transfer['chunks']
+    total = sum(c['length'] for c in chunks)
+    pending = queue.Queue()
+    for chunk in chunks:
+        pending.put((chunk, 0))
+
+    results = {} # {(hash, offset): bytes}
+    errors = []
+    done = [0]
+    lock = threading.Lock()
+
+    def worker():
+        sock = None
+        try:
+            while not errors:
+                try:
+                    chunk, attempt = pending.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if sock is None:
+                        sock = socket.create_connection((transfer['host'], transfer['port']), timeout=30)
+                    data = _fetch_chunk(sock, transfer['token'], chunk)
+                except (OSError, ValueError) as e:
+                    if sock:
+                        sock.close()
+                        sock = None
+                    if attempt < MAX_RETRIES:
+                        pending.put((chunk, attempt + 1))
+                    else:
+                        errors.append(f"{chunk['hash'][:12]}@{chunk['offset']}: {e}")
+                    continue
+                with lock:
+                    results[(chunk['hash'], chunk['offset'])] = data
+                    done[0] += len(data)
+                    progress = done[0]
+                if on_progress:
+                    on_progress(progress, total)
+        finally:
+            if sock:
+                sock.close()
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(parallel, len(chunks))))]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    if errors:
+        raise IOError(f"Download failed: {errors[0]}")
+
+    # 依 offset 組回完整檔案並再次驗證整個檔案的 hash
+    blobs = {}
+    for digest in dict.fromkeys(c['hash'] for c in chunks):
+        parts = sorted((offset, data) for (h, offset), data in results.items() if h == digest)
+        content = b''.join(data for _, data in parts)
+        if hashlib.sha256(content).hexdigest() != digest:
+            raise IOError(f"Checksum mismatch: {digest}")
+        blobs[digest] = content
+    return blobs
+
+
+def _fetch_chunk(sock, token, chunk):
+    send_message(sock, {'token': token, 'hash': chunk['hash'], 'offset': chunk['offset'], 'length': chunk['length']})
+    header = receive_message(sock)
+    if header is None:
+        raise OSError('Connection closed.')
+    if not header.get('success'):
+        raise OSError(header.get('message', 'Download refused.'))
+    data = receive_exact(sock, header['length'])
+    if data is None:
+        raise OSError('Connection closed.')
+    if hashlib.sha256(data).hexdigest() != chunk['sha256']:
+        raise ValueError('Chunk checksum mismatch.')
+    return data
@@ -3,6 +3,8 @@ import argparse
 import threading
 import sys
 
+from game_sdk import FrameReader # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 class GameClient:
     def __init__(self, connect_addr, username):
         self.server_ip, self.server_port = connect_addr.split(':')
@@ -18,7 +20,7 @@ class GameClient:
             self.sock.connect((self.server_ip, self.server_port))
             
             # 1. 發送使用者名稱
-            self.sock.sendall(self.username.encode('utf-8'))
+            self.sock.sendall((self.username + "\n").encode('utf-8'))
             
             # 2. 啟動接收執行緒
             recv_thread = threading.Thread(target=self.receive_loop, daemon=True)
@@ -34,11 +36,13 @@ class GameClient:
 
     def receive_loop(self):
         """持續接收伺服器訊息並顯示"""
+        # 每行一則訊息 (多則訊息黏在同一個封包時也能分開處理)
+        reader = FrameReader(self.sock)
         while self.is_running:
             try:
-                data = self.sock.recv(4096)
-                if not data: break
-                message = data.decode('utf-8').strip()
+                message = reader.read()
+                if message is None: break
+                message = message.strip()
                 
                 # 檢查是否為特殊指令
                 if message == "ACTION:YOUR_TURN":
@@ -72,7 +76,7 @@ class GameClient:
                 else:
                     msg = user_input.strip()
                 
-                self.sock.sendall(msg.encode('utf-8')) 
+                self.sock.sendall((msg + "\n").encode('utf-8'))
                 
             except EOFError:
                 break
@@ -1,11 +1,10 @@
-import socket
-import threading
 import argparse
-import json
 import random
 import time
 import sys
 
+from game_sdk import FrameReader, GameRuntime, Telemetry, add_server_arguments, open_listen_socket # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 # === 遊戲邏輯類別 (Model) ===
 class Revolver:
     def __init__(self):
@@ -20,8 +19,10 @@ class Revolver:
         return fired
 
 class GameServer:
-    def __init__(self, port, expected_players, player_names):
+    def __init__(self, port, expected_players, player_names, listen_fd=None, telemetry=None):
         self.port = port
+        self.listen_fd = listen_fd # Lobby 傳入的 listening socket fd (選用)
+        self.telemetry = telemetry or Telemetry() # 回報給 Lobby 的事件通道
         self.expected_players = expected_players
         self.server_socket = None
         self.clients = [] 
@@ -31,22 +32,25 @@ class GameServer:
 
     def start(self):
         print(f"Game Server starting on port {self.port}...")
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(self.expected_players)
+        # Lobby 有傳入 listen_fd 時直接沿用，不需要再 bind
+        self.server_socket = open_listen_socket(self.port, self.expected_players, self.listen_fd)
+
+        # 通知 Lobby 已開始監聽，玩家現在可以連線
+        self.telemetry.ready()
 
         while len(self.clients) < self.expected_players:
             conn, addr = self.server_socket.accept()
             try:
                 conn.settimeout(5.0)
-                name = conn.recv(1024).decode('utf-8').strip()
+                reader = FrameReader(conn)
+                name = (reader.read() or '').strip()
                 conn.settimeout(None)
                 if name not in self.player_names:
                     conn.close()
                     continue
                 print(f"Player {name} connected")
-                self.clients.append({"sock": conn, "name": name})
+                self.telemetry.player_joined(name)
+                self.clients.append({"sock": conn, "reader": reader, "name": name})
                 self.broadcast(f"目前人數: {len(self.clients)}/{self.expected_players}")
             except:
                 conn.close()
@@ -85,9 +89,9 @@ class GameServer:
             try:
                 current_player["sock"].sendall("ACTION:YOUR_TURN\n".encode('utf-8'))
                 # 等待回應
-                data = current_player["sock"].recv(1024)
-                if not data: raise Exception("Disconnected")
-                action = data.decode('utf-8').strip()
+                data = current_player["reader"].read()
+                if data is None: raise Exception("Disconnected")
+                action = data.strip()
             except:
                 self.handle_disconnect(current_player)
                 return
@@ -128,19 +132,78 @@ class GameServer:
             except: pass
         if self.server_socket: self.server_socket.close()
 
-        result = {
-            "winner": winner_name,
-            "players": self.player_names # [修正]
-        }
-        print(f"GAME_RESULT: {json.dumps(result)}")
+        self.telemetry.result(winner_name, self.player_names) # [修正]
         sys.exit(0)
 
+# === in-process 版本 (game_config.json: "runtime": "inprocess") ===
+class RussianRouletteGame(GameRuntime):
+    """與 GameServer 相同的遊戲規則，改由 Lobby 的 event loop 以事件驅動執行"""
+
+    def __init__(self, players):
+        super().__init__(players)
+        self.revolver = Revolver()
+        self.turn_idx = 0
+        self.started = False
+
+    async def on_join(self, player):
+        self.broadcast(f"目前人數: {len(self.connected)}/{len(self.players)}")
+        if len(self.connected) == len(self.players):
+            self.broadcast("\n=== 遊戲開始! (v2.0) ===\n左輪手槍已上膛\n")
+            await self.sleep(1)
+            self.started = True
+            self.prompt_turn()
+
+    def prompt_turn(self):
+        current = self.connected[self.turn_idx]
+        self.broadcast(f"\n輪到 [{current}] 了，請選擇目標...")
+        self.send(current, "ACTION:YOUR_TURN")
+
+    async def on_message(self, player, text):
+        if not self.started or player != self.connected[self.turn_idx]:
+            return
+        next_idx = (self.turn_idx + 1) % len(self.connected)
+        next_player = self.connected[next_idx]
+        target_is_self = (text != "2")
+
+        if target_is_self:
+            self.broadcast(f"[{player}] 顫抖著將槍口抵住 **自己的太陽穴**...")
+        else:
+            self.broadcast(f"[{player}] 眼神一冷，將槍口指向 **[{next_player}]**...")
+        await self.sleep(1.5)
+
+        if self.revolver.pull_trigger():
+            self.broadcast(">>> 【 砰! 】 <<<")
+            if target_is_self:
+                self.broadcast(f"[{player}] 不幸倒地。")
+                self.finish(next_player) # 射死自己，對手贏
+            else:
+                self.broadcast(f"[{next_player}] 被擊中倒地!")
+                self.finish(player) # 射死對手，自己贏
+            return
+
+        self.broadcast("... 卡嗒。(空包彈)")
+        if target_is_self:
+            self.broadcast(f"[{player}] 存活下來！獲得額外一回合。")
+        else:
+            self.broadcast(f"[{next_player}] 毫髮無傷。換人。")
+            self.turn_idx = next_idx
+        await self.sleep(1)
+        self.prompt_turn()
+
+    def on_leave(self, player):
+        self.broadcast(f"\n>>> 玩家 [{player}] 斷線！判負。 <<<")
+        winner = self.connected[0] if self.connected else "None"
+        self.finish(winner)
+
+    def finish(self, winner_name):
+        self.broadcast(f"\n=== 遊戲結束 ===\n獲勝者是: [{winner_name}]!")
+        self.end_game(winner_name)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--port', type=int, required=True)
-    parser.add_argument('--player_count', type=int, default=2)
-    parser.add_argument('--players', nargs='+', required=True) # [新增]
+    add_server_arguments(parser)
     args = parser.parse_args()
 
-    server = GameServer(args.port, args.player_count, args.players)
+    server = GameServer(args.port, args.player_count, args.players, args.listen_fd,
+                        Telemetry(args.telemetry_fd))
     server.start()
\ No newline at end of file
@@ -3,6 +3,8 @@ import argparse
 import threading
 import sys
 
+from game_sdk import FrameReader # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 class GameClient:
     def __init__(self, connect_addr, username):
         self.server_ip, self.server_port = connect_addr.split(':')
@@ -22,7 +24,7 @@ class GameClient:
             self.sock.connect((self.server_ip, self.server_port))
             
             # 1. 發送名字
-            self.sock.sendall(self.username.encode())
+            self.sock.sendall((self.username + "\n").encode())
             
             # 2. 啟動接收執行緒
             recv_thread = threading.Thread(target=self.receive_loop, daemon=True)
@@ -38,24 +40,22 @@ class GameClient:
 
     def receive_loop(self):
         """持續接收伺服器訊息"""
+        # 每行一則訊息 (訊息被拆成多個封包或多則黏在一起都能正確切開)
+        reader = FrameReader(self.sock)
         while self.running:
             try:
-                data = self.sock.recv(4096)
-                if not data: break
+                msg = reader.read()
+                if msg is None: break
+                if not msg: continue
                 
-                # 處理黏包 (簡單用換行分割)
-                messages = data.decode().split('\n')
-                for msg in messages:
-                    if not msg: continue
-                    
-                    # 檢查特殊指令
-                    if msg.startswith("INPUT:"):
-                        # Server 要求輸入，設定提示文字並解鎖輸入執行緒
-                        self.prompt_text = msg[6:] # 去掉 "INPUT:"
-                        self.input_event.set()
-                    else:
-                        # 普通訊息直接印出
-                        print(msg)
+                # 檢查特殊指令
+                if msg.startswith("INPUT:"):
+                    # Server 要求輸入，設定提示文字並解鎖輸入執行緒
+                    self.prompt_text = msg[6:] # 去掉 "INPUT:"
+                    self.input_event.set()
+                else:
+                    # 普通訊息直接印出
+                    print(msg)
                         
             except:
                 break
@@ -76,13 +76,12 @@ class GameClient:
             try:
                 user_input = input(f"{self.prompt_text}").strip()
                 
+                # 輸入完畢，先重置 Event 再送出 (Server 可能立刻回覆下一次叫號，例如輸入錯誤)
+                self.input_event.clear()
                 if self.sock:
-                    self.sock.sendall(user_input.encode())
+                    self.sock.sendall((user_input + "\n").encode())
             except EOFError:
                 break
-                
-            # 輸入完畢，重置 Event，繼續等待下次叫號
-            self.input_event.clear()
 
     def cleanup(self):
         self.running = False
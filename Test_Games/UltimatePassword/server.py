@@ -1,14 +1,15 @@
-import socket
-import threading
 import argparse
-import json
 import random
 import time
 import sys
 
+from game_sdk import FrameReader, Telemetry, add_server_arguments, open_listen_socket # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 class GameServer:
-    def __init__(self, port, expected_players, player_names):
+    def __init__(self, port, expected_players, player_names, listen_fd=None, telemetry=None):
         self.port = port
+        self.listen_fd = listen_fd # Lobby 傳入的 listening socket fd (選用)
+        self.telemetry = telemetry or Telemetry() # 回報給 Lobby 的事件通道
         self.expected_players = expected_players
         self.server_socket = None
         self.clients = [] # [{'sock':..., 'name':...}]
@@ -23,13 +24,15 @@ class GameServer:
         self.target = random.randint(self.min_val + 1, self.max_val - 1)
         if self.target == self.min_val: self.target += 1
         if self.target == self.max_val: self.target -= 1
+        self.guess_counts = {} # {name: 猜測次數}
 
     def start(self):
         print(f"UltimatePassword Server starting on port {self.port}...")
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(self.expected_players)
+        # Lobby 有傳入 listen_fd 時直接沿用，不需要再 bind
+        self.server_socket = open_listen_socket(self.port, self.expected_players, self.listen_fd)
+
+        # 通知 Lobby 已開始監聽，玩家現在可以連線
+        self.telemetry.ready()
 
         # 等待玩家
         print(f"Waiting for {self.expected_players} players...")
@@ -37,7 +40,8 @@ class GameServer:
             conn, addr = self.server_socket.accept()
             try:
                 conn.settimeout(5.0)
-                name = conn.recv(1024).decode().strip()
+                reader = FrameReader(conn)
+                name = (reader.read() or '').strip()
                 conn.settimeout(None)
                 
                 # 驗證是否在名單內 (選用)
@@ -47,7 +51,8 @@ class GameServer:
                     continue
 
                 print(f"Player {name} connected")
-                self.clients.append({'sock': conn, 'name': name})
+                self.telemetry.player_joined(name)
+                self.clients.append({'sock': conn, 'reader': reader, 'name': name})
                 self.broadcast(f"[系統] 玩家 {name} 加入了遊戲 ({len(self.clients)}/{self.expected_players})")
             except Exception as e:
                 print(f"Connection error: {e}")
@@ -130,8 +135,9 @@ class GameServer:
             
             while not valid_guess:
                 try:
-                    data = current_player['sock'].recv(1024).decode().strip()
-                    if not data: raise Exception("Empty data")
+                    data = current_player['reader'].read()
+                    if data is None: raise Exception("Disconnected")
+                    data = data.strip()
 
                     if not data.isdigit():
                         self.send_private(turn_idx, "INPUT:[錯誤] 請輸入純數字: ")
@@ -156,6 +162,7 @@ class GameServer:
                 continue
 
             # 4. 廣播猜測
+            self.guess_counts[player_name] = self.guess_counts.get(player_name, 0) + 1
             self.broadcast(f"玩家 {player_name} 猜了: {guess}")
             time.sleep(0.5)
 
@@ -193,11 +200,8 @@ class GameServer:
         time.sleep(1)
         
         # 回傳完整名單 (包含中途斷線的人)
-        result = {
-            "winner": winner,
-            "players": self.player_names
-        }
-        print(f"GAME_RESULT: {json.dumps(result)}")
+        # scores: 每位玩家猜了幾次
+        self.telemetry.result(winner, self.player_names, scores=self.guess_counts)
         
         for c in self.clients:
             try: c['sock'].close()
@@ -206,11 +210,9 @@ class GameServer:
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--port', type=int, required=True)
-    parser.add_argument('--player_count', type=int, default=2)
-    # [新增] 接收完整玩家名單
-    parser.add_argument('--players', nargs='+', required=True)
+    add_server_arguments(parser)
     args = parser.parse_args()
 
-    server = GameServer(args.port, args.player_count, args.players)
+    server = GameServer(args.port, args.player_count, args.players, args.listen_fd,
+                        Telemetry(args.telemetry_fd))
     server.start()
\ No newline at end of file
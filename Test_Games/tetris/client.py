@@ -5,6 +5,8 @@ import threading
 import json
 import sys
 
+from game_sdk import FrameReader # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 # === UI 設定 ===
 CELL_SIZE = 30
 BOARD_W, BOARD_H = 10, 20
@@ -25,6 +27,8 @@ COLORS = {
     'BORDER': (200, 200, 200),
     'ACTIVE': (200, 200, 200) # 活動方塊邊框
 }
+# 預先繪製的圖塊編號: 0~7 為棋盤上的格子，ACTIVE_TILE + id 為活動方塊 (多一圈框線)
+ACTIVE_TILE = 8
 
 # 形狀定義 (用於客戶端繪製)
 BRICK_SHAPES = {
@@ -46,6 +50,8 @@ class TetrisClient:
         self.running = True
         
         self.players_state = [] 
+        self.state_version = 0 # 每次狀態更新 (STATE / DELTA) 加 1，畫面據此判斷是否需要重畫
+        self.seq = None        # 目前畫面對應的 Server 畫面序號
         self.winner = None
         
         pygame.init()
@@ -54,12 +60,33 @@ class TetrisClient:
         self.font = pygame.font.SysFont("Arial", 24)
         self.big_font = pygame.font.SysFont("Arial", 48)
 
+        # 繪圖快取：預先畫好的格子圖塊、每位玩家畫面上目前顯示的內容 (只重畫有變化的格子)
+        self.tiles = self.build_tiles()
+        self.views = []
+
+    def build_tiles(self):
+        """每種格子只畫一次，之後每格只需要一次 blit"""
+        tiles = {}
+        rect = (0, 0, CELL_SIZE - 1, CELL_SIZE - 1)
+        for val in range(8):
+            tile = pygame.Surface((CELL_SIZE, CELL_SIZE))
+            tile.fill((0, 0, 0))
+            pygame.draw.rect(tile, COLORS[val], rect)
+            if val == 0:
+                pygame.draw.rect(tile, COLORS['GRID'], rect, 1)
+            tiles[val] = tile.convert()
+            if val:
+                active = tile.copy()
+                pygame.draw.rect(active, COLORS['ACTIVE'], rect, 1)
+                tiles[ACTIVE_TILE + val] = active.convert()
+        return tiles
+
     def connect(self):
         try:
             print(f"Connecting to {self.server_addr}...")
             self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.sock.connect(self.server_addr)
-            self.sock.sendall(self.username.encode())
+            self.sock.sendall((self.username + '\n').encode())
             
             t = threading.Thread(target=self.network_loop, daemon=True)
             t.start()
@@ -69,17 +96,13 @@ class TetrisClient:
             return False
 
     def network_loop(self):
-        buf = ""
+        reader = FrameReader(self.sock)
         while self.running:
             try:
-                data = self.sock.recv(4096).decode()
-                if not data: break
-                
-                buf += data
-                while '\n' in buf:
-                    line, buf = buf.split('\n', 1)
-                    if not line: continue
-                    self.handle_packet(json.loads(line))
+                line = reader.read_bytes()
+                if line is None: break
+                if not line: continue
+                self.handle_packet(json.loads(line))
             except Exception as e:
                 print(f"Network error: {e}")
                 break
@@ -88,7 +111,31 @@ class TetrisClient:
     def handle_packet(self, data):
         ptype = data.get('type')
         if ptype == 'STATE':
-            self.players_state = data.get('players', [])
+            # 完整狀態 (keyframe)
+            players = data.get('players', [])
+            for state in players:
+                state['rows'] = state['board'].split('|')
+            self.players_state = players
+            self.seq = data.get('seq')
+            self.state_version += 1
+        elif ptype == 'DELTA':
+            # 只套用接在目前畫面之後的增量，對不上時等下一個 keyframe
+            if self.seq is None or data.get('base') != self.seq: return
+            players = list(self.players_state) # 換成新的 list，繪圖執行緒不會讀到改到一半的狀態
+            for change in data.get('players', []):
+                state = dict(players[change['i']])
+                if 'rows' in change:
+                    rows = list(state['rows'])
+                    for y, rle in change['rows']:
+                        rows[y] = rle
+                    state['rows'] = rows
+                    state['board'] = '|'.join(rows)
+                for key in ('active', 'lines', 'game_over', 'win'):
+                    if key in change: state[key] = change[key]
+                players[change['i']] = state
+            self.players_state = players
+            self.seq = data.get('seq')
+            self.state_version += 1
         elif ptype == 'GAME_OVER':
             self.winner = data.get('winner')
             print(f"Game Over! Winner: {self.winner}")
@@ -117,24 +164,17 @@ class TetrisClient:
             board.append(row[:10])
         return board
 
-    def draw_board(self, offset_x, offset_y, state):
-        # 邊框
-        color_border = (255, 215, 0) if state.get('win') else COLORS['BORDER']
-        pygame.draw.rect(self.screen, color_border, 
-                         (offset_x-2, offset_y-2, BOARD_W*CELL_SIZE+4, BOARD_H*CELL_SIZE+4), 2)
-        
-        # 棋盤
-        board = self.parse_rle(state['board'])
-        for y in range(BOARD_H):
-            for x in range(BOARD_W):
-                val = board[y][x]
-                color = COLORS.get(val, COLORS[0])
-                rect = (offset_x + x*CELL_SIZE, offset_y + y*CELL_SIZE, CELL_SIZE-1, CELL_SIZE-1)
-                pygame.draw.rect(self.screen, color, rect)
-                if val == 0: 
-                    pygame.draw.rect(self.screen, COLORS['GRID'], rect, 1)
-
-        # 活動方塊
+    def draw_board(self, offset_x, offset_y, state, view):
+        """只重畫與上一次顯示不同的格子與文字，回傳需要更新到螢幕上的區域"""
+        dirty = []
+
+        # 1. 棋盤字串沒變就沿用上次解碼的結果
+        if state['board'] != view['rle']:
+            view['rle'] = state['board']
+            view['board'] = self.parse_rle(state['board'])
+        cells = [row[:] for row in view['board']]
+
+        # 2. 疊上活動方塊
         active = state.get('active')
         if active:
             bid = active['id']
@@ -145,43 +185,94 @@ class TetrisClient:
                     bx = (idx % 4) + active['x']
                     by = (idx // 4) + active['y']
                     if 0 <= by < BOARD_H and 0 <= bx < BOARD_W:
-                        rect = (offset_x + bx*CELL_SIZE, offset_y + by*CELL_SIZE, CELL_SIZE-1, CELL_SIZE-1)
-                        # 繪製方塊
-                        pygame.draw.rect(self.screen, COLORS.get(bid), rect)
-                        # 繪製活動框線 (強調)
-                        pygame.draw.rect(self.screen, COLORS['ACTIVE'], rect, 1)
+                        cells[by][bx] = ACTIVE_TILE + bid
+
+        # 3. 逐格比對，只 blit 有變化的格子
+        shown = view['cells']
+        for y in range(BOARD_H):
+            row = cells[y]
+            if row == shown[y]:
+                continue
+            old_row = shown[y]
+            for x in range(BOARD_W):
+                if row[x] != old_row[x]:
+                    tile = self.tiles.get(row[x], self.tiles[0])
+                    dirty.append(self.screen.blit(tile, (offset_x + x*CELL_SIZE, offset_y + y*CELL_SIZE)))
+            shown[y] = row
 
-        # 資訊顯示
+        # 4. 資訊 (名字、進度、勝負) 有變化時才重新產生文字
         name = state['name']
         lines = state['lines']
         target = state['target']
-        
-        # 名字
-        name_surf = self.font.render(f"{name}", True, (255, 255, 255))
-        self.screen.blit(name_surf, (offset_x, offset_y - 30))
-        
-        # 進度 (3/3)
-        progress_text = f"Lines: {lines}/{target}"
-        color = (0, 255, 0) if lines >= target else (200, 200, 200)
-        prog_surf = self.font.render(progress_text, True, color)
-        self.screen.blit(prog_surf, (offset_x, offset_y + BOARD_H*CELL_SIZE + 10))
-
-        if state['game_over']:
-            status = "WINNER" if state['win'] else "GAME OVER"
-            color = (0, 255, 0) if state['win'] else (255, 0, 0)
-            text = self.big_font.render(status, True, color)
-            self.screen.blit(text, (offset_x + 20, offset_y + 200))
+        info = (name, lines, target, state['game_over'], state['win'])
+        if info != view['info']:
+            view['info'] = info
+
+            # 邊框
+            color_border = (255, 215, 0) if state.get('win') else COLORS['BORDER']
+            dirty.append(pygame.draw.rect(self.screen, color_border, 
+                         (offset_x-2, offset_y-2, BOARD_W*CELL_SIZE+4, BOARD_H*CELL_SIZE+4), 2))
+
+            # 名字
+            name_area = pygame.Rect(offset_x, offset_y - 32, BOARD_W*CELL_SIZE, 28)
+            self.screen.fill((0, 0, 0), name_area)
+            name_surf = self.font.render(f"{name}", True, (255, 255, 255))
+            self.screen.blit(name_surf, (offset_x, offset_y - 30))
+            dirty.append(name_area)
+
+            # 進度 (3/3)
+            progress_area = pygame.Rect(offset_x, offset_y + BOARD_H*CELL_SIZE + 8, BOARD_W*CELL_SIZE, 32)
+            self.screen.fill((0, 0, 0), progress_area)
+            progress_text = f"Lines: {lines}/{target}"
+            color = (0, 255, 0) if lines >= target else (200, 200, 200)
+            prog_surf = self.font.render(progress_text, True, color)
+            self.screen.blit(prog_surf, (offset_x, offset_y + BOARD_H*CELL_SIZE + 10))
+            dirty.append(progress_area)
+
+            if state['game_over']:
+                status = "WINNER" if state['win'] else "GAME OVER"
+                color = (0, 255, 0) if state['win'] else (255, 0, 0)
+                view['status_text'] = self.big_font.render(status, True, color)
+
+        # 結束文字蓋在棋盤上，棋盤有重畫時先把文字底下的格子補回來再畫一次 (半透明邊緣不會疊加)
+        if state['game_over'] and dirty and view.get('status_text'):
+            text_rect = view['status_text'].get_rect(topleft=(offset_x + 20, offset_y + 200))
+            for y in range(max(0, (text_rect.top - offset_y) // CELL_SIZE), min(BOARD_H, (text_rect.bottom - offset_y) // CELL_SIZE + 1)):
+                for x in range(max(0, (text_rect.left - offset_x) // CELL_SIZE), min(BOARD_W, (text_rect.right - offset_x) // CELL_SIZE + 1)):
+                    self.screen.blit(self.tiles.get(cells[y][x], self.tiles[0]), (offset_x + x*CELL_SIZE, offset_y + y*CELL_SIZE))
+            dirty.append(self.screen.blit(view['status_text'], text_rect))
+        return dirty
+
+    def new_view(self):
+        return {'rle': None, 'board': None, 'cells': [[None] * BOARD_W for _ in range(BOARD_H)], 'info': None}
+
+    def render(self, full):
+        """畫出所有玩家，回傳需要更新的螢幕區域 (full=True 時整個畫面重畫)"""
+        states = self.players_state
+        if full or len(states) != len(self.views):
+            self.screen.fill((0, 0, 0))
+            self.views = [self.new_view() for _ in states]
+            full = True
+
+        dirty = []
+        for idx, p_state in enumerate(states):
+            off_x = PADDING + (idx * (BOARD_W * CELL_SIZE + PADDING))
+            dirty.extend(self.draw_board(off_x, PADDING + 40, p_state, self.views[idx]))
+        return [self.screen.get_rect()] if full else dirty
 
     def run(self):
         if not self.connect(): return
 
         clock = pygame.time.Clock()
+        drawn_version = None
+        full_redraw = True
+        expose_events = (pygame.VIDEOEXPOSE, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE))
         while self.running:
-            self.screen.fill((0, 0, 0))
-            
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
+                elif event.type in expose_events:
+                    full_redraw = True # 視窗被遮住後重新顯示，整個畫面重畫
                 elif event.type == pygame.KEYDOWN and not self.winner:
                     if event.key == pygame.K_LEFT: self.send_input('LEFT')
                     elif event.key == pygame.K_RIGHT: self.send_input('RIGHT')
@@ -189,16 +280,18 @@ class TetrisClient:
                     elif event.key == pygame.K_DOWN: self.send_input('DOWN')
                     elif event.key == pygame.K_SPACE: self.send_input('DROP')
 
-            # 繪製所有玩家
-            for idx, p_state in enumerate(self.players_state):
-                off_x = PADDING + (idx * (BOARD_W * CELL_SIZE + PADDING))
-                self.draw_board(off_x, PADDING + 40, p_state)
+            # 繪製所有玩家：沒有收到新的狀態時整個 frame 跳過
+            if full_redraw or self.state_version != drawn_version:
+                drawn_version = self.state_version
+                dirty = self.render(full_redraw)
+                full_redraw = False
+                if dirty:
+                    pygame.display.update(dirty)
 
             if self.winner:
                 # 可以在中間顯示大大的 Winner 文字
                 pass
 
-            pygame.display.flip()
             clock.tick(60)
         
         self.sock.close()
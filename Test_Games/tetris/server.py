@@ -1,4 +1,3 @@
-import socket
 import threading
 import argparse
 import json
@@ -6,12 +5,17 @@ import random
 import time
 import sys
 
+from game_sdk import FrameReader, Telemetry, add_server_arguments, open_listen_socket # Lobby 啟動時會把專案根目錄加入 PYTHONPATH
+
 # === 遊戲參數 ===
 WIDTH = 10
 HEIGHT = 20
 GRAVITY_MS = 800      
 BROADCAST_MS = 100    
+KEYFRAME_MS = 2000    # 每隔多久送一次完整狀態 (STATE)，其餘時間只送有變化的部分 (DELTA)
 WIN_LINES = 3         
+STATS_INTERVAL = 5    # 每幾秒回報一次 tick 統計
+USE_BITBOARD = True   # 使用 BitboardTetrisEngine (每列一個整數)，False 則使用原本的 TetrisEngine
 
 # 方塊形狀定義
 BRICK_SHAPES = {
@@ -25,25 +29,24 @@ BRICK_SHAPES = {
 }
 
 # === 輔助函式 ===
+def row_to_rle(row):
+    if not row:
+        return ""
+    cur = row[0]
+    cnt = 1
+    out = []
+    for cell in row[1:]:
+        if cell == cur:
+            cnt += 1
+        else:
+            out.append(f"{cnt}{cur}" if cnt > 1 else f"{cur}")
+            cur = cell
+            cnt = 1
+    out.append(f"{cnt}{cur}" if cnt > 1 else f"{cur}")
+    return '.'.join(out)
+
 def board_to_rle(board):
-    parts = []
-    for row in board:
-        if not row:
-            parts.append("")
-            continue
-        cur = row[0]
-        cnt = 1
-        out = []
-        for cell in row[1:]:
-            if cell == cur:
-                cnt += 1
-            else:
-                out.append(f"{cnt}{cur}" if cnt > 1 else f"{cur}")
-                cur = cell
-                cnt = 1
-        out.append(f"{cnt}{cur}" if cnt > 1 else f"{cur}")
-        parts.append('.'.join(out))
-    return '|'.join(parts)
+    return '|'.join(row_to_rle(row) for row in board)
 
 def get_brick_coords(brick_id, state, offset_x, offset_y):
     shapes = BRICK_SHAPES.get(brick_id, [(0, 1, 2, 3)])
@@ -59,6 +62,7 @@ def get_brick_coords(brick_id, state, offset_x, offset_y):
 class TetrisEngine:
     def __init__(self, seed):
         self.board = [[0] * WIDTH for _ in range(HEIGHT)]
+        self.board_version = 0 # 盤面 (已鎖定的方塊) 每次變動加 1
         self.score = 0
         self.total_lines = 0 
         self.game_over = False
@@ -100,6 +104,7 @@ class TetrisEngine:
         for cx, cy in coords:
             if 0 <= cy < HEIGHT and 0 <= cx < WIDTH:
                 self.board[cy][cx] = self.active_piece['id']
+        self.board_version += 1
         self.check_lines()
         self.spawn_piece()
 
@@ -109,14 +114,18 @@ class TetrisEngine:
             if all(self.board[y]): lines_to_clear.append(y)
         count = len(lines_to_clear)
         if count > 0:
-            for y in sorted(lines_to_clear, reverse=True):
+            # 先由下往上刪除，最後再一次補上空列 (邊刪邊補會讓後面的索引錯位)
+            for y in reversed(lines_to_clear):
                 del self.board[y]
-                self.board.insert(0, [0] * WIDTH)
-            self.total_lines += count
-            self.score += count * 100 * count
-            if self.total_lines >= WIN_LINES:
-                self.win = True
-                self.game_over = True
+            self.board[:0] = [[0] * WIDTH for _ in range(count)]
+            self.add_lines(count)
+
+    def add_lines(self, count):
+        self.total_lines += count
+        self.score += count * 100 * count
+        if self.total_lines >= WIN_LINES:
+            self.win = True
+            self.game_over = True
 
     def move(self, action):
         if self.game_over: return
@@ -133,31 +142,110 @@ class TetrisEngine:
             while not self.check_collision(dy=1): self.active_piece['y'] += 1
             self.lock_piece()
 
+# === Bitboard 版本 ===
+# 每一列是一個整數：左右各 WALL 個 bit 的牆 (恆為 1)，中間 WIDTH 個 bit 為格子 (bit WALL + x 對應第 x 欄)
+# 棋盤下方再多 4 列全滿的地板，碰撞檢查不需要另外判斷邊界
+WALL = 4
+FULL_ROW = (1 << (WIDTH + 2 * WALL)) - 1
+EMPTY_ROW = FULL_ROW ^ (((1 << WIDTH) - 1) << WALL)
+
+def _build_piece_masks():
+    """{brick_id: [每個旋轉狀態的 ((列偏移, x=-WALL 時的 bit mask), ...)]}，左移 x + WALL 即為實際位置"""
+    masks = {}
+    for bid, shapes in BRICK_SHAPES.items():
+        masks[bid] = []
+        for shape in shapes:
+            rows = {}
+            for idx in shape:
+                rows[idx // 4] = rows.get(idx // 4, 0) | (1 << (idx % 4))
+            masks[bid].append(tuple(sorted(rows.items())))
+    return masks
+
+PIECE_MASKS = _build_piece_masks()
+
+class BitboardTetrisEngine(TetrisEngine):
+    """與 TetrisEngine 規則與介面相同 (move / active_piece / board ...)，
+    碰撞檢查改為每列一次 AND，消行改為整數比對 + list 切片。
+    board (每格的方塊 id) 只在鎖定與消行時更新，供 board_to_rle 繪製使用。"""
+
+    def __init__(self, seed):
+        self.rows = [EMPTY_ROW] * HEIGHT + [FULL_ROW] * 4
+        super().__init__(seed)
+
+    def check_collision(self, dx=0, dy=0, rotate=0):
+        piece = self.active_piece
+        if not piece: return False
+        masks = PIECE_MASKS[piece['id']]
+        shift = piece['x'] + dx + WALL
+        y = piece['y'] + dy
+        rows = self.rows
+        for offset, mask in masks[(piece['state'] + rotate) % len(masks)]:
+            if rows[y + offset] & (mask << shift): return True
+        return False
+
+    def lock_piece(self):
+        piece = self.active_piece
+        masks = PIECE_MASKS[piece['id']]
+        shift = piece['x'] + WALL
+        touched = []
+        for offset, mask in masks[piece['state'] % len(masks)]:
+            y = piece['y'] + offset
+            if y < HEIGHT:
+                self.rows[y] |= mask << shift
+                touched.append(y)
+        for cx, cy in get_brick_coords(piece['id'], piece['state'], piece['x'], piece['y']):
+            if 0 <= cy < HEIGHT and 0 <= cx < WIDTH:
+                self.board[cy][cx] = piece['id']
+        self.board_version += 1
+        self.check_lines(touched)
+        self.spawn_piece()
+
+    def check_lines(self, touched=range(HEIGHT)):
+        # 只有剛鎖定的方塊所在的列可能被填滿
+        full = [y for y in touched if self.rows[y] == FULL_ROW]
+        if not full: return
+        for y in reversed(full):
+            del self.rows[y]
+            del self.board[y]
+        count = len(full)
+        self.rows[:0] = [EMPTY_ROW] * count
+        self.board[:0] = [[0] * WIDTH for _ in range(count)]
+        self.add_lines(count)
+
 # === 遊戲伺服器 ===
 class GameServer:
     # [修正 1] 增加 player_names 參數接收
-    def __init__(self, port, expected_players, player_names):
+    def __init__(self, port, expected_players, player_names, listen_fd=None, telemetry=None):
         self.port = port
+        self.listen_fd = listen_fd # Lobby 傳入的 listening socket fd (選用)
+        self.telemetry = telemetry or Telemetry() # 回報給 Lobby 的事件通道
         self.expected_players = expected_players
         self.server_socket = None
         self.clients = [] 
         self.running = True
         self.seed = random.randint(0, 999999)
         self.player_names = player_names # 保存完整名單
+        self.frame_seq = 0          # 已廣播的畫面序號 (STATE / DELTA 共用)
+        self.last_keyframe = None   # 上次送出完整狀態的時間
+        # 輸入執行緒收到的操作交給遊戲迴圈處理 (引擎只在遊戲迴圈中修改)，並立即喚醒遊戲迴圈
+        self.inbox = [] # [(player_idx, action)]，action 為 None 表示斷線
+        self.inbox_cond = threading.Condition()
 
     def start(self):
         print(f"Tetris Server starting on port {self.port}...")
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(self.expected_players)
+        # Lobby 有傳入 listen_fd 時直接沿用，不需要再 bind
+        self.server_socket = open_listen_socket(self.port, self.expected_players, self.listen_fd)
+
+        # 通知 Lobby 已開始監聽，玩家現在可以連線
+        self.telemetry.ready()
 
         while len(self.clients) < self.expected_players:
             conn, addr = self.server_socket.accept()
             try:
                 # 簡單身分驗證
                 conn.settimeout(5.0)
-                name = conn.recv(1024).decode('utf-8').strip()
+                reader = FrameReader(conn) # 名稱之後緊接著送來的輸入留在 reader 的緩衝區
+                name = (reader.read() or '').strip()
                 conn.settimeout(None)
                 
                 # [修正 2] 驗證連線者是否在名單內
@@ -167,8 +255,9 @@ class GameServer:
                     continue
                 
                 print(f"Player {name} connected")
-                engine = TetrisEngine(self.seed)
-                self.clients.append({'sock': conn, 'engine': engine, 'name': name})
+                self.telemetry.player_joined(name)
+                engine = (BitboardTetrisEngine if USE_BITBOARD else TetrisEngine)(self.seed)
+                self.clients.append({'sock': conn, 'reader': reader, 'engine': engine, 'name': name})
                 self.broadcast_system(f"Waiting: {len(self.clients)}/{self.expected_players}")
             except Exception as e:
                 print(f"Connection error: {e}")
@@ -183,25 +272,71 @@ class GameServer:
             try: c['sock'].sendall(payload.encode())
             except: pass
 
-    def broadcast_state(self):
-        states = []
-        for c in self.clients:
-            engine = c['engine']
-            state = {
-                'name': c['name'],
-                'board': board_to_rle(engine.board),
-                'lines': engine.total_lines,
-                'target': WIN_LINES,
-                'game_over': engine.game_over,
-                'win': engine.win,
-                'active': engine.active_piece
-            }
-            states.append(state)
-        
-        payload = json.dumps({'type': 'STATE', 'players': states}) + '\n'
+    def snapshot(self, client):
+        """玩家目前的畫面內容 (每列 RLE 只在盤面變動後重新計算)"""
+        engine = client['engine']
+        if client.get('rows_version') != engine.board_version:
+            client['rows'] = [row_to_rle(row) for row in engine.board]
+            client['rows_version'] = engine.board_version
+        active = engine.active_piece
+        return {
+            'rows': client['rows'],
+            'lines': engine.total_lines,
+            'game_over': engine.game_over,
+            'win': engine.win,
+            'active': dict(active) if active else None
+        }
+
+    def broadcast_state(self, keyframe=False):
+        """廣播畫面：定期送完整的 STATE，其餘只送與上一個畫面不同的部分 (DELTA)。
+        沒有任何變化時不送出，回傳是否有送出"""
+        now = time.monotonic()
+        if self.last_keyframe is None or now - self.last_keyframe >= KEYFRAME_MS / 1000.0:
+            keyframe = True
+        snapshots = [self.snapshot(c) for c in self.clients]
+
+        # 1. 組合訊息 (序號 seq 讓客戶端確認 DELTA 接在自己目前的畫面之後)
+        if keyframe:
+            states = []
+            for c, snap in zip(self.clients, snapshots):
+                states.append({
+                    'name': c['name'],
+                    'board': '|'.join(snap['rows']),
+                    'lines': snap['lines'],
+                    'target': WIN_LINES,
+                    'game_over': snap['game_over'],
+                    'win': snap['win'],
+                    'active': snap['active']
+                })
+            message = {'type': 'STATE', 'seq': self.frame_seq + 1, 'players': states}
+            self.last_keyframe = now
+        else:
+            changes = []
+            for idx, (c, snap) in enumerate(zip(self.clients, snapshots)):
+                sent = c['sent']
+                change = {}
+                if snap['rows'] is not sent['rows']:
+                    rows = [[y, rle] for y, (rle, old) in enumerate(zip(snap['rows'], sent['rows'])) if rle != old]
+                    if rows: change['rows'] = rows
+                for key in ('active', 'lines', 'game_over', 'win'):
+                    if snap[key] != sent[key]: change[key] = snap[key]
+                if change:
+                    change['i'] = idx
+                    changes.append(change)
+            if not changes:
+                return False
+            message = {'type': 'DELTA', 'seq': self.frame_seq + 1, 'base': self.frame_seq, 'players': changes}
+
+        self.frame_seq += 1
+        for c, snap in zip(self.clients, snapshots):
+            c['sent'] = snap
+
+        # 2. 只編碼一次，所有玩家共用
+        payload = (json.dumps(message, separators=(',', ':')) + '\n').encode()
         for c in self.clients:
-            try: c['sock'].sendall(payload.encode())
+            try: c['sock'].sendall(payload)
             except: pass
+        return True
 
     # [修正 3] 新增斷線處理：斷線者判負，剩下的人獲勝
     def handle_disconnect(self, disconnected_name):
@@ -222,26 +357,79 @@ class GameServer:
             t.daemon = True
             t.start()
 
-        last_tick = time.time()
-        last_broadcast = time.time()
+        # 以 monotonic 時鐘排程：重力與廣播各自固定間隔，依預定時間推進 (不會因處理時間累積誤差)
+        gravity_interval = GRAVITY_MS / 1000.0
+        broadcast_interval = BROADCAST_MS / 1000.0
+        now = time.monotonic()
+        next_gravity = now + gravity_interval
+        next_broadcast = now
+        next_stats = now + STATS_INTERVAL
+        last_stats = now
+        wakeups, inputs, broadcasts = 0, 0, 0
+        lateness = [] # 每次重力 / 廣播實際執行時間比預定時間晚了多少 (秒)
+        dirty = True  # 有尚未廣播的變化 (沒有變化時不需要為了廣播醒來，只等 keyframe)
         
         while self.running:
-            current_time = time.time()
+            # 1. 睡到最近的期限為止，有輸入時立即醒來 (不再每 10ms 輪詢一次)
+            keyframe_at = (self.last_keyframe or now) + KEYFRAME_MS / 1000.0
+            with self.inbox_cond:
+                if not self.inbox:
+                    deadline = min(next_gravity, next_stats, next_broadcast if dirty else keyframe_at)
+                    self.inbox_cond.wait(max(0.0, deadline - time.monotonic()))
+                pending, self.inbox = self.inbox, []
+            now = time.monotonic()
+            wakeups += 1
             
-            # [修正 4] 檢查執行狀態 (若 handle_input 觸發斷線，running 會變 False)
+            # [修正 4] 檢查執行狀態 (end_game 後 running 會變 False)
             if not self.running: break
 
-            if current_time - last_tick > (GRAVITY_MS / 1000.0):
+            # 2. 玩家輸入
+            for idx, action in pending:
+                if action is None:
+                    self.handle_disconnect(self.clients[idx]['name'])
+                    return
+                self.clients[idx]['engine'].move(action)
+                inputs += 1
+            if pending and not dirty:
+                # 閒置後的第一個輸入立即廣播，之後仍維持每 BROADCAST_MS 最多一次
+                dirty, next_broadcast = True, max(next_broadcast, now)
+
+            # 3. 重力
+            if now >= next_gravity:
+                lateness.append(now - next_gravity)
                 for c in self.clients:
                     if not c['engine'].game_over:
                         c['engine'].move('DOWN')
-                last_tick = current_time
+                next_gravity += gravity_interval
+                if next_gravity <= now: next_gravity = now + gravity_interval # 落後超過一個間隔時不補做
+                if not dirty:
+                    dirty, next_broadcast = True, max(next_broadcast, now)
             
-            if current_time - last_broadcast > (BROADCAST_MS / 1000.0):
-                self.broadcast_state()
-                last_broadcast = current_time
+            # 4. 廣播 (有變化，或到了送 keyframe 的時間)
+            if not dirty and now >= keyframe_at:
+                dirty, next_broadcast = True, max(next_broadcast, keyframe_at)
+            if dirty and now >= next_broadcast:
+                lateness.append(now - next_broadcast)
+                if self.broadcast_state():
+                    broadcasts += 1
+                dirty = False
+                next_broadcast += broadcast_interval
+                if next_broadcast <= now: next_broadcast = now + broadcast_interval
+
+            # 5. 定期回報迴圈統計給 Lobby (jitter = 排程事件的延遲)
+            if now >= next_stats:
+                elapsed = now - last_stats
+                stats = {'wakeups_per_sec': round(wakeups / elapsed, 1),
+                         'inputs_per_sec': round(inputs / elapsed, 1),
+                         'broadcasts_per_sec': round(broadcasts / elapsed, 1)}
+                if lateness:
+                    stats['jitter_avg_ms'] = round(sum(lateness) / len(lateness) * 1000, 2)
+                    stats['jitter_max_ms'] = round(max(lateness) * 1000, 2)
+                self.telemetry.tick_stats(**stats)
+                last_stats, wakeups, inputs, broadcasts, lateness = now, 0, 0, 0, []
+                next_stats = now + STATS_INTERVAL
             
-            # 勝負判定
+            # 6. 勝負判定
             winner = None
             for c in self.clients:
                 if c['engine'].win:
@@ -257,35 +445,36 @@ class GameServer:
             if winner:
                 self.end_game(winner)
                 break
-            
-            time.sleep(0.01)
+
+    def post_input(self, player_idx, action):
+        """(輸入執行緒) 把操作交給遊戲迴圈並喚醒它"""
+        with self.inbox_cond:
+            self.inbox.append((player_idx, action))
+            self.inbox_cond.notify()
 
     def handle_input(self, player_idx):
-        conn = self.clients[player_idx]['sock']
-        engine = self.clients[player_idx]['engine']
-        name = self.clients[player_idx]['name']
+        reader = self.clients[player_idx]['reader']
         
         while self.running:
             try:
-                data = conn.recv(1024).decode()
-                if not data: raise Exception("Disconnected")
-                for line in data.split('\n'):
-                    if not line: continue
-                    try:
-                        cmd = json.loads(line)
-                        if cmd['type'] == 'INPUT':
-                            engine.move(cmd['action'])
-                    except: pass
+                line = reader.read_bytes()
+                if line is None: raise Exception("Disconnected")
+                if not line: continue
+                try:
+                    cmd = json.loads(line)
+                    if cmd['type'] == 'INPUT':
+                        self.post_input(player_idx, cmd['action'])
+                except: pass
             except:
-                # [修正 5] 捕捉到異常，觸發斷線處理
+                # [修正 5] 捕捉到異常，交給遊戲迴圈做斷線處理
                 if self.running:
-                    self.handle_disconnect(name)
+                    self.post_input(player_idx, None)
                 break
 
     def end_game(self, winner):
         self.running = False
         print(f"Game Over. Winner: {winner}")
-        try: self.broadcast_state()
+        try: self.broadcast_state(keyframe=True)
         except: pass
         
         payload = json.dumps({'type': 'GAME_OVER', 'winner': winner}) + '\n'
@@ -298,19 +487,16 @@ class GameServer:
         if self.server_socket: self.server_socket.close()
 
         # [修正 6] 關鍵：回傳「完整名單」給 Lobby，確保斷線者也有紀錄
-        result = {
-            "winner": winner,
-            "players": self.player_names 
-        }
-        print(f"GAME_RESULT: {json.dumps(result)}")
+        # scores: 每位玩家消除的行數
+        scores = {c['name']: c['engine'].total_lines for c in self.clients}
+        self.telemetry.result(winner, self.player_names, scores=scores)
         sys.exit(0)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('--port', type=int, required=True)
-    parser.add_argument('--player_count', type=int, default=2)
-    parser.add_argument('--players', nargs='+', required=True)
+    add_server_arguments(parser)
     args = parser.parse_args()
 
-    server = GameServer(args.port, args.player_count, args.players)
+    server = GameServer(args.port, args.player_count, args.players, args.listen_fd,
+                        Telemetry(args.telemetry_fd))
     server.start()
\ No newline at end of file
@@ -0,0 +1,87 @@
+# benchmarks/startup_importtime.py
+"""量測客戶端的啟動時間 (python -X importtime)。
+
+用法:
+    python benchmarks/startup_importtime.py            # 量測目前的程式碼
+    python benchmarks/startup_importtime.py --root DIR # 量測另一份程式碼
+    python benchmarks/startup_importtime.py --baseline DIR # 先量測 DIR (例如 git worktree 的舊版本) 再量測目前的程式碼，方便比較
+    python benchmarks/startup_importtime.py --save     # 結果寫入 benchmarks/results/startup_importtime.txt
+
+每個目標各啟動 N 次新的直譯器，回報 import 總時間與整個程序的執行時間 (中位數)，
+並列出單次量測中最耗時的模組。
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.dirname(BENCH_DIR)
+
+# (名稱, 執行目錄 (相對於 root), 要 import 的模組)
+TARGETS = [
+    ('lobby_client', 'Client', 'lobby_client'),
+    ('developer_client', 'Client', 'developer_client'),
+    ('start_menu', '.', 'start_menu'),
+]
+
+
+def run_once(root, cwd, module):
+    """啟動一次新的直譯器 import 目標模組，回傳 (import 時間 us, 程序總時間 ms, importtime 輸出)"""
+    env = dict(os.environ, PYTHONPATH=root)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=os.path.join(root, cwd), env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    total_us = next(cum for cum, _, name in reversed(rows) if name.strip() == module)
+    return total_us, wall_ms, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Client startup import time benchmark')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='要量測的專案根目錄')
+    parser.add_argument('--baseline', help='同時量測的舊版本根目錄 (列在前面)')
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--top', type=int, default=8, help='列出最耗時的模組數')
+    parser.add_argument('--save', action='store_true', help='寫入 benchmarks/results/startup_importtime.txt')
+    args = parser.parse_args()
+    roots = [os.path.abspath(r) for r in (args.baseline, args.root) if r]
+
+    lines = [f"python: {sys.version.split()[0]}  runs: {args.runs}", ""]
+    for root in roots:
+        # 先編譯成 .pyc (不把編譯時間算進去)
+        subprocess.run([sys.executable, '-m', 'compileall', '-q', root], capture_output=True)
+        lines.append(f"== {root}")
+        for name, cwd, module in TARGETS:
+            imports, walls, rows = [], [], None
+            for _ in range(args.runs):
+                total_us, wall_ms, rows = run_once(root, cwd, module)
+                imports.append(total_us / 1000)
+                walls.append(wall_ms)
+            lines.append(f"{name:<18} import {statistics.median(imports):7.1f} ms   process {statistics.median(walls):7.1f} ms")
+            heaviest = [r for r in sorted(rows, reverse=True) if r[2].strip() != module]
+            for cumulative, _, mod in heaviest[:args.top]:
+                lines.append(f"    {cumulative / 1000:7.2f} ms  {mod.strip()}")
+            lines.append("")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.save:
+        os.makedirs(os.path.join(BENCH_DIR, 'results'), exist_ok=True)
+        with open(os.path.join(BENCH_DIR, 'results', 'startup_importtime.txt'), 'w', encoding='utf-8') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/tetris_client_render.py
+"""量測 Tetris 客戶端的繪圖成本 (SDL dummy 影像驅動，不需要螢幕)。
+
+用法:
+    python benchmarks/tetris_client_render.py                 # 量測目前的程式碼
+    python benchmarks/tetris_client_render.py --baseline DIR  # 先量測 DIR (例如 git worktree 的舊版本) 再量測目前的程式碼
+    python benchmarks/tetris_client_render.py --save          # 結果寫入 benchmarks/results/tetris_client_render.txt
+
+每次量測都啟動真正的 Tetris 伺服器 (server.py) 與一個隨機操作的機器人玩家，
+客戶端在獨立的直譯器中執行 run() 數秒，回報：
+    loops/s  主迴圈次數      frames/s  實際更新到螢幕的次數 (display.flip / update)
+    CPU %    客戶端程序的 CPU 使用率 (含網路線程與機器人)
+    net      伺服器每秒送給一位玩家的資料量
+capped = 正常的 60 FPS 上限；uncapped = 拿掉 clock.tick 的等待，看每秒最多能跑幾個迴圈。
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.dirname(BENCH_DIR)
+MODES = ['capped', 'uncapped']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_bot(port, stop, received):
+    """機器人玩家：每 50ms 送出一個隨機操作，並持續讀掉伺服器廣播 (累計收到的 bytes 數)"""
+    deadline = time.time() + 10
+    while True:
+        try:
+            sock = socket.create_connection(('127.0.0.1', port))
+            break
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+    sock.sendall(b'bot\n')
+
+    def drain():
+        try:
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                received[0] += len(data)
+        except OSError:
+            pass
+
+    def play():
+        rng = random.Random(0)
+        try:
+            while not stop.is_set():
+                action = rng.choice(['LEFT', 'RIGHT', 'ROTATE', 'DOWN'])
+                sock.sendall((json.dumps({'type': 'INPUT', 'action': action}) + '\n').encode())
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    threading.Thread(target=play, daemon=True).start()
+    return sock
+
+
+def run_child(root, mode, seconds):
+    """在這個程序中執行一次量測 (由 main 以子程序呼叫)，結果以 JSON 印在最後一行"""
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    import pygame
+
+    game_dir = os.path.join(root, 'Test_Games', 'tetris')
+    port = free_port()
+    server = subprocess.Popen([sys.executable, 'server.py', '--port', str(port), '--players', 'bench', 'bot'],
+                              cwd=game_dir, env=dict(os.environ, PYTHONPATH=root),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    stop = threading.Event()
+    received = [0]
+    bot = start_bot(port, stop, received)
+
+    # 與 Lobby 啟動遊戲時相同：專案根目錄在 import 路徑中 (game_sdk)
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    spec = importlib.util.spec_from_file_location('tetris_client_bench', os.path.join(game_dir, 'client.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    # 1. 計數：主迴圈次數 (clock.tick) 與實際送到螢幕的次數
+    counts = {'loops': 0, 'frames': 0}
+    real_clock = pygame.time.Clock
+
+    class CountingClock:
+        def __init__(self):
+            self.clock = real_clock()
+
+        def tick(self, fps=0):
+            counts['loops'] += 1
+            return self.clock.tick(fps) if mode == 'capped' else 0
+
+    real_flip, real_update = pygame.display.flip, pygame.display.update
+
+    def flip():
+        counts['frames'] += 1
+        return real_flip()
+
+    def update(*args):
+        counts['frames'] += 1
+        return real_update(*args)
+
+    pygame.time.Clock = CountingClock
+    pygame.display.flip = flip
+    pygame.display.update = update
+
+    # 2. 執行客戶端 seconds 秒
+    client = module.TetrisClient(f'127.0.0.1:{port}', 'bench')
+    threading.Timer(seconds, lambda: setattr(client, 'running', False)).start()
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    try:
+        client.run()
+    except SystemExit:
+        pass
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    stop.set()
+    bot.close()
+    server.kill()
+    server.wait()
+    print(json.dumps({'loops': counts['loops'], 'frames': counts['frames'], 'cpu': cpu, 'wall': wall,
+                      'received': received[0]}))
+
+
+def measure(root, mode, seconds):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                             '--root', root, '--seconds', str(seconds)],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark child failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tetris client render benchmark (headless)')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='要量測的專案根目錄')
+    parser.add_argument('--baseline', help='同時量測的舊版本根目錄 (列在前面)')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--save', action='store_true', help='寫入 benchmarks/results/tetris_client_render.txt')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(os.path.abspath(args.root), args.child, args.seconds)
+        return
+
+    roots = [os.path.abspath(r) for r in (args.baseline, args.root) if r]
+    lines = [f"python: {sys.version.split()[0]}  seconds: {args.seconds}  SDL_VIDEODRIVER=dummy", ""]
+    for root in roots:
+        lines.append(f"== {root}")
+        for mode in MODES:
+            r = measure(root, mode, args.seconds)
+            wall = r['wall'] or 1
+            line = (f"{mode:<9} loops/s {r['loops'] / wall:9.1f}   frames/s {r['frames'] / wall:7.1f}   "
+                    f"CPU {r['cpu'] / wall * 100:5.1f} %   net {r['received'] / wall / 1024:5.2f} KB/s")
+            if mode == 'capped' and r['frames']:
+                # uncapped 時空轉的迴圈也吃 CPU，每個 frame 的成本只看 capped
+                line += f"   {r['cpu'] * 1000 / r['frames']:6.2f} ms CPU/frame"
+            lines.append(line)
+        lines.append("")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.save:
+        os.makedirs(os.path.join(BENCH_DIR, 'results'), exist_ok=True)
+        with open(os.path.join(BENCH_DIR, 'results', 'tetris_client_render.txt'), 'w', encoding='utf-8') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
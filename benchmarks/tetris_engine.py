@@ -0,0 +1,151 @@
+# benchmarks/tetris_engine.py
+"""比較 Tetris 伺服器的兩種引擎：TetrisEngine (list of lists) 與 BitboardTetrisEngine (每列一個整數)。
+
+用法:
+    python benchmarks/tetris_engine.py            # 預設 200000 次操作
+    python benchmarks/tetris_engine.py --moves N
+    python benchmarks/tetris_engine.py --save     # 結果寫入 benchmarks/results/tetris_engine.txt
+
+先用簡單的擺放策略產生數場遊戲的操作序列 (會消行、也會輸)，
+兩個引擎以相同的種子重複播放相同的序列，計算每秒可處理的操作數。
+量測前會先逐步比對兩者的盤面，確認結果完全相同。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import importlib.util
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+ACTIONS = ['LEFT', 'RIGHT', 'ROTATE', 'DOWN', 'DOWN', 'DOWN', 'DROP']
+
+
+def load_server():
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT) # server.py 會 import game_sdk
+    spec = importlib.util.spec_from_file_location('tetris_server_bench',
+                                                  os.path.join(ROOT, 'Test_Games', 'tetris', 'server.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def place(server, engine):
+    """簡單的擺放策略：對目前的方塊試所有旋轉與位置，選消行最多、洞最少、最低的位置"""
+    piece = engine.active_piece
+    best = None
+    for rot in range(len(server.BRICK_SHAPES[piece['id']])):
+        for x in range(-3, server.WIDTH):
+            engine.active_piece = {'id': piece['id'], 'state': rot, 'x': x, 'y': piece['y']}
+            if engine.check_collision():
+                continue
+            while not engine.check_collision(dy=1):
+                engine.active_piece['y'] += 1
+            board = [row[:] for row in engine.board]
+            for cx, cy in server.get_brick_coords(piece['id'], rot, x, engine.active_piece['y']):
+                board[cy][cx] = piece['id']
+            full = sum(1 for row in board if all(row))
+            holes = sum(1 for cx in range(server.WIDTH) for cy in range(1, server.HEIGHT)
+                        if not board[cy][cx] and any(board[y][cx] for y in range(cy)))
+            top = next((y for y, row in enumerate(board) if any(row)), server.HEIGHT)
+            score = (full * 10 - holes * 4 + top, -rot)
+            if best is None or score > best[0]:
+                best = (score, rot, x)
+    engine.active_piece = piece
+    if best is None:
+        return ['DOWN']
+    _, rot, x = best
+    moves = ['ROTATE'] * rot
+    moves += ['LEFT' if x < piece['x'] else 'RIGHT'] * abs(x - piece['x'])
+    return moves
+
+
+def make_games(server, count, seed):
+    """以參考引擎 (TetrisEngine) 與擺放策略產生 count 場遊戲的操作序列 [(seed, actions), ...]。
+    方塊以連續 DOWN 落下 (與實際遊戲的重力相同)，策略會消行，因此也會量到消行的成本。"""
+    games = []
+    rng = random.Random(seed)
+    for g in range(count):
+        game_seed = seed + g
+        engine, actions = server.TetrisEngine(game_seed), []
+        while not engine.game_over and len(actions) < 5000:
+            # 偶爾隨機亂按，避免每場都一樣
+            plan = place(server, engine) if rng.random() > 0.1 else [rng.choice(ACTIONS)]
+            for action in plan:
+                engine.move(action)
+                actions.append(action)
+            piece = engine.active_piece
+            while not engine.game_over and engine.active_piece is piece:
+                engine.move('DOWN')
+                actions.append('DOWN')
+        games.append((game_seed, actions))
+    return games
+
+
+def play(engine_cls, games, total_moves):
+    """重複播放所有遊戲直到執行 total_moves 次操作，回傳 (秒數, 操作數, 場數, 消除行數)"""
+    moves = played = lines = 0
+    start = time.perf_counter()
+    while moves < total_moves:
+        for game_seed, actions in games:
+            engine = engine_cls(game_seed)
+            for action in actions:
+                engine.move(action)
+            moves += len(actions)
+            played += 1
+            lines += engine.total_lines
+    elapsed = time.perf_counter() - start
+    return elapsed, moves, played, lines
+
+
+def verify(server, games):
+    """兩個引擎每一步的盤面、活動方塊與行數都必須相同"""
+    for game_seed, actions in games:
+        a, b = server.TetrisEngine(game_seed), server.BitboardTetrisEngine(game_seed)
+        for step, action in enumerate(actions):
+            a.move(action)
+            b.move(action)
+            if (a.board, a.active_piece, a.total_lines, a.game_over) != (b.board, b.active_piece, b.total_lines, b.game_over):
+                raise AssertionError(f"engines differ in game {game_seed} at step {step} ({action})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tetris engine moves/second benchmark')
+    parser.add_argument('--moves', type=int, default=200000)
+    parser.add_argument('--games', type=int, default=20, help='產生幾場遊戲的操作序列 (重複播放)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--runs', type=int, default=5, help='每個引擎量測幾次，取最快的一次')
+    parser.add_argument('--save', action='store_true', help='寫入 benchmarks/results/tetris_engine.txt')
+    args = parser.parse_args()
+
+    server = load_server()
+    games = make_games(server, args.games, args.seed)
+    verify(server, games)
+    per_round = sum(len(actions) for _, actions in games)
+
+    lines = [f"python: {sys.version.split()[0]}  moves: >= {args.moves}  runs: {args.runs} (best)",
+             f"{args.games} generated games ({per_round} moves), boards verified identical at every step", ""]
+    results = {}
+    for engine_cls in (server.TetrisEngine, server.BitboardTetrisEngine):
+        best = None
+        for _ in range(args.runs):
+            elapsed, moves, played, cleared = play(engine_cls, games, args.moves)
+            rate = moves / elapsed
+            best = rate if best is None else max(best, rate)
+        results[engine_cls.__name__] = best
+        lines.append(f"{engine_cls.__name__:<22} {best:12,.0f} moves/s   "
+                     f"({1e6 / best:5.2f} us/move, {played} games, {cleared} lines cleared)")
+    lines.append(f"speedup: {results['BitboardTetrisEngine'] / results['TetrisEngine']:.2f}x")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.save:
+        os.makedirs(os.path.join(BENCH_DIR, 'results'), exist_ok=True)
+        with open(os.path.join(BENCH_DIR, 'results', 'tetris_engine.txt'), 'w', encoding='utf-8') as f:
+            f.write(report + "\n")
+
+
+if __name__ == '__main__':
+    main()
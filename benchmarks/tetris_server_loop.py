@@ -0,0 +1,145 @@
+# benchmarks/tetris_server_loop.py
+"""量測 Tetris 遊戲伺服器主迴圈的 CPU 成本與排程誤差 (jitter)。
+
+用法:
+    python benchmarks/tetris_server_loop.py                  # 量測目前的程式碼
+    python benchmarks/tetris_server_loop.py --baseline DIR   # 先量測 DIR (例如 git worktree 的舊版本) 再量測目前的程式碼
+    python benchmarks/tetris_server_loop.py --save           # 結果寫入 benchmarks/results/tetris_server_loop.txt
+
+同時啟動 --matches 場 server.py (每場兩個機器人玩家)，執行 --seconds 秒後結束，
+回報每場伺服器程序平均的 CPU 使用率，以及伺服器自己回報的 tick 統計 (GAME_EVENT)。
+idle = 玩家不操作；active = 每位玩家每 100ms 送一個操作。
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ROOT = os.path.dirname(BENCH_DIR)
+MODES = ['idle', 'active']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def connect(port, name):
+    deadline = time.time() + 10
+    while True:
+        try:
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(f"{name}\n".encode())
+            return sock
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def bot(sock, active, stop):
+    """讀掉伺服器廣播；active 時每 100ms 送出一個左右移動 (不會讓遊戲結束)"""
+    threading.Thread(target=lambda: _drain(sock), daemon=True).start()
+    rng = random.Random()
+    try:
+        while active and not stop.is_set():
+            action = rng.choice(['LEFT', 'RIGHT'])
+            sock.sendall((json.dumps({'type': 'INPUT', 'action': action}) + '\n').encode())
+            stop.wait(0.1)
+    except OSError:
+        pass
+
+
+def _drain(sock):
+    try:
+        while sock.recv(65536):
+            pass
+    except OSError:
+        pass
+
+
+def measure(root, mode, matches, seconds):
+    """回傳 (每場平均 CPU %, 各場最後一次回報的 tick 統計)"""
+    game_dir = os.path.join(root, 'Test_Games', 'tetris')
+    env = dict(os.environ, PYTHONPATH=root)
+    stop = threading.Event()
+    servers, socks = [], []
+    for _ in range(matches):
+        port = free_port()
+        proc = subprocess.Popen([sys.executable, 'server.py', '--port', str(port), '--players', 'p1', 'p2'],
+                                cwd=game_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        servers.append(proc)
+        for name in ('p1', 'p2'):
+            sock = connect(port, name)
+            socks.append(sock)
+            threading.Thread(target=bot, args=(sock, mode == 'active', stop), daemon=True).start()
+
+    # 遊戲開始後才開始計時 (扣掉啟動與等待玩家的 CPU)
+    time.sleep(0.5)
+    start = {p.pid: cpu_seconds(p.pid) for p in servers}
+    time.sleep(seconds)
+    used = [cpu_seconds(p.pid) - start[p.pid] for p in servers]
+
+    stop.set()
+    ticks = []
+    for proc in servers:
+        proc.kill()
+        out, _ = proc.communicate()
+        events = [json.loads(line[len('GAME_EVENT: '):]) for line in out.splitlines() if line.startswith('GAME_EVENT: ')]
+        ticks += [e for e in events if e.get('event') == 'tick'][-1:]
+    for sock in socks:
+        sock.close()
+    return sum(used) / len(used) / seconds * 100, ticks
+
+
+def cpu_seconds(pid):
+    """程序目前用掉的 CPU 時間 (Linux /proc)"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def summarize(ticks):
+    if not ticks:
+        return "(no tick stats)"
+    keys = [k for k in ticks[0] if k != 'event']
+    avg = {k: sum(t.get(k, 0) for t in ticks) / len(ticks) for k in keys}
+    return "  ".join(f"{k}={avg[k]:.2f}" for k in keys)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tetris server loop CPU / jitter benchmark')
+    parser.add_argument('--root', default=DEFAULT_ROOT, help='要量測的專案根目錄')
+    parser.add_argument('--baseline', help='同時量測的舊版本根目錄 (列在前面)')
+    parser.add_argument('--matches', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=6, help='至少要大於伺服器的 STATS_INTERVAL 才有 tick 統計')
+    parser.add_argument('--save', action='store_true', help='寫入 benchmarks/results/tetris_server_loop.txt')
+    args = parser.parse_args()
+
+    roots = [os.path.abspath(r) for r in (args.baseline, args.root) if r]
+    lines = [f"python: {sys.version.split()[0]}  matches: {args.matches}  seconds: {args.seconds}  cpus: {os.cpu_count()}", ""]
+    for root in roots:
+        lines.append(f"== {root}")
+        for mode in MODES:
+            cpu, ticks = measure(root, mode, args.matches, args.seconds)
+            lines.append(f"{mode:<7} CPU per match {cpu:6.2f} %   (~{100 / cpu if cpu else float('inf'):,.0f} matches per core)")
+            lines.append(f"        tick stats: {summarize(ticks)}")
+        lines.append("")
+
+    report = "\n".join(lines)
+    print(report)
+    if args.save:
+        os.makedirs(os.path.join(BENCH_DIR, 'results'), exist_ok=True)
+        with open(os.path.join(BENCH_DIR, 'results', 'tetris_server_loop.txt'), 'w', encoding='utf-8') as f:
+            f.write(report)
+
+
+if __name__ == '__main__':
+    main()
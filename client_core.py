@@ -1,7 +1,6 @@
 # client/client_core.py
 import socket
 import threading
-import queue
 import time
 import sys
 import os
@@ -10,7 +9,8 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 # 取得上一層目錄 (project_root)
 parent_dir = os.path.dirname(current_dir)
 # 將上一層目錄加入系統搜尋路徑
-sys.path.append(parent_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
 from config import SERVER_HOST, DEVELOPER_PORT
 from utils import send_message, receive_message 
 
@@ -22,7 +22,11 @@ class ClientCore:
         self.sock = None
         self.is_connected = False
         self.stop_event = threading.Event()
-        self.rx_queue = queue.Queue()
+        # 收到的訊息放在 inbox，主線程以 Condition 阻塞等待 (不需要 sleep 輪詢)
+        self.inbox = []
+        self.inbox_cond = threading.Condition()
+        self.handlers = {} # {訊息 type: [handler]} 由網路線程在收到訊息時立即呼叫
+        self.send_lock = threading.Lock() # 背景下載的執行緒也會送出請求，避免兩則訊息交錯
         self.network_thread = threading.Thread(target=self._run_network, daemon=True)
 
     def start_connection(self):
@@ -48,6 +52,8 @@ class ClientCore:
         if self.sock:
             self.sock.close()
         self.is_connected = False
+        with self.inbox_cond:
+            self.inbox_cond.notify_all()
         print("Disconnected from server.")
 
     def _run_network(self):
@@ -64,8 +70,8 @@ class ClientCore:
                     print("Server disconnected or receive error.")
                     break 
                 
-                # 將收到的訊息放入佇列
-                self.rx_queue.put(message)
+                # 交給已註冊的 handler，沒有被處理的訊息才放入佇列
+                self._dispatch(message)
                 
             except Exception as e:
                 if not self.stop_event.is_set():
@@ -77,8 +83,32 @@ class ClientCore:
         self.sock = None
         # 如果線程意外終止，發送一個特殊訊息通知主程式
         if not self.stop_event.is_set():
-             self.rx_queue.put({'type': 'SERVER_DISCONNECTED', 'message': 'Lost connection to server.'})
+            self._dispatch({'type': 'SERVER_DISCONNECTED', 'message': 'Lost connection to server.'})
+        else:
+            # 主動斷線：叫醒所有正在等待的線程
+            with self.inbox_cond:
+                self.inbox_cond.notify_all()
 
+    def _dispatch(self, message):
+        """呼叫該 type 的 handler；任一 handler 回傳 True 代表已處理，不再放入佇列"""
+        for handler in list(self.handlers.get(message.get('type'), [])):
+            try:
+                if handler(message):
+                    return
+            except Exception as e:
+                print(f"Message handler error ({message.get('type')}): {e}")
+        with self.inbox_cond:
+            self.inbox.append(message)
+            self.inbox_cond.notify_all()
+
+    def on(self, msg_type, handler):
+        """註冊訊息處理函式 handler(msg)，在網路線程中收到該 type 的訊息時立即呼叫。
+        handler 回傳 True 表示訊息已處理完畢，主線程不會再收到它。"""
+        self.handlers.setdefault(msg_type, []).append(handler)
+
+    def off(self, msg_type, handler):
+        if handler in self.handlers.get(msg_type, []):
+            self.handlers[msg_type].remove(handler)
 
     def send_request(self, action, data=None):
         if not self.is_connected or not self.sock:
@@ -90,18 +120,45 @@ class ClientCore:
             "data": data if data is not None else {}
         }
         
-        success = send_message(self.sock, request)
+        with self.send_lock:
+            success = send_message(self.sock, request)
         if not success:
              self.disconnect()
         return success, "Request sent."
         
-    def get_received_message(self):
-        """主線程從接收佇列中取得訊息"""
-        messages = []
-        while not self.rx_queue.empty():
-            messages.append(self.rx_queue.get_nowait())
+    def get_received_message(self, timeout=0):
+        """主線程從接收佇列中取得所有訊息；timeout > 0 時佇列為空會阻塞等待，訊息一到立即返回"""
+        with self.inbox_cond:
+            if not self.inbox and timeout and self.is_connected:
+                self.inbox_cond.wait(timeout)
+            messages = self.inbox
+            self.inbox = []
         return messages
 
+    def next_message(self, timeout=None):
+        """取出最早的一則訊息，佇列為空時最多等待 timeout 秒 (None = 一直等到收到訊息或斷線)"""
+        with self.inbox_cond:
+            self.inbox_cond.wait_for(lambda: self.inbox or not self.is_connected, timeout)
+            return self.inbox.pop(0) if self.inbox else None
+
+    def wait_for(self, msg_types, timeout=None):
+        """阻塞等待指定 type 的訊息 (可傳入多個 type)，其他訊息保留在佇列中照原順序。
+        斷線時回傳 SERVER_DISCONNECTED 訊息，逾時回傳 None。"""
+        if isinstance(msg_types, str):
+            msg_types = (msg_types,)
+        wanted = set(msg_types) | {'SERVER_DISCONNECTED'}
+
+        def find():
+            for index, msg in enumerate(self.inbox):
+                if msg.get('type') in wanted:
+                    return index
+            return None
+
+        with self.inbox_cond:
+            self.inbox_cond.wait_for(lambda: find() is not None or not self.is_connected, timeout)
+            index = find()
+            return self.inbox.pop(index) if index is not None else None
+
 # 開發者專用的 ClientCore 實例 (使用 DeveloperClientCore 名稱更符合舊程式碼結構)
 class DeveloperClientCore(ClientCore):
     def __init__(self):
@@ -6,6 +6,7 @@ import sys
 SERVER_HOST = '140.113.17.11' 
 LOBBY_PORT = 8888
 DEVELOPER_PORT = 8889
+DOWNLOAD_PORT = 8891 # 遊戲檔案分段下載服務 (與 Lobby 連線分開，大檔下載不會卡住大廳操作)
 HEADER_SIZE = 4
 
 # --- 路徑配置 (關鍵修改) ---
@@ -17,10 +18,75 @@ SERVER_DATA_DIR = os.path.join(BASE_DIR, 'Server', 'server_data')
 USERS_DB_FILE = os.path.join(SERVER_DATA_DIR, 'users.json')
 GAMES_DB_FILE = os.path.join(SERVER_DATA_DIR, 'games.json')
 UPLOADED_GAMES_DIR = os.path.join(SERVER_DATA_DIR, 'uploaded_games')
+# 以 SHA-256 定址的遊戲檔案庫 (各版本共用相同內容的檔案)
+BLOB_STORE_DIR = os.path.join(SERVER_DATA_DIR, 'blob_store')
+# 每款遊戲保留的版本數 (更新時刪除更舊的版本清單)
+KEEP_GAME_VERSIONS = 3
+# 未被任何版本參照的檔案，寫入超過這段時間才會被清除 (避免刪到上傳中的檔案)
+BLOB_GC_GRACE_SEC = 3600
 
 # Client 端下載區 (存放在 Client/client_downloads)
 CLIENT_DOWNLOADS_BASE_DIR = os.path.join(BASE_DIR, 'Client', 'client_downloads')
+# 同一台電腦所有玩家共用的遊戲檔案快取，安裝目錄以 hardlink 指向這裡
+CLIENT_CACHE_DIR = os.path.join(BASE_DIR, 'Client', 'client_cache')
+# 快取容量上限，超過時淘汰最久沒用到、且沒有玩家安裝的檔案
+CLIENT_CACHE_MAX_MB = 512
+# True: 登入後啟動常駐的遊戲啟動器 (預先載入 pygame)，遊戲開始時以 fork 啟動客戶端 (僅 POSIX，其他平台照舊開新程序)
+RESIDENT_GAME_LAUNCHER = True
 
-# 確保目錄存在
-os.makedirs(SERVER_DATA_DIR, exist_ok=True)
-os.makedirs(CLIENT_DOWNLOADS_BASE_DIR, exist_ok=True)
\ No newline at end of file
+# 確保目錄存在 (由 Server / Client 的進入點呼叫；import config 本身不會建立目錄)
+def ensure_dirs(*dirs):
+    for d in dirs or (SERVER_DATA_DIR, CLIENT_DOWNLOADS_BASE_DIR):
+        os.makedirs(d, exist_ok=True)
+
+# --- 遊戲檔案下載 ---
+# 需要傳送的檔案總量超過這個大小時，改由下載服務分段平行傳輸 (小檔案直接附在 Lobby 回應中)
+RANGE_DOWNLOAD_MIN_BYTES = 256 * 1024
+# 每個分段的大小與 Client 同時開啟的連線數
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+DOWNLOAD_PARALLEL = 4
+# 下載憑證的有效時間 (秒)
+DOWNLOAD_TOKEN_TTL_SEC = 600
+
+# --- 遊戲伺服器 Port 池 ---
+# Lobby 只會從這個範圍分配 Port 給遊戲伺服器 (含頭尾)
+GAME_PORT_RANGE = (20000, 20999)
+# True: Lobby 先 bind 好 listening socket，再透過 fd 交給子程序 (僅 POSIX 支援)
+GAME_SERVER_INHERIT_SOCKET = False
+# game_config.json 設定 "ready_signal": "stdout" 的遊戲，需在這段時間內輸出 GAME_READY，否則視為啟動失敗
+GAME_START_TIMEOUT_SEC = 15
+
+# --- 遊戲伺服器輸出 (Log) ---
+# 每場遊戲只保留最後 N 行輸出供除錯
+GAME_LOG_TAIL_LINES = 200
+# True: 另外把完整輸出寫到磁碟 (依大小輪替)
+GAME_LOG_TO_DISK = False
+GAME_LOG_DIR = os.path.join(SERVER_DATA_DIR, 'game_logs')
+GAME_LOG_MAX_BYTES = 1024 * 1024
+GAME_LOG_BACKUP_COUNT = 3
+
+# --- 遊戲伺服器准入控制 ---
+# 同時執行的遊戲伺服器上限 (全體 / 每款遊戲)，超過時依 FIFO 排隊
+MAX_GAME_SERVERS = 50
+MAX_GAME_SERVERS_PER_GAME = 20
+# 每個遊戲伺服器子程序的資源限制 (None 表示不限制，僅 POSIX 有效)
+GAME_SERVER_RLIMITS = {
+    'cpu_seconds': None,
+    'address_space_mb': 1024,
+    'open_files': 256,
+}
+
+# --- 多節點遊戲主機 (Game Host Agent) ---
+# Lobby 本機是否也執行遊戲伺服器 (False 時全部交給 Agent)
+LOBBY_HOSTS_GAMES = True
+# Agent 註冊時需提供的共用密鑰 (可讓 Lobby 在 Agent 上啟動程式，請用環境變數設定)
+# 仍是預設值時，Agent 拒絕啟動、Lobby 也拒絕 Agent 註冊
+GAME_AGENT_DEFAULT_SECRET = 'change-me'
+GAME_AGENT_SECRET = os.environ.get('GAME_AGENT_SECRET', GAME_AGENT_DEFAULT_SECRET)
+GAME_AGENT_HEARTBEAT_SEC = 5
+GAME_AGENT_CAPACITY = 20
+
+# --- in-process 遊戲 (game_config.json: "runtime": "inprocess") ---
+# 輕量遊戲直接在 Lobby 的 event loop 中執行，所有遊戲共用同一個 Port
+INPROCESS_GAME_PORT = 8890
+INPROCESS_MAX_MATCHES = 500
@@ -0,0 +1,256 @@
+# game_sdk.py
+# 給遊戲開發者使用的輔助模組。
+# Lobby 啟動遊戲時會把專案根目錄加入 PYTHONPATH，遊戲程式可以直接 import game_sdk。
+import os
+import json
+import time
+import socket
+import struct
+import threading
+
+# 單則訊息 (一行或一個長度前綴封包) 的長度上限，超過時視為斷線，避免緩衝區無限成長
+MAX_FRAME = 64 * 1024
+
+
+class GameRuntime:
+    """in-process 遊戲的基底類別。
+
+    在 game_config.json 宣告:
+        "runtime": "inprocess",
+        "runtime_class": "server:MyGame"     (模組名稱:類別名稱)
+
+    Lobby 會在同一個 event loop 中同時執行多場遊戲，每場遊戲一個實例。
+    下列 hook 可以是一般函式或 async 函式，同一場遊戲的事件會依序處理：
+        on_join(player)           玩家連線
+        on_leave(player)          玩家斷線
+        on_message(player, text)  收到玩家送來的一行文字
+        on_tick()                 每 tick_interval 秒呼叫一次 (None 表示不需要)
+
+    hook 中不可以呼叫 time.sleep() 等阻塞函式，請改用 await self.sleep()。
+    """
+
+    tick_interval = None
+
+    def __init__(self, players):
+        self.players = list(players) # 房間的完整玩家名單
+        self.connected = []          # 目前在線的玩家 (依連線順序)
+        self._session = None         # 由 Lobby 設定
+
+    # --- Hooks ---
+
+    def on_join(self, player):
+        pass
+
+    def on_leave(self, player):
+        pass
+
+    def on_message(self, player, text):
+        pass
+
+    def on_tick(self):
+        pass
+
+    # --- API ---
+
+    def send(self, player, message):
+        """傳送一行文字給指定玩家"""
+        self._session.send(player, message)
+
+    def broadcast(self, message, exclude=None):
+        """傳送一行文字給所有在線玩家"""
+        for player in list(self.connected):
+            if player != exclude:
+                self._session.send(player, message)
+
+    def end_game(self, winner):
+        """結束遊戲並直接回報結果給 Lobby (winner 為玩家名稱或 'None')"""
+        self._session.end(winner)
+
+    async def sleep(self, seconds):
+        await self._session.sleep(seconds)
+
+
+# === 獨立程序遊戲伺服器使用的輔助工具 ===
+
+def add_server_arguments(parser):
+    """加入 Lobby 啟動遊戲伺服器時會傳入的參數"""
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--player_count', type=int, default=2)
+    parser.add_argument('--players', nargs='+', required=True)
+    parser.add_argument('--listen_fd', type=int, default=None)
+    parser.add_argument('--telemetry_fd', type=int, default=None)
+
+
+def open_listen_socket(port, backlog, listen_fd=None):
+    """取得遊戲伺服器的 listening socket (Lobby 有傳入 fd 時直接沿用)"""
+    if listen_fd is not None:
+        return socket.socket(fileno=listen_fd)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('0.0.0.0', port))
+    sock.listen(backlog)
+    return sock
+
+
+class Telemetry:
+    """回報給 Lobby 的結構化事件通道。
+
+    game_config.json 設定 "telemetry": true 時，Lobby 會用 --telemetry_fd 傳入一條 pipe，
+    每個事件以 4 bytes 長度 + JSON 的格式寫入 (與 utils.send_message 相同)。
+    沒有 fd 時 (例如手動執行或舊版 Lobby) 改用 stdout 的 GAME_READY / GAME_RESULT / GAME_EVENT。
+
+    事件：ready、player_joined、tick (統計資料)、result
+    """
+
+    def __init__(self, fd=None):
+        self.fd = fd
+        self.lock = threading.Lock() # 遊戲可能在多條執行緒中回報
+        self.start_time = time.time()
+
+    def ready(self):
+        """開始監聽，玩家可以連線"""
+        self.send('ready')
+
+    def player_joined(self, player):
+        self.send('player_joined', player=player)
+
+    def tick_stats(self, **stats):
+        """定期回報的統計資料 (例如每秒 tick 數、平均處理時間)"""
+        self.send('tick', **stats)
+
+    def result(self, winner, players, **extra):
+        """遊戲結果 (extra 例如 scores={...})，會自動附上遊戲時間 duration"""
+        self.send('result', winner=winner, players=players,
+                  duration=round(time.time() - self.start_time, 2), **extra)
+
+    def send(self, event, **data):
+        data['event'] = event
+        if self.fd is None:
+            self._print_fallback(event, data)
+            return
+        body = json.dumps(data).encode('utf-8')
+        frame = struct.pack('!I', len(body)) + body
+        with self.lock:
+            try:
+                while frame:
+                    written = os.write(self.fd, frame)
+                    frame = frame[written:]
+            except OSError:
+                # Lobby 端已關閉，改用 stdout
+                self.fd = None
+                self._print_fallback(event, data)
+
+    def _print_fallback(self, event, data):
+        if event == 'ready':
+            print("GAME_READY", flush=True)
+        elif event == 'result':
+            print(f"GAME_RESULT: {json.dumps(data)}", flush=True)
+        else:
+            print(f"GAME_EVENT: {json.dumps(data)}", flush=True)
+
+
+# === 遊戲客戶端與伺服器共用的連線工具 ===
+class FrameReader:
+    """從 socket 依序讀出一則一則的訊息。
+
+    預設每行一則 (以 \\n 分隔，行尾的 \\r 會去掉)；
+    length_prefixed=True 時改為 4 bytes 長度 + 內容 (與 utils.send_message 相同)。
+
+    收到的資料累積在 bytearray 中，從上次找過的位置繼續 find(b'\\n')，
+    取出一則就刪掉緩衝區前端，不會像 str 相加再 split 那樣在大量訊息湧入時反覆複製。
+    切出完整的一則之後才解碼 UTF-8 (換行字元不會出現在多位元組字元中)，
+    中文字被拆在兩個封包之間也不會解碼失敗。
+    單則訊息超過 max_frame (沒有換行或宣告的長度過大) 時視為斷線，之後的讀取都回傳 None。
+
+        reader = FrameReader(sock)
+        name = reader.read()          # 連線結束時回傳 None
+        for line in reader: ...       # 逐則讀到連線結束
+    """
+
+    def __init__(self, sock, length_prefixed=False, bufsize=4096, max_frame=MAX_FRAME):
+        self.sock = sock
+        self.length_prefixed = length_prefixed
+        self.bufsize = bufsize
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+        self.scanned = 0 # 換行模式：buffer[:scanned] 已確認沒有換行
+        self.closed = False # 收到超過 max_frame 的訊息後不再讀取
+
+    def read_bytes(self):
+        """下一則訊息的原始 bytes；連線結束或訊息超過 max_frame 時回傳 None (最後不完整的部分會被丟棄)。
+        socket 設有 timeout 時，逾時的 socket.timeout 會直接拋出，已收到的資料保留在緩衝區。"""
+        while not self.closed:
+            frame = self._take()
+            if frame is not None and len(frame) <= self.max_frame:
+                return frame
+            if frame is not None or self._pending_size() > self.max_frame:
+                self.closed = True
+                self.buffer.clear()
+                return None
+            data = self.sock.recv(self.bufsize)
+            if not data:
+                return None
+            self.buffer += data
+
+    def read(self):
+        """下一則訊息 (str)，連線結束時回傳 None"""
+        frame = self.read_bytes()
+        if frame is None:
+            return None
+        return frame.decode('utf-8', errors='replace')
+
+    def read_json(self):
+        """下一則 JSON 訊息，連線結束時回傳 None (格式錯誤時拋出 ValueError)"""
+        frame = self.read_bytes()
+        if frame is None:
+            return None
+        return json.loads(frame)
+
+    def __iter__(self):
+        while True:
+            message = self.read()
+            if message is None:
+                return
+            yield message
+
+    def _pending_size(self):
+        """目前這則訊息的長度：長度前綴模式為宣告的長度，換行模式為尚未出現換行的部分"""
+        if self.length_prefixed:
+            return struct.unpack_from('!I', self.buffer)[0] if len(self.buffer) >= 4 else 0
+        return len(self.buffer)
+
+    def _take(self):
+        """從緩衝區取出一則完整的訊息，還沒收完時回傳 None"""
+        buf = self.buffer
+        if self.length_prefixed:
+            if len(buf) < 4:
+                return None
+            end = 4 + struct.unpack_from('!I', buf)[0]
+            if len(buf) < end:
+                return None
+            frame = bytes(buf[4:end])
+            del buf[:end]
+            return frame
+
+        end = buf.find(b'\n', self.scanned)
+        if end < 0:
+            self.scanned = len(buf)
+            return None
+        frame = bytes(buf[:end])
+        del buf[:end + 1] # bytearray 刪除前端不需要搬動剩下的資料
+        self.scanned = 0
+        return frame[:-1] if frame.endswith(b'\r') else frame
+
+
+async def read_line_async(reader):
+    """FrameReader 換行模式的 asyncio 版本 (Lobby 的 in-process 遊戲主機使用)。
+
+    reader 為 asyncio.StreamReader。規則與 FrameReader 相同：以 \\n 分隔、去掉行尾的 \\r、
+    切出完整的一行後才解碼；連線結束時回傳 None (最後不完整的部分會被丟棄)。
+    單行長度上限由 StreamReader 的 limit 決定 (建立時傳入 limit=MAX_FRAME)，超過時 readline 拋出 ValueError。
+    """
+    frame = await reader.readline()
+    if not frame.endswith(b'\n'):
+        return None
+    frame = frame[:-1]
+    return (frame[:-1] if frame.endswith(b'\r') else frame).decode('utf-8', errors='replace')
@@ -0,0 +1,286 @@
+# Server/blob_store.py
+import os
+import io
+import json
+import time
+import shutil
+import zlib
+import zipfile
+import hashlib
+import threading
+
+from config import BLOB_STORE_DIR, BLOB_GC_GRACE_SEC
+from utils import manifest_hash, safe_relpath, is_blob_hash
+
+
+class BlobStore:
+    """以內容定址 (SHA-256) 儲存遊戲檔案。
+
+    - blobs/ab/abcdef...     每個不同內容的檔案只存一份，跨遊戲、跨版本共用
+    - manifests/{game}/{version}.json   一個版本就是一份 (path, hash, mode) 清單
+
+    上傳新版本時只需要傳送 missing() 回報缺少的 blob，未變更的檔案不會重複傳輸與儲存。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, 'blobs')
+        self.manifest_dir = os.path.join(root, 'manifests')
+        self.lock = threading.RLock() # 保護 manifest 寫入與 GC
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.manifest_dir, exist_ok=True)
+
+    # --- Blob ---
+
+    def blob_path(self, digest):
+        # 外部傳入的 hash 應已在協定層檢查過，這裡再確認一次不會組出目錄外的路徑
+        assert is_blob_hash(digest), f"Invalid blob hash: {digest!r}"
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def missing(self, digests):
+        """回傳尚未儲存的 hash (去除重複，保持順序)"""
+        result = []
+        for digest in dict.fromkeys(digests):
+            if not self.has(digest):
+                result.append(digest)
+        return result
+
+    def put(self, data, digest=None):
+        """儲存一個 blob，回傳其 hash；有提供 digest 時會驗證內容"""
+        actual = hashlib.sha256(data).hexdigest()
+        if digest and digest != actual:
+            raise ValueError(f"Blob hash mismatch: expected {digest}, got {actual}")
+        path = self.blob_path(actual)
+        if os.path.exists(path):
+            return actual
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先寫暫存檔再改名，其他執行緒不會讀到寫到一半的 blob
+        tmp_path = f"{path}.tmp{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return actual
+
+    def writer(self, digest):
+        """逐段寫入 zlib 壓縮的 blob (串流上傳用)，完成時 commit() 驗證 hash"""
+        return BlobWriter(self, digest)
+
+    def read(self, digest):
+        with open(self.blob_path(digest), 'rb') as f:
+            return f.read()
+
+    # --- Manifest ---
+
+    def _manifest_path(self, game_name, version):
+        return os.path.join(self.manifest_dir, game_name, f"{version}.json")
+
+    def save_manifest(self, game_name, version, files):
+        """儲存版本清單 (所有 blob 必須已存在)，回傳 manifest dict"""
+        files = [{'path': f['path'], 'hash': f['hash'], 'mode': int(f.get('mode', 0o644)) & 0o777,
+                  'size': int(f.get('size', 0))} for f in files]
+        for f in files:
+            safe_relpath(f['path'])
+        missing = self.missing(f['hash'] for f in files)
+        if missing:
+            raise ValueError(f"{len(missing)} file(s) missing from upload.")
+
+        manifest = {
+            'game_name': game_name,
+            'version': version,
+            'build_hash': manifest_hash(files),
+            'created': time.time(),
+            'files': sorted(files, key=lambda f: f['path']),
+        }
+        path = self._manifest_path(game_name, version)
+        with self.lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_path, path)
+        return manifest
+
+    def load_manifest(self, game_name, version):
+        try:
+            with open(self._manifest_path(game_name, version), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def versions(self, game_name):
+        """回傳該遊戲所有版本的 manifest，依上傳時間由舊到新排序"""
+        folder = os.path.join(self.manifest_dir, game_name)
+        if not os.path.isdir(folder):
+            return []
+        manifests = []
+        for filename in os.listdir(folder):
+            if filename.endswith('.json'):
+                manifest = self.load_manifest(game_name, filename[:-len('.json')])
+                if manifest:
+                    manifests.append(manifest)
+        return sorted(manifests, key=lambda m: m['created'])
+
+    def delete_version(self, game_name, version):
+        with self.lock:
+            try:
+                os.remove(self._manifest_path(game_name, version))
+            except FileNotFoundError:
+                pass
+
+    def delete_game(self, game_name):
+        with self.lock:
+            shutil.rmtree(os.path.join(self.manifest_dir, game_name), ignore_errors=True)
+
+    # --- 匯入 / 匯出 ---
+
+    def import_zip(self, zip_data):
+        """把 zip 中的檔案存成 blob，回傳檔案清單 (相容舊版上傳格式)"""
+        files = []
+        with zipfile.ZipFile(io.BytesIO(zip_data)) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or '__pycache__' in info.filename.split('/'):
+                    continue
+                data = zf.read(info)
+                mode = (info.external_attr >> 16) & 0o777 or 0o644
+                files.append({'path': info.filename, 'hash': self.put(data), 'mode': mode, 'size': len(data)})
+        return files
+
+    def ensure_manifest(self, game_name, version, legacy_zip_path):
+        """取得 manifest；舊資料只有 {version}.zip 時先匯入"""
+        manifest = self.load_manifest(game_name, version)
+        if manifest is None and os.path.exists(legacy_zip_path):
+            print(f"Importing legacy build {game_name} v{version} into blob store...")
+            with open(legacy_zip_path, 'rb') as f:
+                files = self.import_zip(f.read())
+            manifest = self.save_manifest(game_name, version, files)
+        return manifest
+
+    def build_zip(self, manifest):
+        """依 manifest 組出 zip (給仍使用 zip 的下載端與 Agent)"""
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for f in manifest['files']:
+                info = zipfile.ZipInfo(f['path'])
+                info.external_attr = (0o100000 | f['mode']) << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                zf.writestr(info, self.read(f['hash']))
+        return buf.getvalue()
+
+    def checkout_dir(self, manifest, base_dir):
+        """版本展開的位置：base_dir/{game}/{version}_{build_hash 前 12 碼}"""
+        return os.path.join(base_dir, manifest['game_name'],
+                            f"{manifest['version']}_{manifest['build_hash'][:12]}")
+
+    def checkout(self, manifest, base_dir):
+        """把版本展開到 checkout_dir()，已存在則直接回傳路徑。
+
+        POSIX 上以 hardlink 指向 blob，不需要複製檔案內容 (遊戲不可原地修改自己的檔案)。
+        """
+        target = self.checkout_dir(manifest, base_dir)
+        if os.path.exists(target):
+            return target
+
+        # 先展開到暫存目錄再改名，避免其他請求看到展開到一半的目錄
+        tmp_dir = f"{target}.tmp{threading.get_ident()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        try:
+            for f in manifest['files']:
+                dest = os.path.join(tmp_dir, safe_relpath(f['path']))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                self._link_or_copy(f['hash'], dest, f['mode'])
+            os.rename(tmp_dir, target)
+        except FileExistsError:
+            # 其他請求已經展開完成
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return target
+
+    def _link_or_copy(self, digest, dest, mode):
+        src = self.blob_path(digest)
+        # 有執行權限的檔案需要自己的 mode，不能與 blob 共用 inode
+        if os.name == 'posix' and not mode & 0o111:
+            try:
+                os.link(src, dest)
+                return
+            except OSError:
+                pass # 不同檔案系統等情況，改用複製
+        shutil.copyfile(src, dest)
+        os.chmod(dest, mode)
+
+    # --- 清理 ---
+
+    def gc(self):
+        """刪除沒有任何 manifest 參照的 blob，回傳 (刪除數量, 釋放 bytes)。
+
+        剛寫入不久的 blob 可能屬於進行中的上傳 (manifest 尚未儲存)，保留 BLOB_GC_GRACE_SEC 秒。
+        """
+        with self.lock:
+            referenced = set()
+            for game_name in os.listdir(self.manifest_dir):
+                for manifest in self.versions(game_name):
+                    referenced.update(f['hash'] for f in manifest['files'])
+
+            removed, freed = 0, 0
+            cutoff = time.time() - BLOB_GC_GRACE_SEC
+            for prefix in os.listdir(self.blob_dir):
+                prefix_dir = os.path.join(self.blob_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    path = os.path.join(prefix_dir, digest)
+                    st = os.stat(path)
+                    if digest in referenced or st.st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                    removed += 1
+                    freed += st.st_size
+        if removed:
+            print(f"Blob store GC: removed {removed} blob(s), freed {freed} bytes.")
+        return removed, freed
+
+
+class BlobWriter:
+    """一邊解壓一邊寫入暫存檔並計算 hash，記憶體用量與檔案大小無關"""
+
+    def __init__(self, store, digest):
+        self.store = store
+        self.digest = digest
+        self.path = store.blob_path(digest)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.tmp_path = f"{self.path}.tmp{threading.get_ident()}"
+        self.file = open(self.tmp_path, 'wb')
+        self.decompressor = zlib.decompressobj()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, compressed):
+        data = self.decompressor.decompress(compressed)
+        self._write_raw(data)
+
+    def _write_raw(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        self.file.write(data)
+
+    def commit(self):
+        self._write_raw(self.decompressor.flush())
+        self.file.close()
+        if self.sha256.hexdigest() != self.digest:
+            os.remove(self.tmp_path)
+            raise ValueError(f"Blob hash mismatch: {self.digest}")
+        os.replace(self.tmp_path, self.path)
+        return self.size
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+# 建立全域單例，developer_server 與 lobby_server 共用
+blob_store = BlobStore(BLOB_STORE_DIR)
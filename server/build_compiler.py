@@ -0,0 +1,51 @@
+# Server/build_compiler.py
+import os
+import sys
+import tempfile
+import posixpath
+import py_compile
+
+from blob_store import blob_store
+
+
+def pyc_path(source_path):
+    """'a/server.py' -> 'a/__pycache__/server.cpython-311.pyc' (與 importlib 的規則相同，使用 '/' 分隔)"""
+    folder, filename = posixpath.split(source_path)
+    stem = filename[:-len('.py')]
+    return posixpath.join(folder, '__pycache__', f"{stem}.{sys.implementation.cache_tag}.pyc")
+
+
+def compile_build(files):
+    """上架時預先編譯遊戲的 .py 檔，回傳 (pyc 檔案清單, 語法錯誤清單)。
+
+    使用 CHECKED_HASH 模式：.pyc 以原始碼內容的 hash 驗證而非 mtime，
+    展開 / hardlink / 下載後檔案時間改變也不會失效，遊戲啟動時不需要重新編譯。
+    產生的 .pyc 存入 blob store，加進版本清單後隨遊戲一起展開與下載。
+    """
+    pyc_files = []
+    errors = []
+    fd, tmp_path = tempfile.mkstemp(suffix='.pyc')
+    os.close(fd)
+    try:
+        for f in files:
+            if not f['path'].endswith('.py'):
+                continue
+            try:
+                py_compile.compile(
+                    blob_store.blob_path(f['hash']),
+                    cfile=tmp_path,
+                    dfile=f['path'], # traceback 中顯示遊戲內的相對路徑
+                    doraise=True,
+                    invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH
+                )
+            except py_compile.PyCompileError as e:
+                error = e.exc_value
+                line = getattr(error, 'lineno', None)
+                errors.append(f"{f['path']}" + (f" line {line}" if line else '') + f": {error.__class__.__name__}: {getattr(error, 'msg', error)}")
+                continue
+            with open(tmp_path, 'rb') as fp:
+                data = fp.read()
+            pyc_files.append({'path': pyc_path(f['path']), 'hash': blob_store.put(data), 'mode': 0o644, 'size': len(data)})
+    finally:
+        os.remove(tmp_path)
+    return pyc_files, errors
@@ -1,7 +1,9 @@
 # db_manager.py
 import json
 import os
+import uuid
 import datetime
+import threading
 from config import USERS_DB_FILE, GAMES_DB_FILE, SERVER_DATA_DIR
 
 class DBManager:
@@ -17,6 +19,14 @@ class DBManager:
         # 紀錄已登入用戶 (非持久化，Server 重啟清空)
         self.logged_in_users = {} # {session_token: username} 或 {username: socket}
 
+        # 商城版本號：遊戲新增 / 更新 / 下架 / 新評論時遞增，每個遊戲記錄最後變更時的 revision
+        # Client 帶上次的 revision 來查詢，只會收到之後變更的遊戲
+        # 下架紀錄只存在記憶體，因此每次啟動產生新的 epoch，epoch 不同的 Client 會重新取得完整列表
+        self.catalog_epoch = uuid.uuid4().hex
+        self.catalog_revision = max((g.get('revision', 0) for g in self.game_data.values()), default=0)
+        self.deleted_games = {} # {game_name: 下架時的 revision}
+        self.catalog_lock = threading.Lock()
+
     def _load_data(self, filename, default_data):
         """從 JSON 檔案載入資料，若檔案不存在則創建預設值。"""
         if os.path.exists(filename):
@@ -42,7 +52,7 @@ class DBManager:
 
     # --- 遊戲相關操作 ---
     
-    def create_game(self, game_name, version, author, config):
+    def create_game(self, game_name, version, author, config, build_hash=None):
         """D1 上架新遊戲 (扁平化結構)"""
         
         # 1. 檢查遊戲是否已存在
@@ -59,13 +69,19 @@ class DBManager:
             
             # --- 扁平化版本資訊 ---
             "version": version,
+            "build_hash": build_hash, # 版本檔案清單的 hash (見 blob_store)
             "server_cmd": config.get('server_cmd'), # 新增
+            "runtime": config.get('runtime', 'process'), # process / inprocess
+            "runtime_class": config.get('runtime_class'),
+            "ready_signal": config.get('ready_signal', 'none'), # stdout: 等待 GAME_READY
+            "telemetry": config.get('telemetry', False), # True: 啟動時傳入 --telemetry_fd
             "client_cmd": config.get('client_cmd'), # 新增
             "is_gui": config.get('is_gui'),
             "upload_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             
             "reviews": []
         }
+        self._touch_game(game_name)
 
         # 3. 儲存
         if self._save_data(GAMES_DB_FILE, self.game_data):
@@ -73,7 +89,7 @@ class DBManager:
         else:
             return False, "Failed to write to DB."
 
-    def update_game(self, game_name, version, author, config):
+    def update_game(self, game_name, version, author, config, build_hash=None):
         """D2 更新遊戲 (直接覆蓋欄位)"""
         
         # 1. 檢查遊戲是否存在
@@ -94,10 +110,16 @@ class DBManager:
         
         # --- 更新版本資訊 (直接覆蓋) ---
         game_entry['version'] = version
+        game_entry['build_hash'] = build_hash
         game_entry['server_cmd'] = config.get('server_cmd') # 新增
+        game_entry['runtime'] = config.get('runtime', 'process')
+        game_entry['runtime_class'] = config.get('runtime_class')
+        game_entry['ready_signal'] = config.get('ready_signal', 'none')
+        game_entry['telemetry'] = config.get('telemetry', False)
         game_entry['client_cmd'] = config.get('client_cmd') # 新增
         game_entry['is_gui'] = config.get('is_gui')
         game_entry['upload_time'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._touch_game(game_name)
         
         # 4. 儲存
         if self._save_data(GAMES_DB_FILE, self.game_data):
@@ -118,6 +140,9 @@ class DBManager:
 
         # 3. 刪除條目
         del self.game_data[game_name]
+        with self.catalog_lock:
+            self.catalog_revision += 1
+            self.deleted_games[game_name] = self.catalog_revision
 
         # 4. 儲存
         if self._save_data(GAMES_DB_FILE, self.game_data):
@@ -172,6 +197,20 @@ class DBManager:
         """取得所有已上架遊戲的列表。"""
         return self.game_data
 
+    def _touch_game(self, game_name):
+        """標記遊戲資料已變更 (給 Client 的增量商城列表使用)"""
+        with self.catalog_lock:
+            self.catalog_revision += 1
+            self.game_data[game_name]['revision'] = self.catalog_revision
+            self.deleted_games.pop(game_name, None)
+
+    def get_catalog_changes(self, since_revision):
+        """回傳 since_revision 之後 (變更的遊戲 {name: info}, 下架的遊戲名稱)"""
+        with self.catalog_lock:
+            changed = {name: info for name, info in self.game_data.items() if info.get('revision', 0) > since_revision}
+            deleted = [name for name, rev in self.deleted_games.items() if rev > since_revision]
+        return changed, deleted
+
     def get_games_by_author(self, author):
         """取得特定作者的上架遊戲列表 (開發者後台用)"""
         my_games = {}
@@ -214,6 +253,7 @@ class DBManager:
                 r['rating'] = rating
                 r['comment'] = comment
                 r['timestamp'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self._touch_game(game_name)
                 self._save_data(GAMES_DB_FILE, self.game_data)
                 return True, "Review updated."
 
@@ -225,6 +265,7 @@ class DBManager:
         }
         
         self.game_data[game_name]["reviews"].append(new_review)
+        self._touch_game(game_name)
         
         if self._save_data(GAMES_DB_FILE, self.game_data):
             return True, "Review added successfully."
@@ -233,8 +274,8 @@ class DBManager:
 
     # --- 對戰紀錄操作 ---
 
-    def add_match_record(self, game_name, players, winner):
-        """記錄對戰結果到所有參與玩家的歷史中"""
+    def add_match_record(self, game_name, players, winner, details=None):
+        """記錄對戰結果到所有參與玩家的歷史中 (details 例如 duration / scores)"""
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         record = {
@@ -244,6 +285,8 @@ class DBManager:
             "winner": winner,
             "result": "WIN" if winner else "DRAW" # 簡單判定
         }
+        if details:
+            record['details'] = details
 
         # 更新所有參與者的紀錄
         for player in players:
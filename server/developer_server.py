@@ -5,14 +5,17 @@ import sys
 import os
 import base64
 import shutil
+import zlib
 current_dir = os.path.dirname(os.path.abspath(__file__))
 # 取得上一層目錄 (project_root)
 parent_dir = os.path.dirname(current_dir)
 # 將上一層目錄加入系統搜尋路徑
 sys.path.append(parent_dir)
-from utils import send_message, receive_message
+from utils import send_message, receive_message, receive_exact, is_blob_hash
 from db_manager import db_manager
-from config import SERVER_HOST, DEVELOPER_PORT, UPLOADED_GAMES_DIR
+from blob_store import blob_store
+from build_compiler import compile_build
+from config import SERVER_HOST, DEVELOPER_PORT, UPLOADED_GAMES_DIR, KEEP_GAME_VERSIONS
 
 class DeveloperServer:
     def __init__(self):
@@ -119,7 +122,16 @@ class DeveloperServer:
 
         if action == 'logout':
             return self._handle_logout(data)
-        elif action == 'upload_game':
+        elif action == 'missing_blobs':
+            return self._handle_missing_blobs(data)
+        elif action in ('upload_game', 'update_game') and data.get('stream'):
+            # 檔案內容緊接在請求之後串流送達，必須先全部讀完才能回應
+            error = self._receive_blob_stream(client_sock)
+            if error:
+                response_type = 'UPLOAD_RESPONSE' if action == 'upload_game' else 'UPDATE_RESPONSE'
+                return {'type': response_type, 'success': False, 'message': error}
+
+        if action == 'upload_game':
             return self._handle_upload_game(data, current_user)
         elif action == 'update_game':
             return self._handle_update_game(data, current_user)
@@ -183,95 +195,158 @@ class DeveloperServer:
         
         return {'type': 'LOGOUT_RESPONSE', 'success': False, 'message': 'User not logged in or invalid session.'}
 
+    def _handle_missing_blobs(self, data):
+        """回傳 Server 尚未儲存的檔案 hash，Client 只需上傳這些檔案"""
+        hashes = data.get('hashes', [])
+        if not isinstance(hashes, list) or not all(is_blob_hash(h) for h in hashes):
+            return {'type': 'MISSING_BLOBS_RESPONSE', 'success': False, 'message': 'Invalid blob hash.'}
+        return {'type': 'MISSING_BLOBS_RESPONSE', 'success': True, 'data': {'missing': blob_store.missing(hashes)}}
+
+    def _receive_blob_stream(self, client_sock):
+        """接收串流上傳的檔案內容，回傳錯誤訊息 (成功為 None)。
+
+        每個 frame 為 JSON 標頭 {'hash', 'length', 'final'} 加上 length bytes 的 zlib 壓縮資料，
+        同一個檔案可以分成多個 frame；最後以 {'end': True} 結束。
+        發生錯誤後仍會讀完剩下的 frame (直到 end)，連線才能繼續處理下一個請求；
+        標頭的 length 不合法時無法再對齊 frame，拋出 ConnectionError 由 handle_client 關閉連線。
+        """
+        writers = {}
+        received = 0
+        error = None
+        try:
+            while True:
+                header = receive_message(client_sock)
+                if header is None:
+                    return 'Upload stream interrupted.'
+                if header.get('end'):
+                    break
+                length = header.get('length')
+                if not isinstance(length, int) or length < 0:
+                    raise ConnectionError('Upload stream out of sync (invalid frame length).')
+                chunk = receive_exact(client_sock, length)
+                if chunk is None:
+                    return 'Upload stream interrupted.'
+                received += len(chunk)
+                if error:
+                    continue # 已經失敗：只讀掉內容，不再寫入
+
+                try:
+                    digest = header.get('hash')
+                    if not is_blob_hash(digest):
+                        raise ValueError('invalid blob hash.')
+                    if digest not in writers:
+                        writers[digest] = blob_store.writer(digest)
+                    writers[digest].write(chunk)
+                    if header.get('final'):
+                        writers.pop(digest).commit()
+                except (ValueError, OSError, zlib.error) as e:
+                    error = f'Upload stream error: {e}'
+        finally:
+            for writer in writers.values():
+                writer.abort()
+        if error:
+            return error
+        print(f"Received upload stream ({received} bytes compressed)")
+        return None
+
+    def _store_build(self, data, game_name, version):
+        """把上傳的檔案存入 blob store 並儲存版本清單，回傳 manifest。
+
+        串流: {'manifest': [...], 'stream': True} (檔案內容已由 _receive_blob_stream 存入)
+        內嵌: {'manifest': [{'path', 'hash', 'mode', 'size'}], 'blobs': {hash: base64}} (只含 Server 缺少的檔案)
+        舊格式: {'zip_data': base64} (整包 zip)
+        """
+        if data.get('manifest') is not None:
+            # hash 會成為 blob store 中的檔名，必須是 SHA-256 hex
+            digests = list(data.get('blobs', {})) + [f.get('hash') for f in data['manifest']]
+            if not all(is_blob_hash(d) for d in digests):
+                raise ValueError('Invalid blob hash in manifest.')
+            for digest, blob_b64 in data.get('blobs', {}).items():
+                blob_store.put(base64.b64decode(blob_b64), digest)
+            files = data['manifest']
+        else:
+            files = blob_store.import_zip(base64.b64decode(data['zip_data']))
+
+        # 預先編譯 .py (語法錯誤直接拒絕上架)，.pyc 一起加入版本清單
+        files = [f for f in files if '__pycache__' not in f['path'].split('/')]
+        pyc_files, errors = compile_build(files)
+        if errors:
+            raise ValueError("Syntax check failed: " + "; ".join(errors))
+        print(f"Precompiled {len(pyc_files)} module(s) for {game_name} v{version}")
+        return blob_store.save_manifest(game_name, version, files + pyc_files)
+
     # --- D1: 上架新遊戲 (Create) ---
     def _handle_upload_game(self, data, current_user):
         """處理上架新遊戲請求"""
         try:
             game_config = data.get('game_config')
-            zip_b64 = data.get('zip_data')
             
             # 基本資料檢查
-            if not game_config or not zip_b64:
+            if not game_config or (data.get('manifest') is None and not data.get('zip_data')):
                 return {'type': 'UPLOAD_RESPONSE', 'success': False, 'message': 'Incomplete data.'}
 
             game_name = game_config.get('game_name')
             version = game_config.get('version')
             
-            # 1. 設定儲存路徑
-            save_dir = os.path.join(UPLOADED_GAMES_DIR, game_name)
-            
-            # 2. 檢查是否已存在 (實體資料夾檢查)
-            # 如果資料夾存在且不為空，通常代表遊戲已上架，應引導使用 Update
-            if os.path.exists(save_dir) and os.listdir(save_dir):
+            # 1. 檢查是否已存在，已上架的遊戲應引導使用 Update
+            if game_name in db_manager.game_data:
                  return {'type': 'UPLOAD_RESPONSE', 'success': False, 'message': f"Game '{game_name}' already exists. Please use 'Update Game'."}
 
-            # 3. 建立資料夾
-            os.makedirs(save_dir, exist_ok=True)
-            
-            # 4. 解碼 Base64 並寫入 ZIP 檔
-            file_path = os.path.join(save_dir, f"{version}.zip")
-            with open(file_path, 'wb') as f:
-                f.write(base64.b64decode(zip_b64))
+            # 2. 存入檔案庫 (相同內容的檔案只存一份)
+            try:
+                manifest = self._store_build(data, game_name, version)
+            except ValueError as e:
+                return {'type': 'UPLOAD_RESPONSE', 'success': False, 'message': str(e)}
 
-            # 5. 更新資料庫 (呼叫 db_manager.create_game)
-            success, msg = db_manager.create_game(game_name, version, current_user, game_config)
+            # 3. 更新資料庫 (呼叫 db_manager.create_game)
+            success, msg = db_manager.create_game(game_name, version, current_user, game_config,
+                                                  build_hash=manifest['build_hash'])
             
             if success:
-                 print(f"New game uploaded: {game_name} v{version} by {current_user}")
+                 print(f"New game uploaded: {game_name} v{version} by {current_user} ({len(manifest['files'])} files)")
                  return {'type': 'UPLOAD_RESPONSE', 'success': True, 'message': 'Game created successfully.'}
             else:
-                 # 若 DB 寫入失敗，進行檔案回滾 (刪除剛建立的資料夾)
-                 try:
-                     shutil.rmtree(save_dir)
-                 except Exception:
-                     pass
+                 # 若 DB 寫入失敗，移除剛建立的版本清單 (檔案由 GC 回收)
+                 blob_store.delete_game(game_name)
                  return {'type': 'UPLOAD_RESPONSE', 'success': False, 'message': f'DB Error: {msg}'}
 
         except Exception as e:
             print(f"Upload error: {e}")
             return {'type': 'UPLOAD_RESPONSE', 'success': False, 'message': f'Server error: {e}'}
 
-    # --- D2: 更新遊戲 (Update & Overwrite) ---
+    # --- D2: 更新遊戲 ---
     def _handle_update_game(self, data, current_user):
-        """處理更新遊戲請求 (刪除舊檔模式)"""
+        """處理更新遊戲請求 (新增版本清單，未變更的檔案沿用既有 blob)"""
         try:
             game_config = data.get('game_config')
-            zip_b64 = data.get('zip_data')
             
-            if not game_config or not zip_b64:
+            if not game_config or (data.get('manifest') is None and not data.get('zip_data')):
                 return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': 'Incomplete data.'}
 
             game_name = game_config.get('game_name')
             version = game_config.get('version')
             
-            save_dir = os.path.join(UPLOADED_GAMES_DIR, game_name)
-            
-            # 1. 檢查遊戲資料夾是否存在 (確保是更新而非新上架)
-            if not os.path.exists(save_dir):
+            # 1. 檢查遊戲是否存在 (確保是更新而非新上架) 與權限
+            game_info = db_manager.game_data.get(game_name)
+            if not game_info:
                 return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': 'Game not found on server. Please use Upload first.'}
+            if game_info['author'] != current_user:
+                return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': 'Permission denied.'}
 
-            # 2. === 關鍵邏輯：清空舊檔案 ===
-            # 遍歷資料夾內容並刪除，保留資料夾本身
-            for filename in os.listdir(save_dir):
-                file_path = os.path.join(save_dir, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path) # 刪除檔案
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path) # 刪除子資料夾
-                except Exception as e:
-                    print(f"Failed to delete {file_path}. Reason: {e}")
-
-            # 3. 儲存新版本檔案
-            new_file_path = os.path.join(save_dir, f"{version}.zip")
-            with open(new_file_path, 'wb') as f:
-                f.write(base64.b64decode(zip_b64))
+            # 2. 存入檔案庫 (舊版本保留，正在進行的遊戲不受影響)
+            try:
+                manifest = self._store_build(data, game_name, version)
+            except ValueError as e:
+                return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': str(e)}
 
-            # 4. 更新資料庫 (呼叫 db_manager.update_game)
-            success, msg = db_manager.update_game(game_name, version, current_user, game_config)
+            # 3. 更新資料庫 (呼叫 db_manager.update_game)
+            success, msg = db_manager.update_game(game_name, version, current_user, game_config,
+                                                  build_hash=manifest['build_hash'])
             
             if success:
-                 print(f"Game updated: {game_name} -> v{version}")
+                 # 4. 只保留最近幾個版本，並回收不再被參照的檔案
+                 self._prune_versions(game_name)
+                 print(f"Game updated: {game_name} -> v{version} ({len(manifest['files'])} files)")
                  return {'type': 'UPDATE_RESPONSE', 'success': True, 'message': f'Updated to v{version}.'}
             else:
                  return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': f'DB Error: {msg}'}
@@ -279,6 +354,17 @@ class DeveloperServer:
         except Exception as e:
             print(f"Update error: {e}")
             return {'type': 'UPDATE_RESPONSE', 'success': False, 'message': f'Server error: {e}'}
+
+    def _prune_versions(self, game_name):
+        """刪除超過 KEEP_GAME_VERSIONS 的舊版本 (目前版本一定保留)"""
+        current = db_manager.game_data[game_name]['version']
+        old_versions = [m for m in blob_store.versions(game_name) if m['version'] != current]
+        for manifest in old_versions[:max(0, len(old_versions) - (KEEP_GAME_VERSIONS - 1))]:
+            blob_store.delete_version(game_name, manifest['version'])
+            # 展開後的目錄以 hardlink 指向 blob，不刪除的話 GC 回收 blob 也釋放不了空間
+            shutil.rmtree(blob_store.checkout_dir(manifest, UPLOADED_GAMES_DIR), ignore_errors=True)
+            print(f"Pruned {game_name} v{manifest['version']}")
+        blob_store.gc()
         
     def _handle_delete_game(self, data, current_user):
         """處理下架遊戲請求"""
@@ -294,7 +380,9 @@ class DeveloperServer:
             if not success:
                 return {'type': 'DELETE_RESPONSE', 'success': False, 'message': msg}
 
-            # 2. 刪除實體檔案資料夾
+            # 2. 刪除版本清單與展開後的資料夾，不再被參照的檔案由 GC 回收
+            blob_store.delete_game(game_name)
+            blob_store.gc()
             save_dir = os.path.join(UPLOADED_GAMES_DIR, game_name)
             if os.path.exists(save_dir):
                 try:
@@ -0,0 +1,128 @@
+# Server/download_service.py
+import os
+import socket
+import hashlib
+import secrets
+import threading
+import time
+
+from config import DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TOKEN_TTL_SEC
+from utils import send_message, receive_message
+from blob_store import blob_store
+
+
+class DownloadService:
+    """遊戲檔案的分段下載服務 (獨立 Port，與 Lobby 的控制連線分開)。
+
+    1. Lobby 在 download_game 時呼叫 prepare()，取得憑證與分段清單 (每段附 SHA-256) 交給 Client
+    2. Client 開多條連線，每條連線依序送出 {'token', 'hash', 'offset', 'length'}
+    3. Service 回傳 {'success': True, 'length': n} 標頭，後面緊接 n bytes 原始資料
+
+    憑證只能下載發放時指定的檔案，逾時失效。
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.server_socket = None
+        self.is_running = False
+        self.tokens = {} # {token: (允許下載的 hash, 到期時間)}
+        self.chunk_hashes = {} # {blob hash: [各分段的 hash]} 同一檔案不必重複計算
+        self.lock = threading.Lock()
+
+    def start(self):
+        try:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(32)
+            self.is_running = True
+        except Exception as e:
+            print(f"Failed to start download service: {e}")
+            return
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"Download service listening on {self.host}:{self.port}")
+
+    def stop(self):
+        self.is_running = False
+        if self.server_socket:
+            self.server_socket.close()
+
+    def prepare(self, hashes):
+        """發放下載憑證，回傳 (token, chunks)；chunks 為 [{'hash', 'offset', 'length', 'sha256'}]"""
+        chunks = []
+        for digest in hashes:
+            size = os.path.getsize(blob_store.blob_path(digest))
+            for index, chunk_hash in enumerate(self._get_chunk_hashes(digest)):
+                offset = index * DOWNLOAD_CHUNK_SIZE
+                chunks.append({'hash': digest, 'offset': offset,
+                               'length': min(DOWNLOAD_CHUNK_SIZE, size - offset), 'sha256': chunk_hash})
+
+        token = secrets.token_hex(16)
+        now = time.time()
+        with self.lock:
+            # 順便清掉過期的憑證
+            for old_token, (_, expires) in list(self.tokens.items()):
+                if expires < now:
+                    del self.tokens[old_token]
+            self.tokens[token] = (set(hashes), now + DOWNLOAD_TOKEN_TTL_SEC)
+        return token, chunks
+
+    def _get_chunk_hashes(self, digest):
+        with self.lock:
+            cached = self.chunk_hashes.get(digest)
+        if cached is None:
+            data = blob_store.read(digest)
+            cached = [hashlib.sha256(data[i:i + DOWNLOAD_CHUNK_SIZE]).hexdigest()
+                      for i in range(0, max(len(data), 1), DOWNLOAD_CHUNK_SIZE)]
+            with self.lock:
+                self.chunk_hashes[digest] = cached
+        return cached
+
+    # --- 連線處理 ---
+
+    def _accept_loop(self):
+        while self.is_running:
+            try:
+                conn, addr = self.server_socket.accept()
+            except Exception as e:
+                if self.is_running:
+                    print(f"Download service accept error: {e}")
+                break
+            handler = threading.Thread(target=self._handle_connection, args=(conn,))
+            handler.daemon = True
+            handler.start()
+
+    def _handle_connection(self, conn):
+        """一條連線可以連續請求多個分段，Client 傳完後關閉連線"""
+        try:
+            while True:
+                request = receive_message(conn)
+                if request is None:
+                    break
+                data, error = self._read_range(request)
+                if error:
+                    send_message(conn, {'success': False, 'message': error})
+                    break
+                send_message(conn, {'success': True, 'length': len(data)})
+                conn.sendall(data)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _read_range(self, request):
+        with self.lock:
+            allowed, expires = self.tokens.get(request.get('token'), (set(), 0))
+        digest = request.get('hash')
+        if expires < time.time() or digest not in allowed:
+            return None, 'Invalid or expired download token.'
+
+        try:
+            offset = max(0, int(request.get('offset', 0)))
+            length = min(max(0, int(request.get('length', DOWNLOAD_CHUNK_SIZE))), DOWNLOAD_CHUNK_SIZE)
+        except (TypeError, ValueError):
+            return None, 'Invalid range request.'
+        with open(blob_store.blob_path(digest), 'rb') as f:
+            f.seek(offset)
+            return f.read(length), None
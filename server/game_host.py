@@ -0,0 +1,259 @@
+# Server/game_host.py
+import os
+import time
+import base64
+import socket
+import subprocess
+import threading
+
+from config import (BASE_DIR, GAME_PORT_RANGE, GAME_SERVER_INHERIT_SOCKET, GAME_AGENT_SECRET,
+                    GAME_START_TIMEOUT_SEC)
+from utils import send_message, receive_message
+from port_pool import PortPool
+from game_output import GameOutputMonitor
+from game_supervisor import GameSupervisor
+from game_scheduler import apply_rlimits, rlimit_preexec_fn
+
+
+class LocalGameHost:
+    """在本機啟動並監控遊戲伺服器子程序 (Lobby 與 Game Host Agent 共用)。
+
+    build 為 dict：{'game_name', 'version', 'server_cmd', 'ready_signal', 'telemetry', 'game_dir', 'manifest'}
+    on_ready(room_id, port, latency_ms) 於遊戲伺服器可以接受連線時呼叫
+    (ready_signal 為 'stdout' 時等待 GAME_READY 或 telemetry 的 ready 事件，逾時未就緒的程序會被終止)。
+    on_event(room_id, event) 於收到其他 telemetry 事件 (player_joined / tick ...) 時呼叫。
+    on_exit(room_id, result, returncode, tail) 於程序結束時 (Supervisor 執行緒中) 呼叫。
+    """
+
+    def __init__(self, name, public_ip, capacity, port_range=GAME_PORT_RANGE):
+        self.name = name
+        self.public_ip = public_ip
+        self.capacity = capacity
+        self.port_pool = PortPool(*port_range)
+        self.supervisor = GameSupervisor() # 單一執行緒監控所有遊戲子程序
+        self.processes = {} # {room_id: subprocess.Popen}
+        self.monitors = {} # {room_id: GameOutputMonitor} (保留最後一場的輸出尾段供除錯)
+        self.starting = {} # {room_id: 啟動時間} 尚未就緒的遊戲
+
+    def start(self):
+        self.supervisor.start()
+
+    def stop(self):
+        self.supervisor.stop()
+
+    def load(self):
+        return len(self.processes)
+
+    def launch(self, room_id, build, players, on_exit, on_ready, on_event=None):
+        """啟動遊戲伺服器，回傳 (success, message, port)。
+
+        成功只代表程序已啟動，可以連線時另外呼叫 on_ready。
+        """
+        # 1. 從 Port 池租借 Port (可選擇先 bind 好 socket 交給子程序)
+        inherit_socket = GAME_SERVER_INHERIT_SOCKET and os.name == 'posix'
+        game_port, listen_sock = self.port_pool.acquire(room_id, bind_socket=inherit_socket)
+        if game_port is None:
+            return False, 'No free game server port.', None
+
+        full_cmd = build['server_cmd'] + [
+            '--port', str(game_port),
+            '--player_count', str(len(players)),
+            '--players'
+        ] + players
+
+        pass_fds = ()
+        if listen_sock:
+            full_cmd += ['--listen_fd', str(listen_sock.fileno())]
+            pass_fds = (listen_sock.fileno(),)
+
+        # telemetry 通道：子程序繼承 pipe 的寫入端 (僅 POSIX 支援 pass_fds)
+        telemetry_r, telemetry_w = None, None
+        if build.get('telemetry') and os.name == 'posix':
+            telemetry_r, telemetry_w = os.pipe()
+            full_cmd += ['--telemetry_fd', str(telemetry_w)]
+            pass_fds += (telemetry_w,)
+
+        print(f"[{self.name}] Starting Game Server: {full_cmd} at {build['game_dir']}")
+
+        try:
+            # 2. 啟動子程序
+            # cwd=game_dir 確保程式在正確目錄執行
+            # stderr 併入 stdout，只需讀一條 pipe；PYTHONUNBUFFERED 讓輸出即時送達
+            # 專案根目錄加入 PYTHONPATH，讓遊戲可以 import game_sdk
+            python_path = os.pathsep.join(p for p in (BASE_DIR, os.environ.get('PYTHONPATH')) if p)
+            env = dict(os.environ, PYTHONUNBUFFERED='1', PYTHONPATH=python_path)
+            process = subprocess.Popen(
+                full_cmd,
+                cwd=build['game_dir'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                pass_fds=pass_fds,
+                preexec_fn=rlimit_preexec_fn()
+            )
+            # 3. 套用資源限制 (CPU 秒數 / 記憶體 / 檔案數)
+            apply_rlimits(process.pid)
+        except Exception as e:
+            print(f"[{self.name}] Start game error: {e}")
+            self.port_pool.release(room_id)
+            if telemetry_r is not None:
+                os.close(telemetry_r)
+            return False, f'Failed to start process: {e}', None
+        finally:
+            # 子程序已持有 socket / pipe 寫入端的副本，這裡的副本可以關閉
+            if listen_sock:
+                listen_sock.close()
+            if telemetry_w is not None:
+                os.close(telemetry_w)
+
+        self.processes[room_id] = process
+        started_at = time.monotonic()
+
+        # 4. 交給 Supervisor 監控 (負責讀取輸出、收屍)
+        # 繼承的 socket 在啟動前就已 listen，不需要等待就緒訊號
+        wait_ready = build.get('ready_signal') == 'stdout' and not listen_sock
+        monitor = GameOutputMonitor(
+            room_id,
+            on_ready=lambda: self._on_ready(room_id, game_port, on_ready),
+            on_event=(lambda event: on_event(room_id, event)) if on_event else None
+        )
+        self.monitors[room_id] = monitor
+        if wait_ready:
+            self.starting[room_id] = started_at
+        self.supervisor.watch(
+            room_id, process, monitor,
+            on_exit=lambda r_id, proc, mon: self._on_process_exit(r_id, proc, mon, on_exit),
+            deadline=started_at + GAME_START_TIMEOUT_SEC if wait_ready else None,
+            on_deadline=self._on_start_timeout,
+            telemetry=os.fdopen(telemetry_r, 'rb', buffering=0) if telemetry_r is not None else None
+        )
+        if not wait_ready:
+            on_ready(room_id, game_port, 0.0)
+        return True, 'Game server started.', game_port
+
+    def get_log_tail(self, room_id):
+        monitor = self.monitors.get(room_id)
+        return monitor.get_tail() if monitor else []
+
+    def _on_ready(self, room_id, port, on_ready):
+        """(Supervisor 執行緒) 讀到 GAME_READY"""
+        started_at = self.starting.pop(room_id, None)
+        if started_at is None:
+            return
+        latency_ms = (time.monotonic() - started_at) * 1000
+        on_ready(room_id, port, latency_ms)
+
+    def _on_start_timeout(self, room_id, process):
+        """(Supervisor 執行緒) 啟動逾時仍未就緒：終止程序，後續由 on_exit 清理"""
+        if self.starting.pop(room_id, None) is None:
+            return
+        print(f"[{self.name}] Game server for Room {room_id} not ready after {GAME_START_TIMEOUT_SEC}s, killing.")
+        self.monitors[room_id].feed_line(f"Game server not ready within {GAME_START_TIMEOUT_SEC}s.")
+        process.kill()
+
+    def _on_process_exit(self, room_id, process, monitor, on_exit):
+        # 先歸還 Port (必須在通知上層前，避免房間重新開始時拿到舊租約)
+        self.port_pool.release(room_id)
+        self.processes.pop(room_id, None)
+        self.starting.pop(room_id, None)
+        on_exit(room_id, monitor.result, process.returncode, monitor.get_tail())
+
+
+class RemoteGameHost:
+    """Lobby 端對一個已註冊 Game Host Agent 的代理。
+
+    spawn 請求透過短連線送到 Agent 的控制 Port；就緒 / 結束事件則由 Agent
+    經由 Lobby 連線回報 (agent_game_event)，再由 handle_event 轉呼叫 on_ready / on_exit。
+    """
+
+    def __init__(self, name, public_ip, control_port, capacity, client_sock):
+        self.name = name
+        self.public_ip = public_ip
+        self.control_port = control_port
+        self.capacity = capacity
+        self.client_sock = client_sock # Agent 註冊用的 Lobby 連線 (用於驗證身分)
+        self.reported_load = 0
+        self.lock = threading.Lock()
+        self.callbacks = {} # {room_id: on_exit}
+        self.ready_callbacks = {} # {room_id: on_ready}
+        self.event_callbacks = {} # {room_id: on_event}
+
+    def load(self):
+        # Agent 回報的負載可能落後，取 Lobby 自己記錄的較大值
+        return max(self.reported_load, len(self.callbacks))
+
+    def launch(self, room_id, build, players, on_exit, on_ready, on_event=None):
+        """請 Agent 啟動遊戲伺服器，回傳 (success, message, port)"""
+        request = {
+            'action': 'spawn_game',
+            'data': {
+                'room_id': room_id,
+                'game_name': build['game_name'],
+                'version': build['version'],
+                'build_hash': build['manifest']['build_hash'],
+                'server_cmd': build['server_cmd'],
+                'ready_signal': build.get('ready_signal'),
+                'telemetry': build.get('telemetry'),
+                'players': players,
+                'secret': GAME_AGENT_SECRET,
+            }
+        }
+        # ready 事件可能比 spawn 回應先到，callback 必須先登記
+        with self.lock:
+            self.callbacks[room_id] = on_exit
+            self.ready_callbacks[room_id] = on_ready
+            if on_event:
+                self.event_callbacks[room_id] = on_event
+        try:
+            response = self._call(request)
+            # Agent 沒有這個版本的檔案：依版本清單組出 zip 附上後重送一次
+            if response and response.get('need_files'):
+                from blob_store import blob_store # 只有 Lobby 端會用到 (Agent 不需要檔案庫)
+                zip_data = blob_store.build_zip(build['manifest'])
+                request['data']['zip_data'] = base64.b64encode(zip_data).decode('utf-8')
+                response = self._call(request)
+        except Exception as e:
+            response = {'success': False, 'message': f'Agent {self.name} unreachable: {e}'}
+
+        if not response or not response.get('success'):
+            with self.lock:
+                self.callbacks.pop(room_id, None)
+                self.ready_callbacks.pop(room_id, None)
+                self.event_callbacks.pop(room_id, None)
+            message = response.get('message') if response else f'Agent {self.name} closed connection.'
+            return False, message, None
+        return True, f"Game server started on {self.name}.", response.get('port')
+
+    def handle_event(self, room_id, event):
+        """處理 Agent 回報的遊戲事件"""
+        if event.get('event') == 'ready':
+            with self.lock:
+                on_ready = self.ready_callbacks.pop(room_id, None)
+            if on_ready:
+                on_ready(room_id, event.get('port'), event.get('latency_ms', 0.0))
+        elif event.get('event') == 'telemetry':
+            on_event = self.event_callbacks.get(room_id)
+            if on_event:
+                on_event(room_id, event.get('data', {}))
+        elif event.get('event') == 'exit':
+            with self.lock:
+                on_exit = self.callbacks.pop(room_id, None)
+                self.ready_callbacks.pop(room_id, None)
+                self.event_callbacks.pop(room_id, None)
+            if on_exit:
+                on_exit(room_id, event.get('result'), event.get('returncode'), event.get('tail', []))
+
+    def fail_all(self):
+        """Agent 斷線：所有放在它上面的遊戲視為異常結束"""
+        with self.lock:
+            callbacks = list(self.callbacks.items())
+            self.callbacks.clear()
+            self.ready_callbacks.clear()
+            self.event_callbacks.clear()
+        for room_id, on_exit in callbacks:
+            on_exit(room_id, None, None, [f'Game host agent {self.name} disconnected.'])
+
+    def _call(self, request):
+        with socket.create_connection((self.public_ip, self.control_port), timeout=30) as sock:
+            send_message(sock, request)
+            return receive_message(sock)
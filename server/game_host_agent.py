@@ -0,0 +1,283 @@
+# Server/game_host_agent.py
+import socket
+import threading
+import argparse
+import sys
+import os
+import io
+import time
+import base64
+import shutil
+import zipfile
+
+# 路徑設定 (與 lobby_server.py 相同)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.append(parent_dir)
+
+from config import (SERVER_HOST, LOBBY_PORT, SERVER_DATA_DIR, GAME_AGENT_SECRET, GAME_AGENT_DEFAULT_SECRET,
+                    GAME_AGENT_HEARTBEAT_SEC, GAME_AGENT_CAPACITY)
+from utils import send_message, receive_message, safe_relpath
+from game_host import LocalGameHost
+
+
+class GameHostAgent:
+    """輕量的遊戲主機代理程序。
+
+    1. 開啟控制 Port，接收 Lobby 的 spawn_game 請求並在本機啟動遊戲伺服器
+    2. 連線到 Lobby 註冊 (register_agent)，定期回報負載 (agent_heartbeat)
+    3. 遊戲就緒 / 結束時回報給 Lobby (agent_game_event)，結果由 Lobby 寫入 DB
+    """
+
+    def __init__(self, name, lobby_host, lobby_port, public_ip, control_port,
+                 capacity, port_range, data_dir):
+        self.name = name
+        self.lobby_addr = (lobby_host, lobby_port)
+        self.public_ip = public_ip
+        self.control_port = control_port
+        self.data_dir = data_dir
+        self.host = LocalGameHost(name, public_ip, capacity, port_range)
+        self.control_socket = None
+        self.lobby_sock = None # 註冊後只由 sender 執行緒使用 (request/response 一次一個)
+        self.outbox = [] # 等待送給 Lobby 的遊戲事件 [(room_id, event)]
+        self.outbox_cond = threading.Condition()
+        self.is_running = False
+
+    def start(self):
+        # 控制 Port 可以讓 Lobby 在本機執行程式，密鑰仍是預設值時不啟動
+        if GAME_AGENT_SECRET == GAME_AGENT_DEFAULT_SECRET:
+            print("GAME_AGENT_SECRET is not set. Set the GAME_AGENT_SECRET environment variable "
+                  "(same value on the Lobby) before starting an agent.")
+            return
+
+        # 1. 控制 Port (Port 0 表示由系統分配，方便在同一台機器開多個 Agent)
+        self.control_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.control_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.control_socket.bind(('0.0.0.0', self.control_port))
+        self.control_socket.listen(16)
+        self.control_port = self.control_socket.getsockname()[1]
+        self.is_running = True
+        self.host.start()
+        print(f"Game Host Agent '{self.name}' control port {self.control_port}")
+
+        # 2. 向 Lobby 註冊，之後由 sender 執行緒負責回報事件與心跳
+        if not self._register():
+            self.stop()
+            return
+        threading.Thread(target=self._sender_loop, daemon=True).start()
+
+        # 3. 主線程負責接受 Lobby 的控制連線
+        while self.is_running:
+            try:
+                conn, addr = self.control_socket.accept()
+                handler = threading.Thread(target=self.handle_control, args=(conn, addr))
+                handler.daemon = True
+                handler.start()
+            except Exception as e:
+                if self.is_running:
+                    print(f"Agent accept error: {e}")
+                break
+
+    def stop(self):
+        self.is_running = False
+        with self.outbox_cond:
+            self.outbox_cond.notify_all()
+        self.host.stop()
+        for sock in (self.control_socket, self.lobby_sock):
+            if sock:
+                try:
+                    sock.close()
+                except Exception:
+                    pass
+        print(f"Game Host Agent '{self.name}' stopped.")
+
+    # --- 與 Lobby 的連線 ---
+
+    def _call_lobby(self, action, data):
+        """(註冊時 / sender 執行緒) 送出請求並等待回應"""
+        if not self.lobby_sock:
+            return None
+        data = dict(data, name=self.name)
+        if not send_message(self.lobby_sock, {'action': action, 'user_type': 'agent', 'data': data}):
+            return None
+        return receive_message(self.lobby_sock)
+
+    def _register(self):
+        try:
+            self.lobby_sock = socket.create_connection(self.lobby_addr)
+        except Exception as e:
+            print(f"Cannot connect to Lobby at {self.lobby_addr}: {e}")
+            self.lobby_sock = None
+            return False
+
+        response = self._call_lobby('register_agent', {
+            'secret': GAME_AGENT_SECRET,
+            'host': self.public_ip,
+            'control_port': self.control_port,
+            'capacity': self.host.capacity,
+        })
+        if not response or not response.get('success'):
+            print(f"Agent registration failed: {response.get('message') if response else 'no response'}")
+            self.lobby_sock.close()
+            self.lobby_sock = None
+            return False
+        print(f"Registered with Lobby at {self.lobby_addr[0]}:{self.lobby_addr[1]}")
+        return True
+
+    def _post_event(self, room_id, event):
+        """(任何執行緒) 遊戲事件放進佇列後立即返回，由 sender 執行緒依序送出。
+
+        Lobby 處理事件時可能反過來呼叫本 Agent (例如 exit 讓排隊中的遊戲啟動)，
+        callback 的執行緒不能等待 Lobby 的回應。
+        """
+        with self.outbox_cond:
+            self.outbox.append((room_id, event))
+            self.outbox_cond.notify()
+
+    def _sender_loop(self):
+        """唯一使用 Lobby 連線的執行緒：依序送出遊戲事件，閒置時定期送心跳"""
+        next_heartbeat = time.monotonic() + GAME_AGENT_HEARTBEAT_SEC
+        while self.is_running:
+            # 1. 等待事件或下一次心跳時間
+            with self.outbox_cond:
+                while self.is_running and not self.outbox and time.monotonic() < next_heartbeat:
+                    self.outbox_cond.wait(next_heartbeat - time.monotonic())
+                if not self.is_running:
+                    return
+                # 事件持續湧入時也要按時送心跳
+                due = time.monotonic() >= next_heartbeat
+                item = self.outbox.pop(0) if self.outbox and not due else None
+
+            # 2. 送出事件 / 心跳
+            if item:
+                room_id, event = item
+                # 附上目前負載：exit 事件讓排隊中的遊戲啟動時，Lobby 不會用到過期的心跳數字
+                response = self._call_lobby('agent_game_event', {'room_id': room_id, 'event': event,
+                                                                 'load': self.host.load()})
+            else:
+                next_heartbeat = time.monotonic() + GAME_AGENT_HEARTBEAT_SEC
+                response = self._call_lobby('agent_heartbeat', {'load': self.host.load()})
+
+            if response is None and self.is_running:
+                # 3. Lobby 斷線：重新註冊 (Lobby 會把舊連線上的遊戲視為結束，佇列中的事件不必再送)
+                print("Lost connection to Lobby, re-registering...")
+                if self.lobby_sock:
+                    self.lobby_sock.close()
+                with self.outbox_cond:
+                    self.outbox.clear()
+                if not self._register():
+                    time.sleep(GAME_AGENT_HEARTBEAT_SEC)
+
+    # --- 控制 Port (Lobby -> Agent) ---
+
+    def handle_control(self, conn, addr):
+        try:
+            request = receive_message(conn)
+            if request is None:
+                return
+            data = request.get('data', {})
+            if data.get('secret') != GAME_AGENT_SECRET:
+                response = {'type': 'SPAWN_RESPONSE', 'success': False, 'message': 'Invalid agent secret.'}
+            elif request.get('action') == 'spawn_game':
+                response = self._handle_spawn(data)
+            else:
+                response = {'type': 'ERROR', 'success': False, 'message': f"Unknown action: {request.get('action')}"}
+            send_message(conn, response)
+        except Exception as e:
+            print(f"Control handler error for {addr}: {e}")
+        finally:
+            conn.close()
+
+    def _handle_spawn(self, data):
+        game_name = data.get('game_name')
+        version = data.get('version')
+        # 目錄名稱包含 build_hash：同版本號重新上傳的內容也不會誤用舊檔案
+        # 名稱來自請求，必須是單一層目錄名稱，避免解壓到 data_dir 以外
+        try:
+            build_dir = f"{version}_{str(data.get('build_hash') or '')[:12]}"
+            if not isinstance(game_name, str) or os.sep in safe_relpath(game_name) or os.sep in safe_relpath(build_dir):
+                raise ValueError(f"Unsafe game path: {game_name}/{build_dir}")
+        except ValueError as e:
+            return {'type': 'SPAWN_RESPONSE', 'success': False, 'message': str(e)}
+        extract_dir = os.path.join(self.data_dir, game_name, build_dir)
+
+        # 1. 檢查本機是否已有該版本，沒有就請 Lobby 附上檔案
+        if not os.path.exists(extract_dir):
+            if not data.get('zip_data'):
+                return {'type': 'SPAWN_RESPONSE', 'success': False, 'need_files': True}
+            try:
+                self._extract(data['zip_data'], extract_dir)
+            except Exception as e:
+                return {'type': 'SPAWN_RESPONSE', 'success': False, 'message': f'Failed to extract server files: {e}'}
+
+        # 2. 啟動遊戲伺服器
+        build = {
+            'game_name': game_name,
+            'version': version,
+            'server_cmd': data.get('server_cmd'),
+            'ready_signal': data.get('ready_signal'),
+            'telemetry': data.get('telemetry'),
+            'game_dir': extract_dir,
+        }
+        success, message, port = self.host.launch(
+            data.get('room_id'), build, data.get('players', []),
+            on_exit=self._on_game_exit, on_ready=self._on_game_ready, on_event=self._on_game_event
+        )
+        return {'type': 'SPAWN_RESPONSE', 'success': success, 'message': message, 'port': port}
+
+    def _extract(self, zip_b64, extract_dir):
+        """先解壓到暫存目錄再改名，避免其他請求看到解壓到一半的目錄"""
+        tmp_dir = f"{extract_dir}.tmp{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            with zipfile.ZipFile(io.BytesIO(base64.b64decode(zip_b64))) as zf:
+                zf.extractall(tmp_dir)
+            os.rename(tmp_dir, extract_dir)
+        except FileExistsError:
+            # 其他請求已經解壓完成
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    def _on_game_ready(self, room_id, port, latency_ms):
+        self._post_event(room_id, {'event': 'ready', 'port': port, 'latency_ms': latency_ms})
+
+    def _on_game_event(self, room_id, event):
+        """轉送 telemetry 事件 (player_joined / tick ...)"""
+        self._post_event(room_id, {'event': 'telemetry', 'data': event})
+
+    def _on_game_exit(self, room_id, result, returncode, tail):
+        print(f"[{self.name}] Game for Room {room_id} finished (exit code {returncode}).")
+        self._post_event(room_id, {'event': 'exit', 'result': result, 'returncode': returncode, 'tail': tail})
+
+
+def parse_port_range(text):
+    start, end = text.split('-')
+    return int(start), int(end)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Game Host Agent")
+    parser.add_argument('--name', required=True, help='Agent 名稱 (在 Lobby 中唯一)')
+    parser.add_argument('--lobby_host', default=SERVER_HOST)
+    parser.add_argument('--lobby_port', type=int, default=LOBBY_PORT)
+    parser.add_argument('--host', default=SERVER_HOST, help='玩家連線遊戲伺服器用的 IP')
+    parser.add_argument('--control_port', type=int, default=0)
+    parser.add_argument('--capacity', type=int, default=GAME_AGENT_CAPACITY)
+    parser.add_argument('--port_range', type=parse_port_range, default=(21000, 21999),
+                        help='遊戲伺服器 Port 範圍，例如 21000-21999 (同機多個 Agent 需錯開)')
+    parser.add_argument('--data_dir', default=None)
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or os.path.join(SERVER_DATA_DIR, 'agents', args.name)
+    os.makedirs(data_dir, exist_ok=True)
+
+    print("=== Game Host Agent Launch ===")
+    agent = GameHostAgent(args.name, args.lobby_host, args.lobby_port, args.host,
+                          args.control_port, args.capacity, args.port_range, data_dir)
+    try:
+        agent.start()
+    except KeyboardInterrupt:
+        print("\nStopping Game Host Agent...")
+        agent.stop()
@@ -0,0 +1,168 @@
+# Server/game_output.py
+import os
+import json
+import codecs
+import struct
+import collections
+
+from config import (GAME_LOG_TAIL_LINES, GAME_LOG_TO_DISK, GAME_LOG_DIR,
+                    GAME_LOG_MAX_BYTES, GAME_LOG_BACKUP_COUNT)
+
+RESULT_PREFIX = "GAME_RESULT:"
+EVENT_PREFIX = "GAME_EVENT:"
+# 遊戲伺服器開始監聽後輸出這一行，Lobby 才會通知玩家連線
+READY_MARKER = "GAME_READY"
+
+# 單行最長長度，避免子程序輸出不換行時緩衝區無限成長
+MAX_LINE_LENGTH = 64 * 1024
+# telemetry 單一事件的長度上限，超過視為通道損壞
+MAX_TELEMETRY_FRAME = 1024 * 1024
+
+
+class GameOutputMonitor:
+    """逐步解析遊戲伺服器的輸出 (stdout + stderr)。
+
+    - feed() 可以餵入任意切割的 bytes，內部自行處理斷行與 UTF-8 多位元組字元
+    - 邊讀邊解析 GAME_READY / GAME_RESULT / GAME_EVENT，不需要等程序結束
+    - feed_telemetry() 解析 telemetry pipe 的事件 (4 bytes 長度 + JSON)，與 stdout 的標記等效
+    - 記憶體只保留最後 tail_lines 行，完整內容可選擇輪替寫入磁碟
+    """
+
+    def __init__(self, room_id, tail_lines=GAME_LOG_TAIL_LINES, log_to_disk=GAME_LOG_TO_DISK,
+                 on_result=None, on_event=None, on_ready=None):
+        self.room_id = room_id
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.result = None
+        self.ready = False
+        self.on_result = on_result # callback(result_dict)
+        self.on_event = on_event   # callback(event_dict)
+        self.on_ready = on_ready   # callback()
+
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial = ''
+        self._telemetry_buf = b''
+        self._telemetry_broken = False
+
+        self._log_file = None
+        self._log_path = None
+        if log_to_disk:
+            os.makedirs(GAME_LOG_DIR, exist_ok=True)
+            self._log_path = os.path.join(GAME_LOG_DIR, f"room_{room_id}.log")
+            self._log_file = open(self._log_path, 'a', encoding='utf-8')
+
+    def feed(self, data):
+        """餵入一段原始 bytes (可能不是完整的一行)"""
+        text = self._partial + self._decoder.decode(data)
+        lines = text.split('\n')
+        self._partial = lines.pop()
+
+        # 超長且沒有換行的內容直接視為一行，避免緩衝區無限成長
+        if len(self._partial) > MAX_LINE_LENGTH:
+            lines.append(self._partial)
+            self._partial = ''
+
+        for line in lines:
+            self.feed_line(line)
+
+    def feed_line(self, line):
+        """處理完整的一行輸出"""
+        line = line.rstrip('\r\n')
+        self.tail.append(line)
+        self._write_log(line)
+
+        if line.strip() == READY_MARKER:
+            self._set_ready()
+        elif line.startswith(RESULT_PREFIX):
+            data = self._parse_json(line, RESULT_PREFIX)
+            if data is not None:
+                self._set_result(data)
+        elif line.startswith(EVENT_PREFIX):
+            data = self._parse_json(line, EVENT_PREFIX)
+            if data is not None and self.on_event:
+                self.on_event(data)
+
+    def feed_telemetry(self, data):
+        """餵入 telemetry pipe 讀到的 bytes (可能包含半個或多個事件)"""
+        if self._telemetry_broken:
+            return
+        self._telemetry_buf += data
+        while len(self._telemetry_buf) >= 4:
+            length = struct.unpack('!I', self._telemetry_buf[:4])[0]
+            if length > MAX_TELEMETRY_FRAME:
+                print(f"[Room {self.room_id}] Telemetry frame too large ({length} bytes), ignoring channel.")
+                self._telemetry_broken = True
+                self._telemetry_buf = b''
+                return
+            if len(self._telemetry_buf) < 4 + length:
+                return
+            body = self._telemetry_buf[4:4 + length]
+            self._telemetry_buf = self._telemetry_buf[4 + length:]
+            try:
+                event = json.loads(body.decode('utf-8'))
+            except Exception as e:
+                print(f"[Room {self.room_id}] Invalid telemetry event: {e}")
+                continue
+            self._handle_telemetry(event)
+
+    def _handle_telemetry(self, event):
+        kind = event.get('event')
+        if kind != 'tick':
+            # tick 太頻繁，不放進輸出尾段
+            self.tail.append(f"[telemetry] {json.dumps(event)}")
+        if kind == 'ready':
+            self._set_ready()
+        elif kind == 'result':
+            self._set_result(event)
+        elif self.on_event:
+            self.on_event(event)
+
+    def _set_ready(self):
+        if not self.ready:
+            self.ready = True
+            if self.on_ready:
+                self.on_ready()
+
+    def _set_result(self, data):
+        self.result = data
+        if self.on_result:
+            self.on_result(data)
+
+    def close(self):
+        """程序結束時呼叫：處理最後一行並關閉 Log 檔"""
+        remaining = self._partial + self._decoder.decode(b'', final=True)
+        self._partial = ''
+        if remaining:
+            self.feed_line(remaining)
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+
+    def get_tail(self):
+        return list(self.tail)
+
+    def _parse_json(self, line, prefix):
+        try:
+            return json.loads(line.split(prefix, 1)[1].strip())
+        except Exception as e:
+            print(f"[Room {self.room_id}] Failed to parse '{prefix}' line: {e}")
+            return None
+
+    def _write_log(self, line):
+        if not self._log_file:
+            return
+        self._log_file.write(line + '\n')
+        if self._log_file.tell() >= GAME_LOG_MAX_BYTES:
+            self._rotate_log()
+
+    def _rotate_log(self):
+        """room_x.log -> room_x.log.1 -> ... -> room_x.log.N (最舊的刪除)"""
+        self._log_file.close()
+        for i in range(GAME_LOG_BACKUP_COUNT - 1, 0, -1):
+            src = f"{self._log_path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self._log_path}.{i + 1}")
+        if GAME_LOG_BACKUP_COUNT > 0:
+            os.replace(self._log_path, f"{self._log_path}.1")
+        else:
+            os.remove(self._log_path)
+        self._log_file = open(self._log_path, 'a', encoding='utf-8')
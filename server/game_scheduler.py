@@ -0,0 +1,146 @@
+# Server/game_scheduler.py
+import sys
+import threading
+import collections
+
+from config import MAX_GAME_SERVERS, MAX_GAME_SERVERS_PER_GAME, GAME_SERVER_RLIMITS
+
+try:
+    import resource # 僅 POSIX
+except ImportError:
+    resource = None
+
+
+class GameScheduler:
+    """遊戲伺服器准入控制。
+
+    同時執行的遊戲數量超過上限 (全體或單一遊戲) 時，啟動請求進入 FIFO 佇列，
+    等到有遊戲結束 (finish) 再依序啟動。被單一遊戲上限卡住的請求不會擋住後面其他遊戲。
+    finish / reschedule 常在主機事件的 callback 中被呼叫 (Supervisor 執行緒、Agent 的請求)，
+    因此排隊中的遊戲改在另一個執行緒啟動，不會卡住 callback 的執行緒。
+    """
+
+    def __init__(self, max_total=MAX_GAME_SERVERS, max_per_game=MAX_GAME_SERVERS_PER_GAME):
+        self.max_total = max_total
+        self.max_per_game = max_per_game
+        self.lock = threading.Lock()
+        self.running = {} # {room_id: game_name}
+        self.queue = collections.deque() # [(room_id, game_name, launch_fn)]
+
+    def submit(self, room_id, game_name, launch_fn):
+        """送出啟動請求。
+
+        launch_fn() 在取得名額時被呼叫，需回傳 (success, message)。
+        回傳 (started, result)：started=True 時 result 為 launch_fn 的回傳值，
+        否則 result 為排隊位置 (從 1 開始)。
+        """
+        with self.lock:
+            self.queue.append((room_id, game_name, launch_fn))
+            admitted = self._pop_admissible()
+
+        results = self._launch(admitted)
+        if room_id in results:
+            return True, results[room_id]
+        return False, self.position(room_id)
+
+    def finish(self, room_id):
+        """遊戲結束 (或啟動失敗)，釋放名額並啟動排隊中的遊戲"""
+        with self.lock:
+            self.running.pop(room_id, None)
+            admitted = self._pop_admissible()
+        self._launch_async(admitted)
+
+    def reschedule(self):
+        """容量變大時 (例如新的遊戲主機加入)，嘗試啟動排隊中的遊戲"""
+        with self.lock:
+            admitted = self._pop_admissible()
+        self._launch_async(admitted)
+
+    def cancel(self, room_id):
+        """取消排隊 (例如房間解散)"""
+        with self.lock:
+            for entry in list(self.queue):
+                if entry[0] == room_id:
+                    self.queue.remove(entry)
+
+    def position(self, room_id):
+        """回傳排隊位置 (從 1 開始)，不在佇列中回傳 None"""
+        with self.lock:
+            for idx, entry in enumerate(self.queue):
+                if entry[0] == room_id:
+                    return idx + 1
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {'running': len(self.running), 'queued': len(self.queue)}
+
+    def _pop_admissible(self):
+        """(需持有 lock) 依 FIFO 順序取出目前可以啟動的請求，並先佔住名額"""
+        admitted = []
+        for entry in list(self.queue):
+            if len(self.running) >= self.max_total:
+                break
+            room_id, game_name, _ = entry
+            same_game = sum(1 for g in self.running.values() if g == game_name)
+            if same_game >= self.max_per_game:
+                continue
+            self.queue.remove(entry)
+            self.running[room_id] = game_name
+            admitted.append(entry)
+        return admitted
+
+    def _launch_async(self, admitted):
+        """在背景執行緒啟動 (launch_fn 可能要等遠端 Agent 回應，甚至反過來等呼叫者)"""
+        if admitted:
+            threading.Thread(target=self._launch, args=(admitted,), daemon=True).start()
+
+    def _launch(self, admitted):
+        """在 lock 之外呼叫 launch_fn，失敗的請求立即釋放名額"""
+        results = {}
+        for room_id, game_name, launch_fn in admitted:
+            try:
+                success, message = launch_fn()
+            except Exception as e:
+                success, message = False, f'Failed to start process: {e}'
+            results[room_id] = (success, message)
+            if not success:
+                self.finish(room_id)
+        return results
+
+
+def _rlimit_values():
+    """將 GAME_SERVER_RLIMITS 轉為 [(resource.RLIMIT_x, value)]"""
+    limits = []
+    if GAME_SERVER_RLIMITS.get('cpu_seconds'):
+        limits.append((resource.RLIMIT_CPU, int(GAME_SERVER_RLIMITS['cpu_seconds'])))
+    if GAME_SERVER_RLIMITS.get('address_space_mb'):
+        limits.append((resource.RLIMIT_AS, int(GAME_SERVER_RLIMITS['address_space_mb']) * 1024 * 1024))
+    if GAME_SERVER_RLIMITS.get('open_files'):
+        limits.append((resource.RLIMIT_NOFILE, int(GAME_SERVER_RLIMITS['open_files'])))
+    return limits
+
+
+def rlimit_preexec_fn():
+    """非 Linux 的 POSIX 平台：回傳在子程序 exec 前設定 rlimit 的函式 (Linux 改用 apply_rlimits)"""
+    if resource is None or sys.platform.startswith('linux'):
+        return None
+    limits = _rlimit_values()
+    if not limits:
+        return None
+
+    def _set_limits():
+        for res, value in limits:
+            resource.setrlimit(res, (value, value))
+    return _set_limits
+
+
+def apply_rlimits(pid):
+    """Linux：程序啟動後立即用 prlimit 設定資源限制 (preexec_fn 在多執行緒下不安全)"""
+    if resource is None or not hasattr(resource, 'prlimit'):
+        return
+    for res, value in _rlimit_values():
+        try:
+            resource.prlimit(pid, res, (value, value))
+        except (OSError, ValueError) as e:
+            print(f"Failed to set rlimit {res} for pid {pid}: {e}")
@@ -0,0 +1,229 @@
+# Server/game_supervisor.py
+import os
+import time
+import selectors
+import socket
+import threading
+import queue
+
+# 沒有 pidfd 時，用這個間隔檢查已關閉 stdout 的程序是否結束
+POLL_INTERVAL = 0.5
+
+
+class GameSupervisor:
+    """用「單一執行緒」監控所有遊戲伺服器子程序。
+
+    - 以 selectors 同時監聽每個子程序的 stdout (與選用的 telemetry) pipe，讀到的資料交給 GameOutputMonitor
+    - Linux 上以 pidfd 取得結束通知；其他平台在 stdout EOF 後以 poll() 收屍
+    - 程序結束後在監控執行緒中呼叫 on_exit(room_id, process, monitor)
+    - 可設定 deadline (time.monotonic())，時間到時在監控執行緒中呼叫 on_deadline(room_id, process)
+
+    Windows 的 select 不支援 pipe，因此改為每個程序一條讀取執行緒 (行為與舊版相同)。
+    """
+
+    def __init__(self):
+        self.games = {}  # {room_id: {'process', 'monitor', 'on_exit', 'pipes', 'exited', 'pidfd', 'deadline'}}
+        self.pending = queue.Queue()  # 等待註冊進 selector 的程序 (只在監控執行緒內操作 selector)
+        self.is_running = False
+        self.use_selector = os.name == 'posix'
+        self.selector = None
+        self.thread = None
+        self._wakeup_r, self._wakeup_w = None, None
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        if self.use_selector:
+            self.selector = selectors.DefaultSelector()
+            # 用 socketpair 喚醒阻塞中的 select (新程序註冊 / 停止)
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self.selector.register(self._wakeup_r, selectors.EVENT_READ, ('wakeup', None))
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self._wakeup()
+
+    def watch(self, room_id, process, monitor, on_exit, deadline=None, on_deadline=None, telemetry=None):
+        """開始監控一個子程序 (stdout 必須是 subprocess.PIPE；telemetry 為 pipe 讀取端的檔案物件)"""
+        pipes = {'stdout': process.stdout}
+        if telemetry is not None:
+            pipes['telemetry'] = telemetry
+        game = {
+            'room_id': room_id,
+            'process': process,
+            'monitor': monitor,
+            'on_exit': on_exit,
+            'pipes': pipes, # 尚未 EOF 的 pipe
+            'exited': False,
+            'pidfd': None,
+            'deadline': deadline,
+            'on_deadline': on_deadline,
+        }
+        if not self.use_selector:
+            t = threading.Thread(target=self._run_reader_thread, args=(game,), daemon=True)
+            t.start()
+            if deadline is not None:
+                timer = threading.Timer(max(0, deadline - time.monotonic()), self._fire_deadline, args=(game,))
+                timer.daemon = True
+                timer.start()
+            return
+        self.pending.put(game)
+        self._wakeup()
+
+    def active_count(self):
+        return len(self.games)
+
+    # --- 監控執行緒 ---
+
+    def _wakeup(self):
+        if self._wakeup_w:
+            try:
+                self._wakeup_w.send(b'\0')
+            except OSError:
+                pass
+
+    def _run(self):
+        print("Game supervisor started.")
+        while self.is_running:
+            # 有已關閉所有 pipe 但還沒收屍的程序時，需要定期 poll
+            waiting_exit = any(g['pidfd'] is None and not g['pipes'] for g in self.games.values())
+            timeout = POLL_INTERVAL if waiting_exit else None
+            # 最近的 deadline 也會縮短等待時間
+            deadlines = [g['deadline'] for g in self.games.values() if g['deadline'] is not None]
+            if deadlines:
+                until = max(0, min(deadlines) - time.monotonic())
+                timeout = until if timeout is None else min(timeout, until)
+            events = self.selector.select(timeout)
+
+            for key, _ in events:
+                kind, game = key.data
+                if kind == 'wakeup':
+                    self._drain_wakeup()
+                elif kind in ('stdout', 'telemetry'):
+                    self._read_pipe(game, kind)
+                elif kind == 'pidfd':
+                    game['exited'] = True
+                    # 程序已結束：把 pipe 中剩下的資料讀完
+                    for name in list(game['pipes']):
+                        self._read_pipe(game, name, drain=True)
+
+            self._register_pending()
+
+            now = time.monotonic()
+            for game in list(self.games.values()):
+                if game['deadline'] is not None and now >= game['deadline']:
+                    self._fire_deadline(game)
+                if not game['exited'] and not game['pipes'] and game['pidfd'] is None:
+                    game['exited'] = game['process'].poll() is not None
+                if game['exited'] and not game['pipes']:
+                    self._finish(game)
+
+        self.selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+        print("Game supervisor stopped.")
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _register_pending(self):
+        while True:
+            try:
+                game = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            process = game['process']
+            for name, pipe in game['pipes'].items():
+                os.set_blocking(pipe.fileno(), False)
+                self.selector.register(pipe, selectors.EVENT_READ, (name, game))
+
+            # Linux 5.3+：pidfd 在程序結束時變為可讀
+            try:
+                game['pidfd'] = os.pidfd_open(process.pid)
+                self.selector.register(game['pidfd'], selectors.EVENT_READ, ('pidfd', game))
+            except (AttributeError, OSError):
+                game['pidfd'] = None
+
+            self.games[game['room_id']] = game
+
+    def _read_pipe(self, game, name, drain=False):
+        pipe = game['pipes'].get(name)
+        if pipe is None:
+            return
+        feed = game['monitor'].feed if name == 'stdout' else game['monitor'].feed_telemetry
+        while True:
+            try:
+                chunk = os.read(pipe.fileno(), 4096)
+            except BlockingIOError:
+                # 目前沒有更多資料
+                if drain:
+                    # 程序已結束但 pipe 仍被孫程序持有：不再等待
+                    self._close_pipe(game, name)
+                return
+            except OSError:
+                chunk = b''
+
+            if not chunk:
+                self._close_pipe(game, name)
+                return
+            feed(chunk)
+            if not drain:
+                return
+
+    def _close_pipe(self, game, name):
+        pipe = game['pipes'].pop(name)
+        try:
+            self.selector.unregister(pipe)
+        except (KeyError, ValueError):
+            pass
+        pipe.close()
+
+    def _finish(self, game):
+        """程序結束：收屍、關閉監控，並發出 exit 事件"""
+        self.games.pop(game['room_id'], None)
+        if game['pidfd'] is not None:
+            self.selector.unregister(game['pidfd'])
+            os.close(game['pidfd'])
+        game['process'].wait()
+        self._dispatch_exit(game)
+
+    def _fire_deadline(self, game):
+        """deadline 只觸發一次；程序已結束則忽略"""
+        game['deadline'] = None
+        if game['exited'] or game['process'].poll() is not None or not game['on_deadline']:
+            return
+        try:
+            game['on_deadline'](game['room_id'], game['process'])
+        except Exception as e:
+            print(f"Supervisor deadline handler error (Room {game['room_id']}): {e}")
+
+    def _dispatch_exit(self, game):
+        game['monitor'].close()
+        try:
+            game['on_exit'](game['room_id'], game['process'], game['monitor'])
+        except Exception as e:
+            print(f"Supervisor exit handler error (Room {game['room_id']}): {e}")
+
+    # --- Windows 備援：每個程序一條讀取執行緒 ---
+
+    def _run_reader_thread(self, game):
+        process = game['process']
+        try:
+            while True:
+                chunk = process.stdout.read1(4096)
+                if not chunk:
+                    break
+                game['monitor'].feed(chunk)
+        except Exception as e:
+            print(f"Reader error (Room {game['room_id']}): {e}")
+        process.stdout.close()
+        process.wait()
+        self._dispatch_exit(game)
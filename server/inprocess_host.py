@@ -0,0 +1,268 @@
+# Server/inprocess_host.py
+import os
+import re
+import sys
+import time
+import asyncio
+import inspect
+import threading
+import traceback
+import collections
+import importlib.util
+
+from game_sdk import read_line_async, MAX_FRAME
+
+# 等待玩家送出名稱的時間上限 (秒)
+JOIN_TIMEOUT = 5.0
+# 遊戲建立後，所有玩家都要在這段時間內連線過一次，否則視為啟動失敗並釋放名額 (秒)
+MATCH_JOIN_TIMEOUT = 60.0
+TAIL_LINES = 50
+
+
+class _Match:
+    """一場 in-process 遊戲：持有遊戲實例、玩家連線與事件佇列"""
+
+    def __init__(self, host, room_id, game, players, on_exit, on_event=None):
+        self.host = host
+        self.room_id = room_id
+        self.game = game
+        self.players = list(players)
+        self.on_exit = on_exit
+        self.on_event = on_event
+        self.writers = {} # {player: StreamWriter}
+        self.joined = set() # 曾經連線過的玩家
+        self.events = asyncio.Queue()
+        self.tail = collections.deque(maxlen=TAIL_LINES)
+        self.ended = False
+        self.tasks = []
+        self.started_at = time.monotonic()
+        game._session = self
+
+    # --- GameRuntime 使用的 API ---
+
+    def send(self, player, message):
+        writer = self.writers.get(player)
+        if writer and not writer.is_closing():
+            writer.write((message + "\n").encode('utf-8'))
+
+    def end(self, winner):
+        if self.ended:
+            return
+        self.ended = True
+        self.tail.append(f"GAME_RESULT: winner={winner}")
+        result = {'winner': winner, 'players': self.players,
+                  'duration': round(time.monotonic() - self.started_at, 2)}
+        self.host._finish(self, result, 0)
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+
+    # --- 事件處理 ---
+
+    async def run(self):
+        """依序處理這場遊戲的所有事件 (同一場遊戲內不會並行執行 hook)"""
+        while not self.ended:
+            kind, player, text = await self.events.get()
+            try:
+                if kind == 'join':
+                    self.game.connected.append(player)
+                    await self._call(self.game.on_join, player)
+                elif kind == 'leave':
+                    if player in self.game.connected:
+                        self.game.connected.remove(player)
+                    await self._call(self.game.on_leave, player)
+                elif kind == 'message':
+                    await self._call(self.game.on_message, player, text)
+                elif kind == 'tick':
+                    await self._call(self.game.on_tick)
+            except Exception as e:
+                print(f"[InProcess Room {self.room_id}] Game error: {e}")
+                traceback.print_exc()
+                self.tail.append(f"Game error: {e}")
+                if not self.ended:
+                    self.ended = True
+                    self.host._finish(self, None, 1)
+
+    async def join_deadline(self, timeout):
+        """玩家遲遲沒有到齊 (沒連線，或還沒開始就全部離開)：結束遊戲，Lobby 才會歸還名額"""
+        await asyncio.sleep(timeout)
+        if self.ended or self.joined >= set(self.players):
+            return
+        missing = [p for p in self.players if p not in self.joined]
+        print(f"[InProcess Room {self.room_id}] Players not joined within {timeout:.0f}s: {missing}")
+        self.tail.append(f"Players not joined within {timeout:.0f}s: {', '.join(missing)}")
+        self.ended = True
+        self.host._finish(self, None, 1)
+
+    async def tick(self, interval):
+        while not self.ended:
+            await asyncio.sleep(interval)
+            self.events.put_nowait(('tick', None, None))
+
+    async def _call(self, hook, *args):
+        result = hook(*args)
+        if inspect.isawaitable(result):
+            await result
+
+
+class InProcessGameHost:
+    """在單一執行緒的 asyncio event loop 中同時執行多場輕量遊戲。
+
+    所有遊戲共用一個 listening port：玩家連線後送出的第一個封包是自己的名稱，
+    Host 依名稱找到該玩家所在的遊戲。遊戲結果直接交給 on_exit，不需要解析 stdout。
+    介面與 LocalGameHost / RemoteGameHost 相同，可直接放進 Lobby 的主機選擇。
+    """
+
+    def __init__(self, name, public_ip, port, capacity):
+        self.name = name
+        self.public_ip = public_ip
+        self.port = port
+        self.capacity = capacity
+        self.matches = {} # {room_id: _Match}
+        self.classes = {} # {(game_dir, runtime_class): class} 已載入的遊戲類別
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
+        self._ready.wait(5)
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def load(self):
+        return len(self.matches)
+
+    def launch(self, room_id, build, players, on_exit, on_ready, on_event=None):
+        """建立一場 in-process 遊戲，回傳 (success, message, port)。共用 Port 已在監聽，建立後立即就緒"""
+        started_at = time.monotonic()
+        if not self.server:
+            return False, 'In-process game host is not running.', None
+        try:
+            game_cls = self._load_class(build)
+            game = game_cls(list(players))
+        except Exception as e:
+            print(f"[{self.name}] Failed to load runtime for {build['game_name']}: {e}")
+            return False, f'Failed to load game runtime: {e}', None
+
+        match = _Match(self, room_id, game, players, on_exit, on_event)
+        future = asyncio.run_coroutine_threadsafe(self._start_match(match), self.loop)
+        future.result(5)
+        print(f"[{self.name}] Room {room_id} started in-process ({build['runtime_class']})")
+        on_ready(room_id, self.port, (time.monotonic() - started_at) * 1000)
+        return True, 'Game started in-process.', self.port
+
+    def get_log_tail(self, room_id):
+        match = self.matches.get(room_id)
+        return list(match.tail) if match else []
+
+    # --- 內部實作 (event loop 執行緒) ---
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, '0.0.0.0', self.port, limit=MAX_FRAME)
+            )
+            print(f"In-process game host listening on port {self.port}")
+        except Exception as e:
+            print(f"Failed to start in-process game host: {e}")
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        self.loop.close()
+
+    async def _start_match(self, match):
+        self.matches[match.room_id] = match
+        match.tasks.append(asyncio.ensure_future(match.run()))
+        match.tasks.append(asyncio.ensure_future(match.join_deadline(MATCH_JOIN_TIMEOUT)))
+        if match.game.tick_interval:
+            match.tasks.append(asyncio.ensure_future(match.tick(match.game.tick_interval)))
+
+    def _find_match(self, player):
+        for match in self.matches.values():
+            if player in match.players and player not in match.writers and not match.ended:
+                return match
+        return None
+
+    async def _handle_connection(self, reader, writer):
+        # 1. 第一行是玩家名稱 (與獨立程序版遊戲伺服器相同協定)
+        # 與獨立程序共用 game_sdk 的分行規則 (FrameReader)，同一款遊戲兩種模式收到的訊息相同
+        try:
+            player = await asyncio.wait_for(read_line_async(reader), JOIN_TIMEOUT)
+        except (asyncio.TimeoutError, ConnectionError, OSError, ValueError):
+            player = None
+        player = (player or '').strip()
+
+        match = self._find_match(player) if player else None
+        if not match:
+            print(f"[{self.name}] Rejected unknown player: {player}")
+            writer.close()
+            return
+
+        match.writers[player] = writer
+        match.joined.add(player)
+        if match.on_event:
+            # 與子程序遊戲的 telemetry 相同的事件格式
+            match.on_event(match.room_id, {'event': 'player_joined', 'player': player})
+        match.events.put_nowait(('join', player, None))
+
+        # 2. 之後每一行視為一則訊息 (TCP 會任意切割封包，不能以一次 read 當作一則)
+        # 單行超過 StreamReader 上限 (game_sdk.MAX_FRAME) 時 readline 拋出 ValueError，視為斷線
+        try:
+            while not match.ended:
+                line = await read_line_async(reader)
+                if line is None:
+                    break
+                line = line.strip()
+                if line:
+                    match.events.put_nowait(('message', player, line))
+        except (ConnectionError, OSError, ValueError):
+            pass
+
+        if not match.ended:
+            match.writers.pop(player, None)
+            match.events.put_nowait(('leave', player, None))
+        writer.close()
+
+    def _finish(self, match, result, returncode):
+        """(event loop 執行緒) 結束遊戲：關閉連線並在背景執行緒回報結果"""
+        self.matches.pop(match.room_id, None)
+        for task in match.tasks:
+            if task is not asyncio.current_task():
+                task.cancel()
+
+        async def _close_writers():
+            # 先讓最後的訊息送出再關閉連線
+            for writer in match.writers.values():
+                try:
+                    await writer.drain()
+                except Exception:
+                    pass
+                writer.close()
+        asyncio.ensure_future(_close_writers())
+
+        # on_exit 會寫入 DB，放到 executor 避免阻塞其他遊戲
+        self.loop.run_in_executor(None, match.on_exit, match.room_id, result, returncode, list(match.tail))
+
+    def _load_class(self, build):
+        """從解壓後的遊戲目錄載入 runtime_class ("模組:類別")"""
+        key = (build['game_dir'], build['runtime_class'])
+        if key not in self.classes:
+            module_name, class_name = build['runtime_class'].split(':')
+            path = os.path.join(build['game_dir'], f"{module_name}.py")
+            # 每個遊戲版本使用獨立的模組名稱，避免不同遊戲的 server.py 互相覆蓋
+            unique_name = re.sub(r'\W', '_', f"game_{build['game_name']}_{build['version']}_{module_name}")
+            spec = importlib.util.spec_from_file_location(unique_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[unique_name] = module
+            spec.loader.exec_module(module)
+            self.classes[key] = getattr(module, class_name)
+        return self.classes[key]
@@ -4,21 +4,25 @@ import threading
 import sys
 import os
 import base64
-import uuid
-import subprocess
-import json
-import time
-import zipfile
 import traceback
+import collections
+import itertools
 
 # 路徑設定 (與 developer_server.py 相同)
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from config import SERVER_HOST, LOBBY_PORT, UPLOADED_GAMES_DIR
-from utils import send_message, receive_message
+from config import (SERVER_HOST, LOBBY_PORT, UPLOADED_GAMES_DIR, MAX_GAME_SERVERS,
+                    LOBBY_HOSTS_GAMES, GAME_AGENT_SECRET, GAME_AGENT_DEFAULT_SECRET, INPROCESS_GAME_PORT, INPROCESS_MAX_MATCHES,
+                    DOWNLOAD_PORT, RANGE_DOWNLOAD_MIN_BYTES)
+from utils import send_message, receive_message, diff_manifest
 from db_manager import db_manager
+from blob_store import blob_store
+from game_scheduler import GameScheduler
+from game_host import LocalGameHost, RemoteGameHost
+from inprocess_host import InProcessGameHost
+from download_service import DownloadService
 
 class LobbyServer:
     def __init__(self):
@@ -28,16 +32,31 @@ class LobbyServer:
         self.is_running = False
         self.logged_in_players = {} # 記錄線上玩家
         self.rooms = {} # {room_id: {info...}}
+        self.room_ids = itertools.count(1) # 房間 ID 只增不減：租約、排程與 telemetry 都以 room_id 為 key，不可重複使用
         self.invitations = {} # {username: [room_id_1, room_id_2]}
-        self.active_game_servers = {} # {room_id: subprocess.Popen}
+        self.local_host = LocalGameHost('local', SERVER_HOST, MAX_GAME_SERVERS) # 本機遊戲主機
+        self.game_agents = {} # {agent_name: RemoteGameHost} 已註冊的遠端遊戲主機
+        self.room_hosts = {} # {room_id: LocalGameHost 或 RemoteGameHost} 正在執行遊戲的主機
+        self.game_logs = {} # {room_id: [最後幾行輸出]} (保留最後一場供除錯)
+        self.ready_latencies = collections.deque(maxlen=100) # 最近幾場從啟動到就緒的時間 (ms)
+        self.game_telemetry = {} # {room_id: {'joined': [...], 'tick': {...}}} 遊戲回報的即時資料
+        self.scheduler = GameScheduler() # 准入控制 (同時執行上限 + FIFO 排隊)
+        # in-process 遊戲在 Lobby 的 event loop 中執行，名額與子程序分開計算
+        self.inprocess_host = InProcessGameHost('inprocess', SERVER_HOST, INPROCESS_GAME_PORT, INPROCESS_MAX_MATCHES)
+        self.inprocess_scheduler = GameScheduler(INPROCESS_MAX_MATCHES, INPROCESS_MAX_MATCHES)
+        self.download_service = DownloadService(SERVER_HOST, DOWNLOAD_PORT) # 大型遊戲檔案的分段下載
+        self._update_capacity()
 
     def start(self):
         try:
             self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(10) 
+            self.server_socket.listen(128) # 大量 bot / 壓力測試同時連線時不會被拒絕
             self.is_running = True
+            self.local_host.start()
+            self.inprocess_host.start()
+            self.download_service.start()
             print(f"Lobby Server listening on {self.host}:{self.port}...")
             
             while self.is_running:
@@ -61,6 +80,9 @@ class LobbyServer:
 
     def stop(self):
         self.is_running = False
+        self.local_host.stop()
+        self.inprocess_host.stop()
+        self.download_service.stop()
         if self.server_socket:
             self.server_socket.close()
         print("Lobby Server stopped.")
@@ -112,6 +134,7 @@ class LobbyServer:
         # 清理連線
         if current_user and current_user in self.logged_in_players:
             del self.logged_in_players[current_user]
+        self._drop_agents(client_sock)
         client_sock.close()
         print(f"[Debug] 與 {client_addr} 的連線已關閉")
 
@@ -121,6 +144,14 @@ class LobbyServer:
             return self._handle_register(data)
         elif action == 'login':
             return self._handle_login(data, client_sock)
+
+        # --- Game Host Agent 專用 (以註冊時的連線驗證身分) ---
+        elif action == 'register_agent':
+            return self._handle_register_agent(data, client_sock)
+        elif action == 'agent_heartbeat':
+            return self._handle_agent_heartbeat(data, client_sock)
+        elif action == 'agent_game_event':
+            return self._handle_agent_game_event(data, client_sock)
             
         if not current_user:
             return {'type': 'ERROR', 'success': False, 'message': 'Please log in first.'}
@@ -129,9 +160,13 @@ class LobbyServer:
             return self._handle_logout(data)
         
         elif action == 'get_game_list':
-            return self._handle_get_game_list()
+            return self._handle_get_game_list(data)
         elif action == 'download_game':
-            return self._handle_download_game(data)
+            response = self._handle_download_game(data)
+            # 背景預先下載的回應標上遊戲名稱，Client 不會把它當成使用者操作的結果
+            if data.get('prefetch'):
+                response['prefetch'] = data.get('game_name')
+            return response
         elif action == 'create_room':
             return self._handle_create_room(data, current_user)
         elif action == 'get_room_list':
@@ -201,15 +236,25 @@ class LobbyServer:
             del self.logged_in_players[username]
         return {'type': 'LOGOUT_RESPONSE', 'success': True}
 
-    def _handle_get_game_list(self):
+    def _handle_get_game_list(self, data):
         """P1 回傳所有遊戲資料"""
+        # 先讀取 revision 再取資料：期間若有變更，Client 下次查詢時會再收到一次 (不會漏掉)
+        revision, epoch = db_manager.catalog_revision, db_manager.catalog_epoch
+
+        # Client 帶上次的 revision (since) 時只回傳之後變更與下架的遊戲
+        since = data.get('since') or {}
+        if since.get('epoch') == epoch and isinstance(since.get('revision'), int):
+            changed, deleted = db_manager.get_catalog_changes(since['revision'])
+            return {'type': 'GAME_LIST_RESPONSE', 'success': True, 'data': changed,
+                    'delta': True, 'deleted': deleted, 'revision': revision, 'epoch': epoch}
+
         # 直接從 db_manager 取得完整字典
         games = db_manager.get_all_games()
         
         # 這裡直接回傳整個 games 字典
         # 實務上如果資料量大，通常會只回傳簡表 (ID, Name, Author)，詳情再另外查
         # 但為了作業簡單，我們一次回傳全部
-        return {'type': 'GAME_LIST_RESPONSE', 'success': True, 'data': games}
+        return {'type': 'GAME_LIST_RESPONSE', 'success': True, 'data': games, 'revision': revision, 'epoch': epoch}
     
     def _handle_download_game(self, data):
         """P2 處理下載請求"""
@@ -222,18 +267,21 @@ class LobbyServer:
             
         version = game_info.get('version') # 假設扁平化結構
         
-        # 2. 組合檔案路徑
-        # server_data/uploaded_games/{game_name}/{version}.zip
-        file_path = os.path.join(UPLOADED_GAMES_DIR, game_name, f"{version}.zip")
+        # 2. 取得版本檔案清單 (舊資料只有 zip 時會先匯入 blob store)
+        legacy_zip = os.path.join(UPLOADED_GAMES_DIR, game_name, f"{version}.zip")
+        manifest = blob_store.ensure_manifest(game_name, version, legacy_zip)
         
-        if not os.path.exists(file_path):
+        if not manifest:
             return {'type': 'DOWNLOAD_RESPONSE', 'success': False, 'message': 'Game file missing on server.'}
             
+        # 3. Client 附上已安裝的檔案清單時，只回傳差異 (新增/變更的檔案內容 + 刪除清單)
+        installed = data.get('installed')
+        if installed is not None:
+            return self._build_delta_download(game_info, manifest, installed, data.get('cached', []))
+            
         try:
-            # 3. 讀取檔案並轉 Base64
-            with open(file_path, 'rb') as f:
-                zip_data = f.read()
-                zip_b64 = base64.b64encode(zip_data).decode('utf-8')
+            # 4. 舊版 Client：依清單組出完整 zip 並轉 Base64
+            zip_b64 = base64.b64encode(blob_store.build_zip(manifest)).decode('utf-8')
                 
             return {
                 'type': 'DOWNLOAD_RESPONSE', 
@@ -242,6 +290,7 @@ class LobbyServer:
                     'game_name': game_name,
                     'version': version,
                     'zip_data': zip_b64,
+                    'build_hash': manifest['build_hash'],
                     'client_cmd': game_info.get('client_cmd'), 
                     'is_gui': game_info.get('is_gui')
                 }
@@ -249,6 +298,49 @@ class LobbyServer:
         except Exception as e:
             print(f"Download error: {e}")
             return {'type': 'DOWNLOAD_RESPONSE', 'success': False, 'message': f'Server error: {e}'}
+
+    def _build_delta_download(self, game_info, manifest, installed, cached):
+        """依 Client 已安裝的檔案清單產生差異更新 (cached 為 Client 共用快取中已有的 hash)"""
+        try:
+            changed, deleted = diff_manifest(installed, manifest['files'])
+            # Client 本機已有相同內容的檔案 (例如只是改名、或其他帳號已下載過) 可以直接沿用，不需要傳送
+            local_hashes = {f['hash'] for f in installed} | set(cached)
+            needed = {}
+            for f in changed:
+                if f['hash'] not in local_hashes:
+                    needed[f['hash']] = f['size']
+
+            # 檔案較大時交給下載服務分段平行傳輸，Lobby 連線只回傳分段清單
+            blobs, transfer = {}, None
+            if sum(needed.values()) >= RANGE_DOWNLOAD_MIN_BYTES and self.download_service.is_running:
+                token, chunks = self.download_service.prepare(list(needed))
+                transfer = {'host': self.host, 'port': DOWNLOAD_PORT, 'token': token, 'chunks': chunks}
+            else:
+                for digest in needed:
+                    blobs[digest] = base64.b64encode(blob_store.read(digest)).decode('utf-8')
+
+            print(f"Delta download {manifest['game_name']} v{manifest['version']}: "
+                  f"{len(changed)} changed, {len(deleted)} deleted, {len(needed)} blobs "
+                  f"({sum(needed.values())} bytes{', ranged' if transfer else ''})")
+            return {
+                'type': 'DOWNLOAD_RESPONSE',
+                'success': True,
+                'data': {
+                    'game_name': manifest['game_name'],
+                    'version': manifest['version'],
+                    'build_hash': manifest['build_hash'],
+                    'delta': True,
+                    'changed': changed,
+                    'delete': deleted,
+                    'blobs': blobs,
+                    'transfer': transfer,
+                    'client_cmd': game_info.get('client_cmd'),
+                    'is_gui': game_info.get('is_gui')
+                }
+            }
+        except Exception as e:
+            print(f"Download error: {e}")
+            return {'type': 'DOWNLOAD_RESPONSE', 'success': False, 'message': f'Server error: {e}'}
         
     def _handle_create_room(self, data, current_user):
         game_name = data.get('game_name')
@@ -268,12 +360,13 @@ class LobbyServer:
             return {'type': 'ROOM_RESPONSE', 'success': False, 'message': f'Version mismatch. Server: {game_info.get("version")}, Yours: {client_version}. Please update.'}
 
         # 3. 建立房間
-        room_id = str(len(self.rooms) + 1) # 簡單用數字當 ID，實務可用 uuid
+        room_id = str(next(self.room_ids)) # 刪除房間後也不會重複 (next 在多執行緒下是原子操作)
         self.rooms[room_id] = {
             "id": room_id,
             "host": current_user,
             "game_name": game_name,
             "version": client_version,
+            "build_hash": game_info.get('build_hash'), # Client 可依此預先下載正確的版本
             "max_players": game_info.get('max_players', 2),
             "players": [current_user],
             "status": "WAITING" # WAITING, PLAYING
@@ -290,6 +383,8 @@ class LobbyServer:
                 room_list.append({
                     "id": r_id, 
                     "game_name": r['game_name'], 
+                    "version": r['version'],
+                    "build_hash": r.get('build_hash'),
                     "host": r['host'], 
                     "players": len(r['players']), 
                     "max": r['max_players']
@@ -336,8 +431,10 @@ class LobbyServer:
         if current_user in room['players']:
             room['players'].remove(current_user)
             
-        # 如果房間沒人了，刪除房間
+        # 如果房間沒人了，刪除房間 (排隊中的啟動請求一併取消)
         if not room['players']:
+            self.scheduler.cancel(room_id)
+            self.inprocess_scheduler.cancel(room_id)
             del self.rooms[room_id]
         # 如果房主離開了，轉讓房主 (簡單實作：轉給下一個人)
         elif room['host'] == current_user:
@@ -351,7 +448,20 @@ class LobbyServer:
         if not room_id:
             return {'type': 'ROOM_INFO_RESPONSE', 'success': False, 'data': None}
         
-        return {'type': 'ROOM_INFO_RESPONSE', 'success': True, 'data': self.rooms[room_id]}
+        room = self.rooms[room_id]
+        if room['status'] == 'QUEUED':
+            # 排隊中的房間附上目前排隊位置
+            position = self.scheduler.position(room_id) or self.inprocess_scheduler.position(room_id)
+            room = dict(room, queue_position=position)
+        elif room['status'] == 'PLAYING':
+            # 遊戲回報已連線的玩家，讓還沒進入遊戲的人知道誰已經到了
+            telemetry = self.get_game_telemetry(room_id)
+            if telemetry:
+                room = dict(room, joined_players=list(telemetry['joined']))
+        elif room.get('start_error'):
+            # 啟動失敗時附上遊戲伺服器最後幾行輸出，方便房主判斷原因
+            room = dict(room, game_log_tail=self.get_game_log_tail(room_id)[-5:])
+        return {'type': 'ROOM_INFO_RESPONSE', 'success': True, 'data': room}
 
     def _handle_invite_user(self, data, current_user):
         target_user = data.get('target_user')
@@ -381,6 +491,8 @@ class LobbyServer:
                 details.append({
                     "id": rid,
                     "game_name": r['game_name'],
+                    "version": r['version'],
+                    "build_hash": r.get('build_hash'),
                     "host": r['host']
                 })
         return {'type': 'INVITE_LIST_RESPONSE', 'success': True, 'data': details}
@@ -427,6 +539,9 @@ class LobbyServer:
         if room['host'] != current_user:
             return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': 'Only host can start game.'}
 
+        if room['status'] != 'WAITING':
+            return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': f"Game is already {room['status']}."}
+
         # 1. 準備啟動參數
         game_name = room['game_name']
         version = room['version']
@@ -440,136 +555,253 @@ class LobbyServer:
         # 如果是方案 B (game_config 有區分 server_cmd)
         # server_cmd = game_info.get('server_cmd') 
 
-        if not server_cmd:
+        # in-process 遊戲不需要啟動指令，改用 runtime_class
+        inprocess = game_info.get('runtime') == 'inprocess'
+        if inprocess and not game_info.get('runtime_class'):
+            return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': 'Runtime class not defined.'}
+        if not inprocess and not server_cmd:
             return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': 'Server command not defined.'}
 
-        # 2. 尋找空閒 Port
-        game_port = self._find_free_port()
+        # 1. 取得版本檔案清單 (舊資料只有 zip 時會先匯入 blob store)
+        legacy_zip = os.path.join(UPLOADED_GAMES_DIR, game_name, f"{version}.zip")
+        manifest = blob_store.ensure_manifest(game_name, version, legacy_zip)
+        if not manifest:
+            return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': 'Game files not found.'}
         
-        #1. 定義 ZIP 路徑與解壓目標路徑
-        zip_path = os.path.join(UPLOADED_GAMES_DIR, game_name, f"{version}.zip")
-        # 為了避免跟 zip 檔混淆，我們解壓到一個專屬資料夾，例如 .../{version}_extracted/
-        extract_dir = os.path.join(UPLOADED_GAMES_DIR, game_name, f"{version}_extracted")
-        
-        # 2. 如果解壓目錄不存在，進行解壓
-        if not os.path.exists(extract_dir):
-            if not os.path.exists(zip_path):
-                return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': 'Game file zip not found.'}
-            
-            try:
-                print(f"Extracting game server files to {extract_dir}...")
-                os.makedirs(extract_dir, exist_ok=True)
-                with zipfile.ZipFile(zip_path, 'r') as zf:
-                    zf.extractall(extract_dir)
-            except Exception as e:
-                return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': f'Failed to extract server files: {e}'}
+        # 2. 展開到 .../{game}/{version}_{build_hash}/ (已展開過就直接沿用)
+        # 檔案以 hardlink 指向 blob store，只有新版本實際變更的內容會佔用空間
+        try:
+            extract_dir = blob_store.checkout(manifest, UPLOADED_GAMES_DIR)
+        except Exception as e:
+            return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': f'Failed to extract server files: {e}'}
         
         # 3. 組合完整指令 (server_cmd + port + players)
-        # 路徑: server_data/uploaded_games/{game}/{ver}/
-        game_dir = extract_dir # 使用解壓後的目錄
+        # 路徑: server_data/uploaded_games/{game}/{ver}_{build_hash}/
+        game_dir = extract_dir # 使用展開後的目錄
         
         # 為了作業順利，我們假設: uploaded_games/TestSnake/server.py 存在
         # 指令: python server.py --port 9001 --player_count 2
-        
-        full_cmd = server_cmd + [
-            '--port', str(game_port), 
-            '--player_count', str(len(room['players'])),
-            '--players' # 新增參數旗標
-        ] + room['players'] 
 
+        # 4. 交給排程器：有名額就立即啟動，否則排隊等待
+        room['status'] = 'QUEUED'
+        room.pop('start_error', None)
+        scheduler = self.inprocess_scheduler if inprocess else self.scheduler
+        started, result = scheduler.submit(
+            room_id, game_name,
+            lambda: self._launch_game_server(room_id, game_info, game_dir, manifest, scheduler)
+        )
 
-        print(f"Starting Game Server: {full_cmd} at {game_dir}")
+        if not started:
+            print(f"Room {room_id} queued for game server (position {result}).")
+            return {'type': 'START_GAME_RESPONSE', 'success': True, 'message': f'Server busy. Queued at position {result}.', 'data': {'queue_position': result}}
 
-        try:
-            # 4. 啟動子程序
-            # cwd=game_dir 確保程式在正確目錄執行
-            process = subprocess.Popen(
-                full_cmd, 
-                cwd=game_dir,
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1 # Line buffered
-            )
-            
-            self.active_game_servers[room_id] = process
-            room['status'] = 'PLAYING'
-            
-            # 5. 啟動監控執行緒 (負責收屍與紀錄結果)
-            monitor_thread = threading.Thread(
-                target=self._monitor_game_process,
-                args=(room_id, process, game_name, list(room['players']))
-            )
-            monitor_thread.daemon = True
-            monitor_thread.start()
-            
-            # 6. 通知房間內所有人 "GAME_STARTED"
-            # 這裡我們不直接回傳 socket response，而是回傳成功，
-            # 並依賴 "get_room_info" 輪詢，或者如果您有實作廣播機制(Broadcast)。
-            # 鑑於目前的輪詢架構，我們更新 room['status'] = 'PLAYING' 並將 ip/port 寫入 room info
-            
-            room['server_ip'] = self.host # 或是 Public IP
-            room['server_port'] = game_port
-            
-            return {'type': 'START_GAME_RESPONSE', 'success': True, 'message': 'Game server started.'}
-            
-        except Exception as e:
-            print(f"Start game error: {e}")
-            return {'type': 'START_GAME_RESPONSE', 'success': False, 'message': f'Failed to start process: {e}'}
-
-    def _find_free_port(self):
-        """尋找一個空閒的 Port"""
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.bind(('', 0))
-            return s.getsockname()[1]
+        success, message = result
+        return {'type': 'START_GAME_RESPONSE', 'success': success, 'message': message}
+
+    def _launch_game_server(self, room_id, game_info, game_dir, manifest, scheduler):
+        """實際啟動遊戲伺服器 (由排程器在取得名額時呼叫)，回傳 (success, message)"""
+        room = self.rooms.get(room_id)
+        if not room:
+            return False, 'Room no longer exists.'
+        game_name = room['game_name']
+
+        # 1. 選擇遊戲主機：in-process 遊戲固定在 Lobby 內執行，其餘選負載最低的主機 (本機或 Agent)
+        if game_info.get('runtime') == 'inprocess':
+            host = self.inprocess_host
+        else:
+            host = self._place_game()
+        if not host:
+            return self._fail_launch(room_id, 'No game host available.')
+
+        build = {
+            'game_name': game_name,
+            'version': room['version'],
+            'server_cmd': game_info.get('server_cmd'),
+            'runtime_class': game_info.get('runtime_class'),
+            'ready_signal': game_info.get('ready_signal'),
+            'telemetry': game_info.get('telemetry'),
+            'game_dir': game_dir,
+            'manifest': manifest,
+        }
+        players = list(room['players'])
+
+        # 2. 啟動 (遊戲伺服器可以連線時主機發出 ready 事件，結束時發出 exit 事件)
+        # ready 可能在 launch 回傳前就發生，所以先把房間設為 STARTING
+        self.room_hosts[room_id] = host
+        self.game_telemetry[room_id] = {'joined': [], 'tick': None}
+        room['status'] = 'STARTING'
+        success, message, game_port = host.launch(
+            room_id, build, players,
+            on_exit=lambda r_id, result, code, tail: self._on_game_exit(r_id, result, code, tail, game_name, players, scheduler),
+            on_ready=lambda r_id, port, latency_ms: self._on_game_ready(r_id, host, port, latency_ms),
+            on_event=self._on_game_event
+        )
+        if not success:
+            self.room_hosts.pop(room_id, None)
+            return self._fail_launch(room_id, message)
+
+        return True, message
+
+    def _on_game_ready(self, room_id, host, game_port, latency_ms):
+        """(主機事件) 遊戲伺服器已可連線：才通知房間內所有人 "GAME_STARTED"
+
+        依賴 "get_room_info" 輪詢：更新 room['status'] = 'PLAYING' 並將 ip/port 寫入 room info
+        """
+        room = self.rooms.get(room_id)
+        # 若遊戲在這之前就已結束 (或房間已解散)，不再覆蓋
+        if not room or self.room_hosts.get(room_id) is not host:
+            return
+        self.ready_latencies.append(latency_ms)
+        print(f"Game Server for Room {room_id} ready on {host.name} ({latency_ms:.0f} ms).")
+        room['status'] = 'PLAYING'
+        room['server_ip'] = host.public_ip
+        room['server_port'] = game_port
+        room['game_host'] = host.name
+
+    def _place_game(self):
+        """挑選負載比例最低、且仍有空位的遊戲主機"""
+        candidates = list(self.game_agents.values())
+        if LOBBY_HOSTS_GAMES:
+            candidates.append(self.local_host)
+        candidates = [h for h in candidates if h.load() < h.capacity]
+        return min(candidates, key=lambda h: h.load() / h.capacity, default=None)
+
+    def _update_capacity(self):
+        """排程器的全體上限 = 本機容量 + 所有 Agent 容量"""
+        total = self.local_host.capacity if LOBBY_HOSTS_GAMES else 0
+        total += sum(agent.capacity for agent in self.game_agents.values())
+        self.scheduler.max_total = total
+
+    def _on_game_event(self, room_id, event):
+        """(主機事件) 遊戲透過 telemetry 回報的事件"""
+        telemetry = self.game_telemetry.get(room_id)
+        if telemetry is None:
+            return
+        kind = event.get('event')
+        if kind == 'player_joined':
+            telemetry['joined'].append(event.get('player'))
+            print(f"[Room {room_id}] Player joined game server: {event.get('player')}")
+        elif kind == 'tick':
+            telemetry['tick'] = event
+
+    def get_game_telemetry(self, room_id):
+        """取得某房間最近一場遊戲回報的資料 (加入的玩家、最後一次 tick 統計)"""
+        return self.game_telemetry.get(room_id)
+
+    def _fail_launch(self, room_id, message):
+        """啟動失敗：房間退回等待狀態，並留下錯誤訊息給輪詢的玩家"""
+        room = self.rooms.get(room_id)
+        self.game_logs.pop(room_id, None) # 沒有啟動任何程序，不要顯示上一場的輸出
+        if room:
+            room['status'] = 'WAITING'
+            room['start_error'] = message
+        return False, message
     
-    def _monitor_game_process(self, room_id, process, game_name, players):
-        """(簡化版) 等待遊戲結束後再一次性讀取結果"""
-        print(f"Monitor started for Room {room_id} (Waiting for exit...)")
+    def _on_game_exit(self, room_id, result, returncode, tail, game_name, players, scheduler):
+        """(主機事件) 遊戲結束：紀錄結果、重置房間 (Port 已由主機歸還)
+
+        子程序的 result 由 stdout 解析而來；in-process 遊戲則由 end_game() 直接提供。
+        """
+        host = self.room_hosts.pop(room_id, None)
+        host_name = host.name if host else '?'
+        print(f"Game Server for Room {room_id} finished on {host_name} (exit code {returncode}).")
+        self.game_logs[room_id] = tail
+        self.game_telemetry.pop(room_id, None)
         
-        try:
-            # 1. 這裡會「阻塞」直到遊戲程序完全結束
-            # communicate 會自動讀取所有 stdout 和 stderr，避免卡死
-            stdout_data, stderr_data = process.communicate()
-            
-            print(f"Game Server for Room {room_id} finished.")
-            
-            # 2. 解析輸出內容
-            winner = None
-            if stdout_data:
-                # 將所有輸出按行分割
-                lines = stdout_data.splitlines()
-                for line in lines:
-                    # 您可以選擇是否要印出所有 Log
-                    # print(f"[GameServer {room_id}] {line}") 
-                    
-                    if line.startswith("GAME_RESULT:"):
-                        try:
-                            json_str = line.split("GAME_RESULT:", 1)[1].strip()
-                            result_data = json.loads(json_str)
-                            winner = result_data.get('winner')
-                            print(f"Found Result: {winner}")
-                        except Exception as e:
-                            print(f"Failed to parse result: {e}")
-
-            # 3. 記錄到 DB (邏輯不變)
-            if winner:
-                db_manager.add_match_record(game_name, players, winner)
-                print(f"Match recorded: {winner} won.")
-            else:
-                print(f"Match finished without valid result.")
+        # 1. 取得結果 (已在串流過程中解析)
+        winner = None
+        details = None
+        if result:
+            winner = result.get('winner')
+            # telemetry 的結果可以附帶遊戲時間與各玩家分數
+            details = {k: result[k] for k in ('duration', 'scores') if k in result}
+            print(f"Found Result: {winner}")
+
+        # 2. 記錄到 DB
+        if winner:
+            db_manager.add_match_record(game_name, players, winner, details)
+            print(f"Match recorded: {winner} won.")
+        else:
+            print(f"Match finished without valid result. Last output:")
+            for line in tail[-10:]:
+                print(f"  [GameServer {room_id}] {line}")
+
+        # 3. 清理房間狀態 (還沒就緒就結束，代表啟動失敗)
+        if room_id in self.rooms:
+            room = self.rooms[room_id]
+            if room['status'] == 'STARTING':
+                room['start_error'] = tail[-1] if tail else 'Game server exited before it was ready.'
+            room['status'] = 'WAITING'
+            for key in ('server_ip', 'server_port', 'game_host'):
+                room.pop(key, None)
+
+        # 4. 釋放名額，讓排隊中的遊戲啟動
+        scheduler.finish(room_id)
+
+    def get_game_log_tail(self, room_id):
+        """取得某房間最近一場遊戲的最後幾行輸出 (除錯用)"""
+        return self.game_logs.get(room_id, [])
+
+    # --- Game Host Agent ---
+
+    def _handle_register_agent(self, data, client_sock):
+        # Agent 會依 Lobby 的指示執行程式，沒有設定密鑰時不接受任何 Agent
+        if GAME_AGENT_SECRET == GAME_AGENT_DEFAULT_SECRET:
+            return {'type': 'AGENT_RESPONSE', 'success': False,
+                    'message': 'Agent registration disabled: GAME_AGENT_SECRET is not set on the lobby.'}
+        if data.get('secret') != GAME_AGENT_SECRET:
+            return {'type': 'AGENT_RESPONSE', 'success': False, 'message': 'Invalid agent secret.'}
+
+        name = data.get('name')
+        if not name or name in self.game_agents:
+            return {'type': 'AGENT_RESPONSE', 'success': False, 'message': f'Agent name {name!r} unavailable.'}
 
-            # 4. 清理房間狀態 (邏輯不變)
-            if room_id in self.rooms:
-                self.rooms[room_id]['status'] = 'WAITING'
-                if 'server_ip' in self.rooms[room_id]: del self.rooms[room_id]['server_ip']
-                if 'server_port' in self.rooms[room_id]: del self.rooms[room_id]['server_port']
-                
-            if room_id in self.active_game_servers:
-                del self.active_game_servers[room_id]
+        try:
+            control_port = int(data.get('control_port'))
+            capacity = int(data.get('capacity', 1))
+        except (TypeError, ValueError):
+            control_port = capacity = 0
+        if not 0 < control_port < 65536 or capacity < 1 or not isinstance(data.get('host'), str):
+            return {'type': 'AGENT_RESPONSE', 'success': False, 'message': 'Invalid agent host, control_port or capacity.'}
+
+        agent = RemoteGameHost(name, data['host'], control_port, capacity, client_sock)
+        self.game_agents[name] = agent
+        self._update_capacity()
+        print(f"Game host agent registered: {name} at {agent.public_ip}:{agent.control_port} (capacity {agent.capacity})")
+        # 有新的容量：讓排隊中的遊戲嘗試啟動
+        self.scheduler.reschedule()
+        return {'type': 'AGENT_RESPONSE', 'success': True, 'message': 'Agent registered.'}
+
+    def _get_agent(self, data, client_sock):
+        agent = self.game_agents.get(data.get('name'))
+        if agent and agent.client_sock is client_sock:
+            return agent
+        return None
 
-        except Exception as e:
-            print(f"Monitor error: {e}")
+    def _handle_agent_heartbeat(self, data, client_sock):
+        agent = self._get_agent(data, client_sock)
+        if not agent:
+            return {'type': 'AGENT_RESPONSE', 'success': False, 'message': 'Agent not registered.'}
+        agent.reported_load = int(data.get('load', 0))
+        return {'type': 'AGENT_RESPONSE', 'success': True}
+
+    def _handle_agent_game_event(self, data, client_sock):
+        agent = self._get_agent(data, client_sock)
+        if not agent:
+            return {'type': 'AGENT_RESPONSE', 'success': False, 'message': 'Agent not registered.'}
+        if 'load' in data:
+            agent.reported_load = int(data['load'])
+        agent.handle_event(data.get('room_id'), data.get('event', {}))
+        return {'type': 'AGENT_RESPONSE', 'success': True}
+
+    def _drop_agents(self, client_sock):
+        """Agent 連線中斷：移除 Agent，放在它上面的遊戲視為結束"""
+        for name, agent in list(self.game_agents.items()):
+            if agent.client_sock is client_sock:
+                print(f"Game host agent disconnected: {name}")
+                del self.game_agents[name]
+                self._update_capacity()
+                agent.fail_all()
 
     def _handle_get_history(self, current_user):
         history = db_manager.get_user_history(current_user)
@@ -48,6 +48,15 @@ def main():
             elif command.strip().lower() == 'status':
                 print(f"Developer Server: Running")
                 print(f"Logged in Developers: {list(dev_server.logged_in_developers.keys())}")
+                print(f"Game Scheduler: {lobby_server.scheduler.stats()}")
+                print(f"In-process Matches: {lobby_server.inprocess_scheduler.stats()}")
+                latencies = list(lobby_server.ready_latencies)
+                if latencies:
+                    print(f"Start-to-ready: avg {sum(latencies) / len(latencies):.0f} ms, max {max(latencies):.0f} ms")
+                print(f"Game Hosts: local={lobby_server.local_host.load()}/{lobby_server.local_host.capacity}", end='')
+                for name, agent in lobby_server.game_agents.items():
+                    print(f", {name}={agent.load()}/{agent.capacity}", end='')
+                print()
             
             time.sleep(0.1)
             
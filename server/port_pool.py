@@ -0,0 +1,82 @@
+# Server/port_pool.py
+import socket
+import threading
+
+
+class PortPool:
+    """管理遊戲伺服器可用的 Port 範圍，依房間租借 / 歸還。
+
+    - 每個房間同時最多持有一個 Port (lease)
+    - 歸還的 Port 放回堆疊頂端，下次優先重用 (LIFO)
+    - bind_socket=True 時直接回傳已經 listen 的 socket，可交給子程序使用
+    """
+
+    def __init__(self, port_start, port_end, host=''):
+        self.host = host
+        self.lock = threading.Lock()
+        # 空閒 Port 堆疊：pop() 取出堆疊頂端
+        # 反向建立，讓第一次分配從範圍起點開始
+        self.free_ports = list(range(port_end, port_start - 1, -1))
+        self.leases = {}  # {room_id: {'port': int, 'sock': socket 或 None}}
+
+    def acquire(self, room_id, bind_socket=False):
+        """為房間租借一個 Port，回傳 (port, sock)。
+
+        bind_socket=False 時 sock 為 None；沒有可用 Port 時回傳 (None, None)。
+        """
+        with self.lock:
+            lease = self.leases.get(room_id)
+            if lease:
+                return lease['port'], lease['sock']
+
+            busy_ports = []
+            try:
+                while self.free_ports:
+                    port = self.free_ports.pop()
+                    sock = self._try_bind(port)
+                    if sock is None:
+                        # 被池外的程序佔用，放回堆疊底部稍後再試
+                        busy_ports.append(port)
+                        continue
+
+                    if bind_socket:
+                        sock.listen(16)
+                    else:
+                        sock.close()
+                        sock = None
+
+                    self.leases[room_id] = {'port': port, 'sock': sock}
+                    return port, sock
+                return None, None
+            finally:
+                self.free_ports[:0] = busy_ports
+
+    def release(self, room_id):
+        """歸還房間租借的 Port (重複呼叫無副作用)"""
+        with self.lock:
+            lease = self.leases.pop(room_id, None)
+            if not lease:
+                return
+            if lease['sock']:
+                try:
+                    lease['sock'].close()
+                except Exception:
+                    pass
+            # 放回堆疊頂端，下一場遊戲優先使用 (LIFO)
+            self.free_ports.append(lease['port'])
+
+    def get_port(self, room_id):
+        lease = self.leases.get(room_id)
+        return lease['port'] if lease else None
+
+    def _try_bind(self, port):
+        """嘗試 bind 指定 Port，成功回傳 socket，失敗回傳 None"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            # 與遊戲伺服器相同設定，避免 TIME_WAIT 被誤判為佔用
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((self.host, port))
+            return sock
+        except OSError:
+            sock.close()
+            return None
@@ -1,8 +1,10 @@
 import sys
 import os
-import subprocess
 import time
-import platform
+# subprocess / platform 只有開新視窗時才需要，在 open_new_console 中才 import (加快選單啟動)
+
+# True: 在目前的直譯器中直接執行客戶端 (不開新視窗、不另外啟動 Python)，用法: python start_menu.py --inprocess
+INPROCESS = '--inprocess' in sys.argv
 
 # 設定顏色 (Windows 可能需要 colorama，這裡用簡單的 ANSI)
 def print_header(text):
@@ -12,6 +14,8 @@ def print_header(text):
 
 def open_new_console(script_path):
     """跨平台開啟新終端機執行腳本"""
+    import subprocess
+    import platform
     if platform.system() == 'Windows':
         # Windows: 使用 start cmd /k 來開啟新視窗並保持開啟
         subprocess.Popen(['start', 'cmd', '/k', sys.executable, script_path], shell=True)
@@ -31,6 +35,23 @@ def open_new_console(script_path):
         except:
             subprocess.Popen([sys.executable, script_path])
 
+def run_in_process(base_dir, module_name, class_name):
+    """在目前的程序中執行客戶端，結束 (登出 / 離開) 後回到選單。
+    模組只在第一次 import，之後再次啟動不需要重新載入。"""
+    client_dir = os.path.join(base_dir, 'Client')
+    for path in (base_dir, client_dir):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    import importlib
+    from config import ensure_dirs
+    ensure_dirs()
+    module = importlib.import_module(module_name)
+    try:
+        getattr(module, class_name)().start()
+    except (KeyboardInterrupt, EOFError):
+        print("\n>> 已中斷客戶端，返回選單。")
+
 def main_menu():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     
@@ -38,7 +59,7 @@ def main_menu():
     os.environ['PYTHONPATH'] = base_dir
 
     while True:
-        print_header("Game Store 測試選單")
+        print_header("Game Store 測試選單" + (" (in-process)" if INPROCESS else ""))
         print("1. [Dev]    啟動開發者客戶端 (Developer Client)")
         print("2. [Player] 啟動玩家大廳 (Lobby Client)")
         print("3. [Info]   顯示測試遊戲路徑 (給上傳用)")
@@ -47,11 +68,17 @@ def main_menu():
         choice = input("\n請選擇功能 (1-4): ").strip()
             
         if choice == '1':
+            if INPROCESS:
+                run_in_process(base_dir, 'developer_client', 'DeveloperClient')
+                continue
             print(">> 正在新視窗啟動 Developer Client...")
             script = os.path.join(base_dir, 'Client', 'developer_client.py')
             open_new_console(script)
             
         elif choice == '2':
+            if INPROCESS:
+                run_in_process(base_dir, 'lobby_client', 'LobbyClient')
+                continue
             print(">> 正在新視窗啟動 Lobby Client...")
             script = os.path.join(base_dir, 'Client', 'lobby_client.py')
             open_new_console(script)
@@ -1,6 +1,9 @@
 # utils.py
+import os
+import re
 import json
 import struct
+import hashlib
 from config import HEADER_SIZE
 
 # --- 網路通訊工具 ---
@@ -71,6 +74,79 @@ def receive_message(sock):
         print(f"Error receiving message: {e}") # 可能是連線被遠端關閉，不一定要印
         return None
 
+def receive_exact(sock, length):
+    """接收固定長度的原始資料 (用於 JSON 標頭後緊接的二進位內容)，連線中斷時回傳 None"""
+    buf = bytearray(length)
+    view = memoryview(buf)
+    received = 0
+    while received < length:
+        n = sock.recv_into(view[received:], min(length - received, 64 * 1024))
+        if not n:
+            return None
+        received += n
+    return bytes(buf)
+
+# --- 遊戲檔案清單 (Manifest) ---
+# 一個遊戲版本 = 一份檔案清單 [{'path', 'hash', 'mode', 'size'}]，檔案內容以 SHA-256 定址
+
+MANIFEST_IGNORE_DIRS = ('__pycache__', '.git')
+
+def hash_file(path):
+    """計算檔案的 SHA-256 (分段讀取，不會一次載入整個檔案)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def build_manifest(folder, ignore_dirs=MANIFEST_IGNORE_DIRS):
+    """掃描資料夾，回傳依路徑排序的檔案清單 (path 一律使用 '/' 分隔)"""
+    files = []
+    for root, dirs, filenames in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if d not in ignore_dirs)
+        for name in filenames:
+            full_path = os.path.join(root, name)
+            st = os.stat(full_path)
+            files.append({
+                'path': os.path.relpath(full_path, folder).replace(os.sep, '/'),
+                'hash': hash_file(full_path),
+                'mode': st.st_mode & 0o777,
+                'size': st.st_size,
+            })
+    files.sort(key=lambda f: f['path'])
+    return files
+
+def manifest_hash(files):
+    """整個版本的識別碼：檔案清單 (path/hash/mode) 的 SHA-256"""
+    canonical = json.dumps(
+        [[f['path'], f['hash'], f['mode']] for f in sorted(files, key=lambda f: f['path'])],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def diff_manifest(old_files, new_files):
+    """比較兩份檔案清單，回傳 (新增或變更的檔案, 需要刪除的路徑)"""
+    # mode 只比較執行權限 (其餘權限位元依平台 / umask 而異，不代表內容變更)
+    old = {f['path']: (f['hash'], f.get('mode', 0) & 0o111) for f in old_files}
+    new_paths = {f['path'] for f in new_files}
+    changed = [f for f in new_files if old.get(f['path']) != (f['hash'], f.get('mode', 0) & 0o111)]
+    deleted = sorted(path for path in old if path not in new_paths)
+    return changed, deleted
+
+def safe_relpath(path):
+    """檢查清單中的相對路徑，拒絕絕對路徑與 '..' (避免寫到目錄外)"""
+    norm = os.path.normpath(path.replace('/', os.sep))
+    if os.path.isabs(norm) or norm == '..' or norm.startswith('..' + os.sep) or norm == '.':
+        raise ValueError(f"Unsafe path in manifest: {path}")
+    return norm
+
+BLOB_HASH_RE = re.compile(r'[0-9a-f]{64}')
+
+def is_blob_hash(digest):
+    """是否為合法的 blob hash (64 個小寫十六進位字元的 SHA-256)。
+    hash 會被當作檔名使用，來自 Client 的 hash 必須先檢查"""
+    return isinstance(digest, str) and BLOB_HASH_RE.fullmatch(digest) is not None
+
 # --- 密碼 (待完善) ---
 
 def verify_password(stored_hash, provided_password):